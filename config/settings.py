@@ -15,7 +15,7 @@ from pathlib import Path
 from dotenv import load_dotenv
 load_dotenv()
 
-GRAPH_API_ENDPOINT = "https://graph.microsoft.com/v1.0"
+GRAPH_API_ENDPOINT = os.getenv("GRAPH_API_ENDPOINT", "https://graph.microsoft.com/v1.0")
 TENANT_ID = os.getenv("TENANT_ID")
 CLIENT_ID = os.getenv("CLIENT_ID")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
@@ -23,6 +23,136 @@ SHAREPOINT_SITE_ID = os.getenv("SHAREPOINT_SITE_ID")
 SHAREPOINT_DRIVE_ID = os.getenv("SHAREPOINT_DRIVE_ID")
 GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY")
 
+# App-only Graph token cache: refresh this many seconds before expiry, and
+# optionally share the token between workers through the Django cache.
+GRAPH_TOKEN_REFRESH_SKEW = int(os.getenv("GRAPH_TOKEN_REFRESH_SKEW", "300"))
+GRAPH_TOKEN_SHARED_CACHE = os.getenv("GRAPH_TOKEN_SHARED_CACHE", "false").lower() == "true"
+
+# Site ids, drive lists and Resume folder ids resolved through Graph are kept in
+# the Django cache for this many seconds (0 disables the cache).
+GRAPH_METADATA_CACHE_TTL = int(os.getenv("GRAPH_METADATA_CACHE_TTL", "3600"))
+
+# Shared HTTP client (core.http_client) for Graph and Gemini calls
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
+# Connections the async clients (core.http_client.arequest) may hold open per
+# event loop, so async views can have this many Graph calls in flight per
+# worker, split into pools of HTTP_ASYNC_POOL_SIZE connections
+HTTP_ASYNC_MAX_CONNECTIONS = int(os.getenv("HTTP_ASYNC_MAX_CONNECTIONS", "200"))
+HTTP_ASYNC_POOL_SIZE = int(os.getenv("HTTP_ASYNC_POOL_SIZE", "20"))
+
+# Client-side rate limits (core.ratelimit), shared by all processes on the host
+# through lock files in RATE_LIMIT_DIR (default: <tmp>/resume-ratelimit). Quotas
+# are per minute; 0 turns a limit off. Buckets hold RATE_LIMIT_BURST_SECONDS of
+# quota, and a caller gives up after waiting RATE_LIMIT_MAX_WAIT seconds.
+RATE_LIMITS = {
+    'gemini': {
+        'requests_per_minute': int(os.getenv("GEMINI_RPM", "1000")),
+        'tokens_per_minute': int(os.getenv("GEMINI_TPM", "1000000")),
+    },
+    'graph': {
+        'requests_per_minute': int(os.getenv("GRAPH_RPM", "600")),
+    },
+}
+RATE_LIMIT_BURST_SECONDS = float(os.getenv("RATE_LIMIT_BURST_SECONDS", "2"))
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "300"))
+RATE_LIMIT_DIR = os.getenv("RATE_LIMIT_DIR", "")
+# Output tokens assumed per Gemini call until its usage comes back
+GEMINI_OUTPUT_TOKEN_ESTIMATE = int(os.getenv("GEMINI_OUTPUT_TOKEN_ESTIMATE", "1000"))
+
+# Bulk ingestion concurrency (per pipeline stage)
+INGEST_DOWNLOAD_WORKERS = int(os.getenv("INGEST_DOWNLOAD_WORKERS", "8"))
+INGEST_EXTRACT_WORKERS = int(os.getenv("INGEST_EXTRACT_WORKERS", "4"))
+INGEST_EXTRACT_PROCESSES = os.getenv("INGEST_EXTRACT_PROCESSES", "true").lower() == "true"
+INGEST_LLM_WORKERS = int(os.getenv("INGEST_LLM_WORKERS", "4"))
+
+# Batched candidate writes during ingestion (core.persistence): rows per
+# transaction, and the longest a parsed result waits for its batch to fill
+INGEST_SAVE_BATCH_SIZE = int(os.getenv("INGEST_SAVE_BATCH_SIZE", "50"))
+INGEST_SAVE_MAX_DELAY = float(os.getenv("INGEST_SAVE_MAX_DELAY", "2"))
+
+# Resume downloads (core.graph_utils.stream_drive_item) are read in chunks into
+# a spooled temp file that moves to disk (DOWNLOAD_SPOOL_DIR, default the system
+# temp dir) past DOWNLOAD_SPOOL_BYTES. Larger files and other content types are
+# rejected before or while downloading.
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+DOWNLOAD_SPOOL_BYTES = int(os.getenv("DOWNLOAD_SPOOL_BYTES", str(1024 * 1024)))
+DOWNLOAD_CHUNK_BYTES = int(os.getenv("DOWNLOAD_CHUNK_BYTES", str(64 * 1024)))
+DOWNLOAD_SPOOL_DIR = os.getenv("DOWNLOAD_SPOOL_DIR", "")
+DOWNLOAD_ALLOWED_TYPES = {
+    t.strip().lower() for t in os.getenv(
+        "DOWNLOAD_ALLOWED_TYPES",
+        "application/pdf,"
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document,"
+        "application/msword,application/octet-stream",
+    ).split(",") if t.strip()
+}
+
+# Text extraction caps (core.resume_parser.extraction)
+EXTRACT_MAX_PAGES = int(os.getenv("EXTRACT_MAX_PAGES", "30"))
+EXTRACT_MAX_CHARS = int(os.getenv("EXTRACT_MAX_CHARS", "100000"))
+
+# Parse job queue (core.jobs) and its worker (`manage.py run_parse_worker`)
+PARSE_JOB_MAX_ATTEMPTS = int(os.getenv("PARSE_JOB_MAX_ATTEMPTS", "3"))
+PARSE_JOB_RETRY_BACKOFF = int(os.getenv("PARSE_JOB_RETRY_BACKOFF", "30"))      # seconds, doubled per attempt
+PARSE_JOB_LOCK_TIMEOUT = int(os.getenv("PARSE_JOB_LOCK_TIMEOUT", "900"))       # seconds before a running job is considered stale
+PARSE_JOB_HEARTBEAT_INTERVAL = int(os.getenv("PARSE_JOB_HEARTBEAT_INTERVAL", "60"))  # seconds between lock refreshes of a running job
+PARSE_JOB_STALE_CHECK_INTERVAL = int(os.getenv("PARSE_JOB_STALE_CHECK_INTERVAL", "60"))  # seconds between workers' stale-job sweeps
+PARSE_WORKER_CONCURRENCY = int(os.getenv("PARSE_WORKER_CONCURRENCY", "4"))
+PARSE_WORKER_POLL_INTERVAL = float(os.getenv("PARSE_WORKER_POLL_INTERVAL", "2"))
+
+# Prompt preprocessing (core.resume_parser.preprocess): resume text is trimmed
+# section by section to this many estimated tokens; 0 disables the budget
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "8000"))
+
+# Structured LLM parsing (core.resume_parser.structured): re-request missing
+# or invalid fields together in one follow-up call. LLM_FIELD_FALLBACK_WORKERS
+# bounds how many resumes left out of a batch response are parsed at once.
+LLM_FIELD_FALLBACK = os.getenv("LLM_FIELD_FALLBACK", "true").lower() == "true"
+LLM_FIELD_FALLBACK_WORKERS = int(os.getenv("LLM_FIELD_FALLBACK_WORKERS", "4"))
+
+# Batch prompting during ingestion: resumes of at most LLM_BATCH_ITEM_MAX_TOKENS
+# estimated tokens are packed, up to LLM_BATCH_SIZE per request and
+# LLM_BATCH_TOKEN_BUDGET tokens of resume text, into one Gemini call. A partial
+# batch is sent after LLM_BATCH_MAX_DELAY seconds. LLM_BATCH_SIZE=1 disables it.
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "5"))
+LLM_BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "6000"))
+LLM_BATCH_ITEM_MAX_TOKENS = int(os.getenv("LLM_BATCH_ITEM_MAX_TOKENS", "1500"))
+LLM_BATCH_MAX_DELAY = float(os.getenv("LLM_BATCH_MAX_DELAY", "2"))
+
+# Deterministic fast path (core.resume_parser.fastpath): the skills dictionary,
+# and whether bulk ingestion skips Gemini by default ("cheap mode")
+SKILLS_DICTIONARY = os.getenv(
+    "SKILLS_DICTIONARY", str(Path(__file__).resolve().parent.parent / "core" / "resume_parser" / "skills.txt")
+)
+INGEST_CHEAP_MODE = os.getenv("INGEST_CHEAP_MODE", "false").lower() == "true"
+
+# Semantic matching (core.embeddings): "auto" uses sentence-transformers when
+# installed and falls back to a numpy-only hashing encoder of EMBEDDING_DIM
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "auto")   # auto, sentence-transformers or hashing
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
+
+# Duplicate candidates (core.dedupe): resumes whose estimated text similarity
+# (MinHash Jaccard) reaches the link threshold are linked to one canonical
+# candidate; above the reuse threshold (and within the SimHash distance) the
+# earlier parse is reused instead of calling the LLM. Texts with fewer word
+# 5-gram shingles than DEDUPE_MIN_SHINGLES are never fingerprinted.
+DEDUPE_LINK_THRESHOLD = float(os.getenv("DEDUPE_LINK_THRESHOLD", "0.8"))
+DEDUPE_REUSE_THRESHOLD = float(os.getenv("DEDUPE_REUSE_THRESHOLD", "0.9"))
+DEDUPE_SIMHASH_DISTANCE = int(os.getenv("DEDUPE_SIMHASH_DISTANCE", "3"))
+DEDUPE_MIN_SHINGLES = int(os.getenv("DEDUPE_MIN_SHINGLES", "20"))
+
+# LLM parse cache (keyed by extracted text + prompt version)
+PARSE_CACHE_ENABLED = os.getenv("PARSE_CACHE_ENABLED", "true").lower() == "true"
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "50000"))
+PARSE_CACHE_TTL_DAYS = int(os.getenv("PARSE_CACHE_TTL_DAYS", "180"))
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -71,6 +201,33 @@ MIDDLEWARE = [
 
 MIDDLEWARE = ['corsheaders.middleware.CorsMiddleware'] + MIDDLEWARE
 
+# Outermost, so the timing covers every other middleware as well
+MIDDLEWARE = ['core.middleware.TimingMiddleware'] + MIDDLEWARE
+
+# Request timing (core.middleware, core.metrics): every request is logged as
+# one JSON line on the "core.timing" logger; requests slower than
+# SLOW_REQUEST_MS are logged as warnings, with sampled stacks when the
+# profiler is on (PROFILE_DIR also keeps them as collapsed-stack files)
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "2000"))
+PROFILE_SLOW_REQUESTS = os.getenv("PROFILE_SLOW_REQUESTS", "false").lower() == "true"
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "")
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['console'],
+            'level': os.getenv("TIMING_LOG_LEVEL", "INFO"),
+            'propagate': False,
+        },
+    },
+}
+
 
 ROOT_URLCONF = 'config.urls'
 
@@ -95,12 +252,73 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite for development; DB_ENGINE=postgres for production.
+
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite").lower()
+
+if DB_ENGINE in ("postgres", "postgresql"):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv("DB_NAME", "resume_portal"),
+            'USER': os.getenv("DB_USER", "postgres"),
+            'PASSWORD': os.getenv("DB_PASSWORD", ""),
+            'HOST': os.getenv("DB_HOST", "localhost"),
+            'PORT': os.getenv("DB_PORT", "5432"),
+            # Persistent connections: reuse a connection for this many seconds
+            # instead of reconnecting on every request (0 closes it each time).
+            'CONN_MAX_AGE': int(os.getenv("DB_CONN_MAX_AGE", "60")),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv("DB_CONNECT_TIMEOUT", "5")),
+                'sslmode': os.getenv("DB_SSLMODE", "prefer"),
+                'options': f"-c statement_timeout={int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000'))}",
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("DB_NAME", str(BASE_DIR / 'db.sqlite3')),
+            'OPTIONS': {
+                # Wait for the write lock instead of failing with "database is locked",
+                # take it when a transaction starts (not on its first write), and let
+                # readers run alongside the writer (WAL).
+                'timeout': int(os.getenv("SQLITE_TIMEOUT", "20")),
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            },
+        }
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Per-process memory by default; use "db" (run `manage.py createcachetable`)
+# or "redis" to share cached values between workers.
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem")
+if CACHE_BACKEND == "redis":
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv("REDIS_URL", "redis://127.0.0.1:6379/1"),
+        }
+    }
+elif CACHE_BACKEND == "db":
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
-}
 
 
 # Password validation
@@ -0,0 +1,112 @@
+"""
+Async versions of the Graph proxy views, served under /api/async/.
+
+get_site_id, get_drives, fetch_resumes and fetch_site_resumes do little but
+wait on Graph. Under ASGI these coroutines release the event loop while a
+Graph call is in flight, so one worker can have hundreds of them waiting at
+once (HTTP_ASYNC_MAX_CONNECTIONS) instead of one per thread. Request and
+response bodies match the sync DRF views in core.views; DRF's api_view only
+runs sync views, so these are plain Django views.
+"""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from .graph_async import alist_drives, alist_resume_folder, alist_unparsed_resumes, aresolve_site_id
+from .models import SharePointSite
+from .sync import pending_files, sync_site
+
+logger = logging.getLogger(__name__)
+
+
+def _token(request):
+    auth_header = request.headers.get('Authorization')
+    return auth_header.split(' ')[1] if auth_header else None
+
+
+def _data(request):
+    if request.content_type == 'application/json':
+        return json.loads(request.body or b'{}')
+    return request.POST
+
+
+@csrf_exempt
+@require_POST
+async def get_site_id(request):
+    try:
+        access_token = _token(request)
+        if not access_token:
+            return JsonResponse({"error": "No authorization header"}, status=400)
+
+        site_url = _data(request).get('site_url')
+        if not site_url:
+            return JsonResponse({"error": "No site URL provided"}, status=400)
+
+        return JsonResponse({"site_id": await aresolve_site_id(access_token, site_url)})
+    except Exception:
+        logger.exception("Error fetching site ID")
+        return JsonResponse({"error": "Could not fetch the site ID; see the server log"}, status=500)
+
+
+@csrf_exempt
+@require_POST
+async def get_drives(request):
+    try:
+        access_token = _token(request)
+        if not access_token:
+            return JsonResponse({"error": "No authorization header"}, status=400)
+
+        site_id = _data(request).get('site_id')
+        if not site_id:
+            return JsonResponse({"error": "No site ID provided"}, status=400)
+
+        return JsonResponse({"drives": await alist_drives(access_token, site_id)})
+    except Exception:
+        logger.exception("Error fetching drives")
+        return JsonResponse({"error": "Could not fetch the drives; see the server log"}, status=500)
+
+
+@csrf_exempt
+@require_POST
+async def fetch_resumes(request):
+    try:
+        access_token = _token(request)
+        if not access_token:
+            return JsonResponse({"error": "No authorization header"}, status=400)
+        data = _data(request)
+
+        files = await alist_resume_folder(access_token, data.get('site_id'), data.get('drive_id'))
+        return JsonResponse(files, safe=False)
+    except Exception:
+        logger.exception("Error fetching resumes")
+        return JsonResponse({"error": "Could not fetch the resumes; see the server log"}, status=500)
+
+
+@require_GET
+async def fetch_site_resumes(request, pk):
+    """Return only the unparsed resumes for the given saved site."""
+    access_token = _token(request)
+    if not access_token:
+        return JsonResponse({"error": "No authorization header"}, status=400)
+
+    try:
+        site = await SharePointSite.objects.aget(pk=pk)
+    except SharePointSite.DoesNotExist:
+        return JsonResponse({"error": "Site not found"}, status=404)
+
+    try:
+        if request.GET.get('sync') == 'delta':
+            # The delta sync is bulk ORM work; it runs in Django's sync thread as one unit.
+            def delta():
+                sync_site(access_token, site)
+                return pending_files(site)
+
+            return JsonResponse(await sync_to_async(delta)(), safe=False)
+        return JsonResponse(await alist_unparsed_resumes(access_token, site), safe=False)
+    except Exception:
+        logger.exception("Error listing resumes for site %s", pk)
+        return JsonResponse({"error": "Could not list the site's resumes; see the server log"}, status=500)
@@ -0,0 +1,217 @@
+"""
+Duplicate candidates.
+
+The same person often turns up several times across sites and uploads, each
+copy under its own file_id. Every saved candidate is linked to the oldest
+candidate it duplicates (Candidate.canonical, left empty on the canonical
+record itself). Two candidates are duplicates when
+
+* their resume texts are near-duplicates: a MinHash Jaccard estimate of at
+  least DEDUPE_LINK_THRESHOLD, among the candidates that share an LSH band
+  key (FingerprintBand) rather than across all of them, or
+* they have the same normalized email or phone number
+  (fastpath.email_key / phone_key).
+
+Links are only ever merged, never split, so an edited resume does not break
+up a cluster; ``manage.py dedupe_candidates --reset`` relinks from scratch.
+
+``find_near_duplicate`` also runs before the LLM stage: when a near-identical
+resume (DEDUPE_REUSE_THRESHOLD, and SimHashes within DEDUPE_SIMHASH_DISTANCE
+bits) was parsed before, its parse is reused (see pipeline).
+"""
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Candidate, FingerprintBand, ResumeFingerprint
+from .resume_parser import fingerprint as fingerprints
+
+CLUSTER_FIELDS = ("id", "file_id", "name", "email", "phone", "resume_url", "canonical_id")
+
+
+def similar(fp, exclude=None):
+    """[(candidate_id, jaccard, simhash distance)] of stored fingerprints sharing a band with ``fp``, best first."""
+    bands = FingerprintBand.objects.filter(key__in=fp.bands)
+    if exclude is not None:
+        bands = bands.exclude(candidate_id=exclude)
+    ids = set(bands.values_list('candidate_id', flat=True))
+    if not ids:
+        return []
+    matches = []
+    rows = ResumeFingerprint.objects.filter(candidate_id__in=ids).values_list(
+        'candidate_id', 'text_hash', 'minhash', 'simhash'
+    )
+    for candidate_id, text_hash, signature, simhash in rows:
+        if text_hash == fp.text_hash:
+            similarity = 1.0
+        else:
+            similarity = fingerprints.jaccard(fp.minhash, np.frombuffer(bytes(signature), dtype=np.uint32))
+        matches.append((candidate_id, similarity, fingerprints.hamming(fp.simhash, simhash)))
+    matches.sort(key=lambda m: (-m[1], m[0]))
+    return matches
+
+
+def find_near_duplicate(fp, exclude=None):
+    """The closest already parsed (not cheap-mode) candidate with near-identical text, or None."""
+    for candidate_id, similarity, distance in similar(fp, exclude):
+        if similarity < settings.DEDUPE_REUSE_THRESHOLD:
+            break
+        if distance > settings.DEDUPE_SIMHASH_DISTANCE:
+            continue
+        candidate = Candidate.objects.filter(pk=candidate_id).first()
+        if candidate and candidate.parsed_data and candidate.parsed_data.get('parse_mode') != 'cheap':
+            return candidate
+    return None
+
+
+def store_fingerprint(candidate, fp):
+    with transaction.atomic():
+        ResumeFingerprint.objects.update_or_create(
+            candidate_id=candidate.pk,
+            defaults={'text_hash': fp.text_hash, 'minhash': fp.minhash.tobytes(), 'simhash': fp.simhash},
+        )
+        FingerprintBand.objects.filter(candidate_id=candidate.pk).delete()
+        FingerprintBand.objects.bulk_create(
+            [FingerprintBand(candidate_id=candidate.pk, key=key) for key in set(fp.bands)]
+        )
+
+
+def link(candidate, fp=None):
+    """
+    Link ``candidate`` and every cluster it duplicates under the oldest
+    candidate among them; returns the canonical id.
+    """
+    related = set()
+    if fp is not None:
+        related.update(
+            candidate_id for candidate_id, similarity, _ in similar(fp, exclude=candidate.pk)
+            if similarity >= settings.DEDUPE_LINK_THRESHOLD
+        )
+    contact = Q()
+    if candidate.email_key:
+        contact |= Q(email_key=candidate.email_key)
+    if candidate.phone_key:
+        contact |= Q(phone_key=candidate.phone_key)
+    if contact:
+        related.update(Candidate.objects.filter(contact).exclude(pk=candidate.pk).values_list('pk', flat=True))
+
+    roots = {candidate.pk, *(
+        canonical_id or pk
+        for pk, canonical_id in Candidate.objects.filter(pk__in=related).values_list('pk', 'canonical_id')
+    )}
+    root = min(roots)
+    if len(roots) > 1:
+        Candidate.objects.filter(Q(pk__in=roots) | Q(canonical_id__in=roots)).exclude(pk=root).update(canonical_id=root)
+    canonical_id = root if root != candidate.pk else None
+    if candidate.canonical_id != canonical_id:
+        Candidate.objects.filter(pk=candidate.pk).update(canonical_id=canonical_id)
+    candidate.canonical_id = canonical_id
+    return root
+
+
+def register(candidate, fp=None):
+    """Store the fingerprint of a freshly saved candidate (when known) and link its duplicates."""
+    if fp is not None:
+        store_fingerprint(candidate, fp)
+    return link(candidate, fp)
+
+
+def _linkable(pairs):
+    """
+    The (candidate, fingerprint) pairs that share an LSH band or a contact key
+    with another candidate, or are linked already; the rest have nothing to link.
+    """
+    band_owners = defaultdict(set)
+    keys = {key for _, fp in pairs if fp is not None for key in fp.bands}
+    if keys:
+        for candidate_id, key in FingerprintBand.objects.filter(key__in=keys).values_list('candidate_id', 'key'):
+            band_owners[key].add(candidate_id)
+    email_owners, phone_owners = defaultdict(set), defaultdict(set)
+    emails = {c.email_key for c, _ in pairs if c.email_key}
+    phones = {c.phone_key for c, _ in pairs if c.phone_key}
+    if emails or phones:
+        rows = Candidate.objects.filter(Q(email_key__in=emails) | Q(phone_key__in=phones))
+        for pk, email, phone in rows.values_list('pk', 'email_key', 'phone_key'):
+            email_owners[email].add(pk)
+            phone_owners[phone].add(pk)
+    for candidate, fp in pairs:
+        others = set(email_owners.get(candidate.email_key) or ()) | set(phone_owners.get(candidate.phone_key) or ())
+        if fp is not None:
+            for key in fp.bands:
+                others |= band_owners.get(key, set())
+        if candidate.canonical_id or others - {candidate.pk}:
+            yield candidate, fp
+
+
+def register_bulk(pairs):
+    """
+    register for a batch of (candidate, fingerprint or None) pairs: the
+    fingerprints are stored in one upsert, and only candidates that can have
+    a duplicate go through link().
+    """
+    fps = {candidate.pk: fp for candidate, fp in pairs if fp is not None}
+    with transaction.atomic():
+        if fps:
+            ResumeFingerprint.objects.bulk_create(
+                [
+                    ResumeFingerprint(candidate_id=pk, text_hash=fp.text_hash, minhash=fp.minhash.tobytes(),
+                                      simhash=fp.simhash)
+                    for pk, fp in fps.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['candidate'],
+                update_fields=['text_hash', 'minhash', 'simhash', 'updated_at'],
+            )
+            FingerprintBand.objects.filter(candidate_id__in=fps).delete()
+            FingerprintBand.objects.bulk_create(
+                [FingerprintBand(candidate_id=pk, key=key) for pk, fp in fps.items() for key in set(fp.bands)]
+            )
+        for candidate, fp in list(_linkable(pairs)):
+            link(candidate, fp)
+
+
+def relink(candidates, reset=False):
+    """Link candidates again from their stored fingerprints and contact keys; returns the cluster count."""
+    if reset:
+        Candidate.objects.exclude(canonical=None).update(canonical=None)
+    stored = ResumeFingerprint.objects.in_bulk()
+    for candidate in candidates:
+        row = stored.get(candidate.pk)
+        fp = None
+        if row is not None:
+            fp = fingerprints.Fingerprint(
+                row.text_hash, np.frombuffer(bytes(row.minhash), dtype=np.uint32), row.simhash
+            )
+        link(candidate, fp)
+    return Candidate.objects.filter(duplicates__isnull=False).distinct().count()
+
+
+def clusters(limit=50, after=0):
+    """
+    Duplicate clusters with canonical id above ``after``, oldest first, as
+    (clusters, next cursor or None).
+    """
+    roots = list(
+        Candidate.objects.filter(duplicates__isnull=False, pk__gt=after)
+        .order_by('pk').values_list('pk', flat=True).distinct()[:limit + 1]
+    )
+    next_after = None
+    if len(roots) > limit:
+        roots = roots[:limit]
+        next_after = roots[-1]
+    members = Candidate.objects.filter(Q(pk__in=roots) | Q(canonical_id__in=roots)).order_by('pk')
+    grouped = {root: {"canonical": None, "duplicates": []} for root in roots}
+    for row in members.values(*CLUSTER_FIELDS):
+        if row['canonical_id'] is None:
+            grouped[row['id']]["canonical"] = row
+        else:
+            grouped[row['canonical_id']]["duplicates"].append(row)
+    result = []
+    for root in roots:
+        cluster = grouped[root]
+        cluster["size"] = 1 + len(cluster["duplicates"])
+        result.append(cluster)
+    return result, next_after
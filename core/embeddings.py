@@ -0,0 +1,299 @@
+"""
+Semantic candidate matching with locally computed embeddings.
+
+Each candidate's profile text (summary, skills, domains, experience and
+projects) is encoded on the CPU into an L2-normalized float32 vector and
+stored in CandidateEmbedding. Every process keeps the vectors of the active
+encoder in one contiguous float32 matrix, so a job description is matched
+with a single matrix-vector product and an argpartition for the top k.
+
+Encoders: a sentence-transformers model when that package is installed
+(EMBEDDING_BACKEND "auto" or "sentence-transformers"), otherwise a
+feature-hashing encoder (word unigrams and bigrams, sublinear term
+frequency) that needs nothing beyond numpy. The hashing encoder is
+stateless (no fitted vocabulary or IDF), so a candidate's vector never
+changes when other candidates are added and updates stay incremental.
+
+``embed_candidate`` is called whenever a candidate is saved; rows written
+by other processes are picked up on the next ``match`` via updated_at.
+"""
+import hashlib
+import logging
+import math
+import re
+import threading
+import zlib
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+
+from .models import CandidateEmbedding
+from .search_index import build_document
+
+logger = logging.getLogger(__name__)
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or our the their this to was were will "
+    "with we you your i my me he she they them who which that than then also into over per using used via "
+    "etc including such".split()
+)
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]")
+
+
+class HashingEncoder:
+    """Signed feature hashing of word unigrams and bigrams into ``dim`` buckets."""
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text):
+        tokens = [t for t in _TOKEN.findall(text.lower()) if t not in STOP_WORDS]
+        return Counter(tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])])
+
+    def encode_one(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, count in self._features(text).items():
+            h = zlib.crc32(feature.encode('utf-8'))
+            weight = 1.0 + math.log(count)
+            vector[h % self.dim] += weight if h & 0x80000000 else -weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, texts):
+        return np.vstack([self.encode_one(t) for t in texts]) if texts else np.zeros((0, self.dim), np.float32)
+
+
+class SentenceTransformerEncoder:
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st:{model_name}"
+
+    def encode(self, texts):
+        return self.model.encode(
+            list(texts), batch_size=32, normalize_embeddings=True, convert_to_numpy=True
+        ).astype(np.float32)
+
+    def encode_one(self, text):
+        return self.encode([text])[0]
+
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+def get_encoder():
+    """The configured encoder, created once per process."""
+    global _encoder
+    with _encoder_lock:
+        if _encoder is None:
+            backend = settings.EMBEDDING_BACKEND
+            if backend in ('auto', 'sentence-transformers'):
+                try:
+                    _encoder = SentenceTransformerEncoder(settings.EMBEDDING_MODEL)
+                except ImportError:
+                    if backend != 'auto':
+                        raise
+                    logger.info("sentence-transformers is not installed; using the hashing encoder")
+            if _encoder is None:
+                _encoder = HashingEncoder(settings.EMBEDDING_DIM)
+        return _encoder
+
+
+def candidate_text(candidate) -> str:
+    doc = build_document(candidate)
+    parts = [doc['summary'], doc['skills'], " ".join(candidate.domain_classification or []),
+             doc['experience'], doc['projects']]
+    return "\n".join(p for p in parts if p)
+
+
+def _text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class VectorIndex:
+    """In-memory float32 matrix of candidate vectors with id <-> row bookkeeping."""
+
+    def __init__(self, encoder_name, dim):
+        self.encoder_name = encoder_name
+        self.dim = dim
+        self.matrix = np.zeros((0, dim), dtype=np.float32)  # capacity grows by doubling
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.rows = {}  # candidate id -> row
+        self.size = 0
+        self.synced_at = None
+        self.lock = threading.RLock()
+
+    def _grow(self, needed):
+        capacity = max(needed, 2 * len(self.ids), 1024)
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[:self.size] = self.ids[:self.size]
+        self.matrix, self.ids = matrix, ids
+
+    def upsert(self, candidate_id, vector):
+        with self.lock:
+            row = self.rows.get(candidate_id)
+            if row is None:
+                if self.size == len(self.ids):
+                    self._grow(self.size + 1)
+                row = self.size
+                self.size += 1
+                self.rows[candidate_id] = row
+                self.ids[row] = candidate_id
+            self.matrix[row] = vector
+
+    def remove(self, candidate_id):
+        with self.lock:
+            row = self.rows.pop(candidate_id, None)
+            if row is None:
+                return
+            last = self.size - 1
+            if row != last:
+                # Move the last row into the hole to keep the matrix dense.
+                self.matrix[row] = self.matrix[last]
+                self.ids[row] = self.ids[last]
+                self.rows[int(self.ids[row])] = row
+            self.size = last
+
+    def refresh(self):
+        """Load rows written (by any process) since the last refresh."""
+        qs = CandidateEmbedding.objects.filter(encoder=self.encoder_name)
+        if self.synced_at is not None:
+            qs = qs.filter(updated_at__gte=self.synced_at)
+        rows = list(qs.values_list('candidate_id', 'vector', 'updated_at'))
+        with self.lock:
+            for candidate_id, vector, updated_at in rows:
+                self.upsert(candidate_id, np.frombuffer(bytes(vector), dtype=np.float32))
+                if self.synced_at is None or updated_at > self.synced_at:
+                    self.synced_at = updated_at
+        return len(rows)
+
+    def search(self, vector, k):
+        """Top ``k`` (candidate_id, cosine similarity) pairs, best first."""
+        with self.lock:
+            if not self.size:
+                return []
+            scores = self.matrix[:self.size] @ vector
+            k = min(k, self.size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(self.ids[i]), float(scores[i])) for i in top]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    encoder = get_encoder()
+    with _index_lock:
+        if _index is None or _index.encoder_name != encoder.name:
+            _index = VectorIndex(encoder.name, encoder.dim)
+        return _index
+
+
+def reset_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def embed_candidate(candidate, force=False):
+    """Encode one candidate (unless its text is unchanged) and update the index."""
+    encoder = get_encoder()
+    text = candidate_text(candidate)
+    digest = _text_hash(text)
+    existing = CandidateEmbedding.objects.filter(candidate_id=candidate.pk).only('encoder', 'text_hash').first()
+    if not force and existing and existing.encoder == encoder.name and existing.text_hash == digest:
+        return False
+    vector = encoder.encode_one(text).astype(np.float32)
+    CandidateEmbedding.objects.update_or_create(
+        candidate_id=candidate.pk,
+        defaults={'encoder': encoder.name, 'vector': vector.tobytes(), 'text_hash': digest},
+    )
+    if _index is not None and _index.encoder_name == encoder.name:
+        _index.upsert(candidate.pk, vector)
+    return True
+
+
+def embed_candidates(candidates):
+    """embed_candidate for a batch: one encode call and one upsert for the candidates whose text changed."""
+    encoder = get_encoder()
+    texts = {c.pk: candidate_text(c) for c in candidates}
+    current = dict(
+        CandidateEmbedding.objects.filter(candidate_id__in=texts, encoder=encoder.name)
+        .values_list('candidate_id', 'text_hash')
+    )
+    changed = [(pk, text, _text_hash(text)) for pk, text in texts.items()]
+    changed = [row for row in changed if current.get(row[0]) != row[2]]
+    if not changed:
+        return 0
+    vectors = encoder.encode([text for _, text, _ in changed]).astype(np.float32)
+    CandidateEmbedding.objects.bulk_create(
+        [
+            CandidateEmbedding(candidate_id=pk, encoder=encoder.name, vector=vector.tobytes(), text_hash=digest)
+            for (pk, _, digest), vector in zip(changed, vectors)
+        ],
+        update_conflicts=True,
+        unique_fields=['candidate'],
+        update_fields=['encoder', 'vector', 'text_hash', 'updated_at'],
+    )
+    if _index is not None and _index.encoder_name == encoder.name:
+        for (pk, _, _), vector in zip(changed, vectors):
+            _index.upsert(pk, vector)
+    return len(changed)
+
+
+def rebuild(candidates, batch_size=64, force=False):
+    """Re-embed candidates in batches; returns (encoded, skipped)."""
+    encoder = get_encoder()
+    current = dict(
+        CandidateEmbedding.objects.filter(encoder=encoder.name).values_list('candidate_id', 'text_hash')
+    )
+    encoded = skipped = 0
+    batch = []
+
+    def flush():
+        nonlocal encoded
+        vectors = encoder.encode([text for _, text, _ in batch])
+        for (candidate_id, _, digest), vector in zip(batch, vectors):
+            CandidateEmbedding.objects.update_or_create(
+                candidate_id=candidate_id,
+                defaults={'encoder': encoder.name, 'vector': vector.astype(np.float32).tobytes(), 'text_hash': digest},
+            )
+        encoded += len(batch)
+        batch.clear()
+
+    for candidate in candidates:
+        text = candidate_text(candidate)
+        digest = _text_hash(text)
+        if not force and current.get(candidate.pk) == digest:
+            skipped += 1
+            continue
+        batch.append((candidate.pk, text, digest))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    reset_index()
+    return encoded, skipped
+
+
+def match(text, k=10):
+    """Top ``k`` (candidate_id, score) pairs for a job description."""
+    index = get_index()
+    index.refresh()
+    return index.search(get_encoder().encode_one(text).astype(np.float32), k)
+
+
+def forget(candidate_ids):
+    """Drop candidates that no longer exist from this process's index."""
+    if _index is not None:
+        for candidate_id in candidate_ids:
+            _index.remove(candidate_id)
@@ -0,0 +1,116 @@
+"""
+Async counterparts of the graph_utils helpers behind the Graph proxy views.
+
+Requests go through ``http_client.arequest`` (shared httpx pool, same retries
+and rate limits), and the metadata cache through the Django cache's async
+methods, so many lookups can wait on Graph at once on one event loop. Cache
+keys are the sync helpers' own (scoped to the caller's token), so both paths
+share cached site ids, drive lists and Resume folder ids.
+
+Database access uses the async ORM API (``aget``, ``asave``) or
+``sync_to_async``, so each query runs in Django's sync thread rather than on
+the event loop.
+"""
+import logging
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from . import http_client, metrics
+from .graph_utils import _metadata_key, split_site_url
+from .sync import parsed_file_ids
+
+logger = logging.getLogger(__name__)
+
+
+async def _cached_metadata(key, fetch):
+    value = await cache.aget(key)
+    if value is None:
+        value = await fetch()
+        if settings.GRAPH_METADATA_CACHE_TTL > 0:
+            await cache.aset(key, value, timeout=settings.GRAPH_METADATA_CACHE_TTL)
+    return value
+
+
+async def _get_json(access_token, url, endpoint):
+    with metrics.span(endpoint):
+        response = await http_client.aget(url, headers={'Authorization': f'Bearer {access_token}'},
+                                          endpoint=endpoint)
+        response.raise_for_status()
+        return response.json()
+
+
+async def aresolve_site_id(access_token, site_url):
+    hostname, path = split_site_url(site_url)
+
+    async def fetch():
+        data = await _get_json(access_token, f'{settings.GRAPH_API_ENDPOINT}/sites/{hostname}:{path}', 'graph.site')
+        return data['id']
+
+    return await _cached_metadata(_metadata_key('site', access_token, hostname, path.lower()), fetch)
+
+
+async def alist_drives(access_token, site_id):
+    async def fetch():
+        data = await _get_json(access_token, f'{settings.GRAPH_API_ENDPOINT}/sites/{site_id}/drives', 'graph.drives')
+        return data.get('value', [])
+
+    return await _cached_metadata(_metadata_key('drives', access_token, site_id), fetch)
+
+
+async def aget_resume_folder_id(access_token, site_id, drive_id):
+    async def fetch():
+        url = f"{settings.GRAPH_API_ENDPOINT}/sites/{site_id}/drives/{drive_id}/root:/Resume"
+        return (await _get_json(access_token, url, 'graph.resume_folder'))['id']
+
+    return await _cached_metadata(_metadata_key('resume-folder', access_token, drive_id), fetch)
+
+
+async def aget_paged(access_token, url):
+    """Yield every item of a Graph collection, following @odata.nextLink."""
+    while url:
+        data = await _get_json(access_token, url, 'graph.list')
+        for item in data.get('value', []):
+            yield item
+        url = data.get('@odata.nextLink')
+
+
+async def alist_resume_folder(access_token, site_id, drive_id, folder_id=None):
+    folder_id = folder_id or await aget_resume_folder_id(access_token, site_id, drive_id)
+    children_url = (
+        f"{settings.GRAPH_API_ENDPOINT}/sites/{site_id}/drives/{drive_id}/items/{folder_id}/children"
+        "?$top=999"
+    )
+    return [item async for item in aget_paged(access_token, children_url)]
+
+
+async def aresume_folder_id(access_token, site):
+    """sync.resume_folder_id: looked up once, then kept on the site."""
+    if not site.resume_folder_id:
+        site.resume_folder_id = await aget_resume_folder_id(access_token, site.site_id, site.drive_id)
+        await site.asave(update_fields=['resume_folder_id'])
+    return site.resume_folder_id
+
+
+async def alist_site_resume_folder(access_token, site):
+    """sync.list_site_resume_folder: a stale folder id is resolved again once."""
+    try:
+        folder_id = await aresume_folder_id(access_token, site)
+        return await alist_resume_folder(access_token, site.site_id, site.drive_id, folder_id)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code != 404:
+            raise
+    logger.info("Resume folder of site %s not found, resolving it again", site.pk)
+    await cache.adelete(_metadata_key('resume-folder', access_token, site.drive_id))
+    site.resume_folder_id = ''
+    folder_id = await aresume_folder_id(access_token, site)
+    return await alist_resume_folder(access_token, site.site_id, site.drive_id, folder_id)
+
+
+async def alist_unparsed_resumes(access_token, site):
+    """ingestion.list_unparsed_resumes: the Resume folder's files that have no fully parsed Candidate yet."""
+    files = await alist_site_resume_folder(access_token, site)
+    parsed_ids = await sync_to_async(parsed_file_ids)([f['id'] for f in files])
+    return [f for f in files if f['id'] not in parsed_ids]
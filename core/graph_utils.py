@@ -1,8 +1,32 @@
 # core/graph_utils.py
-import requests
+import hashlib
+import logging
+import tempfile
+import threading
+import time
+
 from django.conf import settings
+from django.core.cache import cache
+
+from . import http_client, metrics
+from .resume_parser.extraction import UnsupportedFileType
+
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_KEY = 'graph:app-token'
+TOKEN_LOCK_KEY = 'graph:app-token:lock'
+METADATA_CACHE_PREFIX = 'graph:meta:'
 
-def get_access_token():
+DOWNLOADED_BYTES = metrics.counter('resume_graph_downloaded_bytes_total', "Bytes of file content downloaded from Graph.")
+DOWNLOAD_SIZE = metrics.histogram('resume_graph_download_bytes', "Size of each downloaded file.",
+                                  buckets=metrics.BYTE_BUCKETS)
+DOWNLOADS_REJECTED = metrics.counter('resume_graph_downloads_rejected_total',
+                                     "Downloads aborted for their content type or size.", ('reason',))
+
+_token_lock = threading.Lock()
+_token = {'value': None, 'expires_at': 0.0}
+
+def _request_access_token():
     url = f"https://login.microsoftonline.com/{settings.TENANT_ID}/oauth2/v2.0/token"
     headers = {'Content-Type': 'application/x-www-form-urlencoded'}
     data = {
@@ -11,36 +35,288 @@ def get_access_token():
         'scope': 'https://graph.microsoft.com/.default',
         'grant_type': 'client_credentials',
     }
-    response = requests.post(url, headers=headers, data=data)
-    return response.json().get("access_token")
+    response = http_client.post(url, headers=headers, data=data, endpoint='graph.token')
+    response.raise_for_status()
+    payload = response.json()
+    return {
+        'value': payload['access_token'],
+        'expires_at': time.time() + int(payload.get('expires_in', 3599)),
+    }
+
+def _shared_token():
+    entry = cache.get(TOKEN_CACHE_KEY)
+    if entry and entry['expires_at'] - time.time() > settings.GRAPH_TOKEN_REFRESH_SKEW:
+        return entry
+    return None
+
+def _refresh_token(force_refresh=False):
+    """Fetch a new token; with the shared cache only one worker does so at a time."""
+    if not settings.GRAPH_TOKEN_SHARED_CACHE:
+        return _request_access_token()
+
+    entry = None if force_refresh else _shared_token()
+    if entry:
+        return entry
+    locked = cache.add(TOKEN_LOCK_KEY, 1, timeout=settings.HTTP_READ_TIMEOUT)
+    if not locked:
+        # Another worker is fetching; wait briefly for it to publish the token.
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            time.sleep(0.2)
+            entry = _shared_token()
+            if entry:
+                return entry
+    try:
+        entry = _request_access_token()
+        cache.set(TOKEN_CACHE_KEY, entry, timeout=int(entry['expires_at'] - time.time()))
+        return entry
+    finally:
+        if locked:
+            cache.delete(TOKEN_LOCK_KEY)
+
+def _ensure_fresh_token(force_refresh):
+    global _token
+    remaining = _token['expires_at'] - time.time()
+    if force_refresh or not _token['value'] or remaining <= settings.GRAPH_TOKEN_REFRESH_SKEW:
+        _token = _refresh_token(force_refresh)
+    return _token['value']
+
+def get_access_token(force_refresh=False):
+    """
+    Return an app-only Graph token, cached until shortly before it expires.
+
+    Inside the refresh window (GRAPH_TOKEN_REFRESH_SKEW seconds before expiry)
+    one thread refreshes while the others keep using the still-valid token;
+    once it has expired, callers wait for a single refresh.
+    """
+    if not force_refresh and _token['value']:
+        remaining = _token['expires_at'] - time.time()
+        if remaining > settings.GRAPH_TOKEN_REFRESH_SKEW:
+            return _token['value']
+        if remaining > 0:
+            if not _token_lock.acquire(blocking=False):
+                return _token['value']
+            try:
+                return _ensure_fresh_token(False)
+            except Exception:
+                logger.warning("Proactive Graph token refresh failed, using current token", exc_info=True)
+                return _token['value']
+            finally:
+                _token_lock.release()
+
+    with _token_lock:
+        return _ensure_fresh_token(force_refresh)
 
 def fetch_sharepoint_files(access_token):
     headers = {'Authorization': f'Bearer {access_token}'}
-    print("Resume fetched")
     url = f"{settings.GRAPH_API_ENDPOINT}/sites/{settings.SHAREPOINT_SITE_ID}/drives/{settings.SHAREPOINT_DRIVE_ID}/root/children"
-    response = requests.get(url, headers=headers)
-    return response.json().get('value', [])
+    response = http_client.get(url, headers=headers, endpoint='graph.files')
+    files = response.json().get('value', [])
+    logger.info("Fetched %d files from the SharePoint drive root", len(files))
+    return files
 
 def download_file(access_token, file_id):
-    headers = {'Authorization': f'Bearer {access_token}'}
     download_url = f"{settings.GRAPH_API_ENDPOINT}/drives/{settings.SHAREPOINT_DRIVE_ID}/items/{file_id}/content"
-    response = requests.get(download_url, headers=headers)
-    return response.content
+    with _stream(access_token, download_url, file_id) as f:
+        return f.read()
+
+def _metadata_key(kind, access_token, *parts):
+    """
+    Cache key for Graph metadata fetched with ``access_token``.
+
+    The token is part of the key, so a cached answer is only handed back to a
+    caller presenting the same token Graph already authorized for it.
+    """
+    digest = hashlib.sha1("\x00".join((access_token, *parts)).encode('utf-8')).hexdigest()
+    return f"{METADATA_CACHE_PREFIX}{kind}:{digest}"
+
+def _cached_metadata(key, fetch):
+    """Return the cached value for ``key`` or fetch and cache it for GRAPH_METADATA_CACHE_TTL seconds."""
+    value = cache.get(key)
+    if value is None:
+        value = fetch()
+        if settings.GRAPH_METADATA_CACHE_TTL > 0:
+            cache.set(key, value, timeout=settings.GRAPH_METADATA_CACHE_TTL)
+    return value
+
+def split_site_url(site_url):
+    """Split "https://contoso.sharepoint.com/sites/HR" into ("contoso.sharepoint.com", "/sites/HR")."""
+    if '://' in site_url:
+        site_url = site_url.split('://', 1)[1]
+    parts = site_url.strip('/').split('/')
+    return parts[0].lower(), '/' + '/'.join(parts[1:])
+
+def resolve_site_id(access_token, site_url):
+    """Graph site id for a SharePoint site URL, cached per hostname and path."""
+    hostname, path = split_site_url(site_url)
+
+    def fetch():
+        headers = {'Authorization': f'Bearer {access_token}'}
+        url = f'{settings.GRAPH_API_ENDPOINT}/sites/{hostname}:{path}'
+        with metrics.span('graph.site'):
+            response = http_client.get(url, headers=headers, endpoint='graph.site')
+            response.raise_for_status()
+            return response.json()['id']
+
+    return _cached_metadata(_metadata_key('site', access_token, hostname, path.lower()), fetch)
 
 def get_site_id(access_token, domain, site_name):
-    headers = {'Authorization': f'Bearer {access_token}'}
-    url = f'https://graph.microsoft.com/v1.0/sites/{domain}:/sites/{site_name}'
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    return response.json()['id']
+    return resolve_site_id(access_token, f'{domain}/sites/{site_name}')
 
-def get_drive_id(access_token, site_id, drive_name):
-    headers = {'Authorization': f'Bearer {access_token}'}
-    url = f'https://graph.microsoft.com/v1.0/sites/{site_id}/drives'
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    drives = response.json().get('value', [])
+def list_drives(access_token, site_id):
+    """The site's document libraries, cached per site."""
+    def fetch():
+        headers = {'Authorization': f'Bearer {access_token}'}
+        url = f'{settings.GRAPH_API_ENDPOINT}/sites/{site_id}/drives'
+        with metrics.span('graph.drives'):
+            response = http_client.get(url, headers=headers, endpoint='graph.drives')
+            response.raise_for_status()
+            return response.json().get('value', [])
+
+    return _cached_metadata(_metadata_key('drives', access_token, site_id), fetch)
+
+def select_drive(drives, drive_name=None):
+    """The drive named ``drive_name`` (case-insensitive), or the first drive when no name is given."""
+    if not drives:
+        raise ValueError('No drives found.')
+    if not drive_name:
+        return drives[0]
     for drive in drives:
-        if drive.get('name') == drive_name:
-            return drive.get('id')
+        if (drive.get('name') or '').lower() == drive_name.lower():
+            return drive
     raise ValueError(f'Drive named "{drive_name}" not found.')
+
+def get_drive_id(access_token, site_id, drive_name):
+    return select_drive(list_drives(access_token, site_id), drive_name)['id']
+
+def get_drive_item(access_token, site_id, drive_id, file_id):
+    headers = {'Authorization': f'Bearer {access_token}'}
+    url = (
+        f"{settings.GRAPH_API_ENDPOINT}/sites/{site_id}"
+        f"/drives/{drive_id}/items/{file_id}?$select=name,webUrl,eTag"
+    )
+    with metrics.span('graph.metadata'):
+        response = http_client.get(url, headers=headers, endpoint='graph.drive_item')
+        response.raise_for_status()
+        return response.json()
+
+class DownloadRejected(UnsupportedFileType):
+    """The file is not worth parsing: not a resume content type, or over DOWNLOAD_MAX_BYTES."""
+
+def _reject(reason, message):
+    DOWNLOADS_REJECTED.inc(reason=reason)
+    return DownloadRejected(message)
+
+def _check_headers(response, file_id, limit):
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    if content_type and content_type not in settings.DOWNLOAD_ALLOWED_TYPES:
+        raise _reject('type', f"{file_id} is {content_type}, not a resume")
+    length = response.headers.get('Content-Length', '')
+    if limit and length.isdigit() and int(length) > limit:
+        raise _reject('size', f"{file_id} is {length} bytes, over the {limit} byte limit")
+
+def _stream(access_token, url, file_id, dest=None):
+    headers = {'Authorization': f'Bearer {access_token}'}
+    limit = settings.DOWNLOAD_MAX_BYTES
+    f = dest
+    if f is None:
+        f = tempfile.SpooledTemporaryFile(settings.DOWNLOAD_SPOOL_BYTES, dir=settings.DOWNLOAD_SPOOL_DIR or None)
+    size = 0
+    try:
+        with metrics.span('graph.download'):
+            with http_client.get(url, headers=headers, endpoint='graph.content', stream=True) as response:
+                response.raise_for_status()
+                _check_headers(response, file_id, limit)
+                for chunk in response.iter_content(settings.DOWNLOAD_CHUNK_BYTES):
+                    size += len(chunk)
+                    if limit and size > limit:
+                        raise _reject('size', f"{file_id} is over the {limit} byte limit")
+                    f.write(chunk)
+    except BaseException:
+        if dest is None:
+            f.close()
+        raise
+    DOWNLOADED_BYTES.inc(size)
+    DOWNLOAD_SIZE.observe(size)
+    f.seek(0)
+    return f
+
+def stream_drive_item(access_token, site_id, drive_id, file_id, dest=None):
+    """
+    Download a drive item chunk by chunk into ``dest`` (a binary file) or a
+    SpooledTemporaryFile that moves to disk past DOWNLOAD_SPOOL_BYTES, and
+    return the file rewound to the start. The caller closes it.
+
+    Content types outside DOWNLOAD_ALLOWED_TYPES and files over
+    DOWNLOAD_MAX_BYTES raise DownloadRejected, from the headers when they
+    tell, so most rejected files are never read.
+    """
+    url = f"{settings.GRAPH_API_ENDPOINT}/sites/{site_id}/drives/{drive_id}/items/{file_id}/content"
+    return _stream(access_token, url, file_id, dest)
+
+def download_drive_item(access_token, site_id, drive_id, file_id):
+    """The item's content as bytes; stream_drive_item keeps large files out of memory."""
+    with stream_drive_item(access_token, site_id, drive_id, file_id) as f:
+        return f.read()
+
+def get_paged(access_token, url):
+    """Yield every item of a Graph collection, following @odata.nextLink."""
+    headers = {'Authorization': f'Bearer {access_token}'}
+    while url:
+        with metrics.span('graph.list'):
+            response = http_client.get(url, headers=headers, endpoint='graph.list')
+            response.raise_for_status()
+            data = response.json()
+        yield from data.get('value', [])
+        url = data.get('@odata.nextLink')
+
+def get_resume_folder_id(access_token, site_id, drive_id):
+    """Item id of the drive's /Resume folder, cached per drive."""
+    def fetch():
+        headers = {'Authorization': f'Bearer {access_token}'}
+        folder_url = f"{settings.GRAPH_API_ENDPOINT}/sites/{site_id}/drives/{drive_id}/root:/Resume"
+        with metrics.span('graph.resume_folder'):
+            folder = http_client.get(folder_url, headers=headers, endpoint='graph.resume_folder')
+            folder.raise_for_status()
+            return folder.json()['id']
+
+    return _cached_metadata(_metadata_key('resume-folder', access_token, drive_id), fetch)
+
+def forget_resume_folder(access_token, drive_id):
+    cache.delete(_metadata_key('resume-folder', access_token, drive_id))
+
+def list_resume_folder(access_token, site_id, drive_id, folder_id=None):
+    folder_id = folder_id or get_resume_folder_id(access_token, site_id, drive_id)
+    children_url = (
+        f"{settings.GRAPH_API_ENDPOINT}/sites/{site_id}/drives/{drive_id}/items/{folder_id}/children"
+        "?$top=999"
+    )
+    return list(get_paged(access_token, children_url))
+
+class DeltaLinkExpired(Exception):
+    pass
+
+def get_drive_delta(access_token, site_id, drive_id, delta_link=None, latest=False):
+    """
+    Return (changed items, new delta link) for a drive.
+
+    Without a delta_link the whole drive is enumerated, unless ``latest`` is
+    set, in which case Graph only hands back a link for changes from now on.
+    """
+    headers = {'Authorization': f'Bearer {access_token}'}
+    url = delta_link or f"{settings.GRAPH_API_ENDPOINT}/sites/{site_id}/drives/{drive_id}/root/delta"
+    if latest and not delta_link:
+        url += "?token=latest"
+    items = []
+    while True:
+        with metrics.span('graph.delta'):
+            response = http_client.get(url, headers=headers, endpoint='graph.delta')
+            if response.status_code == 410:
+                raise DeltaLinkExpired(response.text)
+            response.raise_for_status()
+            data = response.json()
+        items.extend(data.get('value', []))
+        if '@odata.nextLink' in data:
+            url = data['@odata.nextLink']
+        else:
+            return items, data.get('@odata.deltaLink')
@@ -0,0 +1,257 @@
+"""
+Shared HTTP client for all Graph and Gemini calls.
+
+One pooled ``requests.Session`` keeps connections alive across requests and
+threads. Every call gets connect/read timeouts, and throttled or transient
+failures (429, 5xx, connection errors) are retried with exponential backoff,
+honouring ``Retry-After`` when the server sends it. Latency is recorded per
+logical endpoint, exposed through ``metrics()`` and on /metrics (core.metrics).
+
+Every attempt first takes capacity from the upstream's rate limit
+(core.ratelimit), and a 429 pauses that upstream for every worker.
+
+Async views use ``arequest`` instead: the same timeouts, retries, rate
+limits and metrics over ``httpx.AsyncClient`` connection pools shared by
+every coroutine on the event loop (per loop, since an async client cannot be
+used from another loop). The connections are split over several small
+clients used in turn: httpcore checks every pooled connection for every
+waiting request, which gets quadratically slower in one large pool.
+"""
+import asyncio
+import itertools
+import logging
+import random
+import re
+import threading
+import time
+import weakref
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from core import metrics as registry
+from core import ratelimit
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+LATENCY_SAMPLES = 500  # recent latencies kept per endpoint for percentiles
+
+UPSTREAM_SECONDS = registry.histogram(
+    'resume_upstream_request_seconds', "Latency of each Graph/Gemini HTTP attempt.", ('endpoint',),
+)
+UPSTREAM_REQUESTS = registry.counter(
+    'resume_upstream_requests_total', "Graph/Gemini HTTP attempts, by status (\"error\" for no response).",
+    ('endpoint', 'status'),
+)
+UPSTREAM_RETRIES = registry.counter('resume_upstream_retries_total', "Attempts that were retried.", ('endpoint',))
+
+_session = None
+_session_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=settings.HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def _record(endpoint, seconds, status=None, error=False, retry=False):
+    UPSTREAM_SECONDS.observe(seconds, endpoint=endpoint)
+    UPSTREAM_REQUESTS.inc(endpoint=endpoint, status=status if status is not None else 'error')
+    if retry:
+        UPSTREAM_RETRIES.inc(endpoint=endpoint)
+    with _stats_lock:
+        stats = _stats.setdefault(endpoint, {
+            "requests": 0, "errors": 0, "retries": 0, "statuses": {},
+            "total_seconds": 0.0, "max_seconds": 0.0, "samples": deque(maxlen=LATENCY_SAMPLES),
+        })
+        stats["requests"] += 1
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        stats["samples"].append(seconds)
+        if status is not None:
+            stats["statuses"][status] = stats["statuses"].get(status, 0) + 1
+        if error:
+            stats["errors"] += 1
+        if retry:
+            stats["retries"] += 1
+
+
+# Query parameters that carry credentials, should a URL with one end up in an error.
+_SECRET_PARAMS = re.compile(r'([?&](?:key|api_key|access_token|token|client_secret|code|sig)=)[^&#\s\'"]*',
+                            re.IGNORECASE)
+
+
+def describe_error(exc):
+    """
+    A short description of ``exc`` that is safe to store or show: HTTP errors
+    become their status code (their text repeats the request URL), and
+    credentials in any URL query string are masked.
+    """
+    response = getattr(exc, 'response', None)
+    if isinstance(exc, (requests.HTTPError, httpx.HTTPStatusError)) and response is not None:
+        host = requests.utils.urlparse(str(response.url)).netloc if response.url else 'upstream'
+        return f"{type(exc).__name__}: {host} returned {response.status_code}"
+    return _SECRET_PARAMS.sub(r'\1[redacted]', f"{type(exc).__name__}: {exc}")
+
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt):
+    delay = settings.HTTP_BACKOFF_BASE * (2 ** attempt)
+    return min(settings.HTTP_BACKOFF_MAX, delay) * random.uniform(0.5, 1.0)
+
+
+def request(method, url, endpoint=None, timeout=None, max_retries=None, tokens=0, **kwargs):
+    """
+    Send a request through the shared session, retrying throttled and
+    transient failures. Returns the final response; callers still decide
+    whether to ``raise_for_status()``. ``tokens`` is the estimated LLM token
+    cost charged to the rate limit with the first attempt.
+    """
+    endpoint = endpoint or requests.utils.urlparse(url).netloc
+    timeout = timeout or (settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT)
+    max_retries = settings.HTTP_MAX_RETRIES if max_retries is None else max_retries
+    session = get_session()
+
+    for attempt in range(max_retries + 1):
+        last_attempt = attempt == max_retries
+        ratelimit.acquire(endpoint, tokens if attempt == 0 else 0)
+        started = time.monotonic()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            _record(endpoint, time.monotonic() - started, error=True, retry=not last_attempt)
+            if last_attempt:
+                raise
+            delay = _backoff(attempt)
+            logger.warning("%s %s failed (%s), retrying in %.1fs", method, endpoint, e, delay)
+        else:
+            retryable = response.status_code in RETRY_STATUSES
+            _record(endpoint, time.monotonic() - started, status=response.status_code,
+                    error=response.status_code >= 400, retry=retryable and not last_attempt)
+            if retryable:
+                delay = _retry_after(response)
+                delay = _backoff(attempt) if delay is None else min(delay, settings.HTTP_BACKOFF_MAX)
+                if response.status_code == 429:
+                    ratelimit.pause(endpoint, delay)
+            if not retryable or last_attempt:
+                return response
+            logger.warning("%s %s returned %s, retrying in %.1fs",
+                           method, endpoint, response.status_code, delay)
+            response.close()
+        time.sleep(delay)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def get_async_client():
+    """One of the running event loop's pooled ``httpx.AsyncClient``s, taken in turn."""
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.get(loop)
+    if clients is None:
+        size = max(1, settings.HTTP_ASYNC_POOL_SIZE)
+        timeout = httpx.Timeout(settings.HTTP_READ_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+        limits = httpx.Limits(max_connections=size, max_keepalive_connections=size)
+        count = max(1, -(-settings.HTTP_ASYNC_MAX_CONNECTIONS // size))
+        clients = itertools.cycle([httpx.AsyncClient(timeout=timeout, limits=limits) for _ in range(count)])
+        _async_clients[loop] = clients
+    return next(clients)
+
+
+async def arequest(method, url, endpoint=None, timeout=None, max_retries=None, tokens=0, **kwargs):
+    """``request`` for async callers; returns an ``httpx.Response``."""
+    endpoint = endpoint or httpx.URL(url).host
+    if timeout is not None:
+        kwargs['timeout'] = timeout
+    max_retries = settings.HTTP_MAX_RETRIES if max_retries is None else max_retries
+    client = get_async_client()
+
+    for attempt in range(max_retries + 1):
+        last_attempt = attempt == max_retries
+        await ratelimit.aacquire(endpoint, tokens if attempt == 0 else 0)
+        started = time.monotonic()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            _record(endpoint, time.monotonic() - started, error=True, retry=not last_attempt)
+            if last_attempt:
+                raise
+            delay = _backoff(attempt)
+            logger.warning("%s %s failed (%s), retrying in %.1fs", method, endpoint, e, delay)
+        else:
+            retryable = response.status_code in RETRY_STATUSES
+            _record(endpoint, time.monotonic() - started, status=response.status_code,
+                    error=response.status_code >= 400, retry=retryable and not last_attempt)
+            if retryable:
+                delay = _retry_after(response)
+                delay = _backoff(attempt) if delay is None else min(delay, settings.HTTP_BACKOFF_MAX)
+                if response.status_code == 429:
+                    await ratelimit.apause(endpoint, delay)
+            if not retryable or last_attempt:
+                return response
+            logger.warning("%s %s returned %s, retrying in %.1fs",
+                           method, endpoint, response.status_code, delay)
+        await asyncio.sleep(delay)
+
+
+async def aget(url, **kwargs):
+    return await arequest('GET', url, **kwargs)
+
+
+def _percentile(sorted_samples, pct):
+    index = min(len(sorted_samples) - 1, int(round(pct / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def metrics():
+    """Per-endpoint request counts and latency (milliseconds)."""
+    with _stats_lock:
+        snapshot = {name: dict(s, samples=sorted(s["samples"]), statuses=dict(s["statuses"]))
+                    for name, s in _stats.items()}
+    result = {}
+    for name, s in snapshot.items():
+        samples = s.pop("samples")
+        total = s.pop("total_seconds")
+        s["avg_ms"] = round(total / s["requests"] * 1000, 1) if s["requests"] else 0.0
+        s["max_ms"] = round(s.pop("max_seconds") * 1000, 1)
+        s["p50_ms"] = round(_percentile(samples, 50) * 1000, 1) if samples else 0.0
+        s["p95_ms"] = round(_percentile(samples, 95) * 1000, 1) if samples else 0.0
+        result[name] = s
+    return result
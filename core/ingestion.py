@@ -0,0 +1,308 @@
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+from django.conf import settings
+
+from . import http_client
+from .graph_utils import stream_drive_item
+from .persistence import CandidateWriter
+from .resume_parser import cache as parse_cache
+from .resume_parser import extraction, fingerprint, preprocess
+from .resume_parser.pipeline import (
+    PROMPT_VERSION, cache_parse, cheap_parse, file_extension, log_savings, query_resume_llm,
+    query_resume_llm_batch, reuse_duplicate_parse,
+)
+from .sync import list_site_resume_folder, parsed_file_ids, pending_files, sync_site
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FileResult:
+    file_id: str
+    name: str
+    status: str  # "parsed" or "failed"
+    candidate_id: int = None
+    cached: bool = False
+    duplicate_of: int = None  # Candidate whose parse was reused instead of calling the LLM
+    error: str = None
+    seconds: float = 0.0
+    chars_saved: int = 0
+    tokens_saved: int = 0
+
+
+def list_unparsed_resumes(access_token, site):
+    """Return the files in the site's Resume folder that have no fully parsed Candidate yet."""
+    files = list_site_resume_folder(access_token, site)
+    parsed_ids = parsed_file_ids(f['id'] for f in files)
+    return [f for f in files if f['id'] not in parsed_ids]
+
+
+def _discard(download):
+    """Close a spooled download, or delete a downloaded temp file."""
+    if isinstance(download, str):
+        try:
+            os.unlink(download)
+        except FileNotFoundError:
+            pass
+    elif download is not None:
+        download.close()
+
+
+@contextmanager
+def _discarding(downloads):
+    try:
+        yield downloads
+    finally:
+        for download in downloads.values():
+            _discard(download)
+
+
+class IngestionPipeline:
+    """
+    Bounded three-stage pipeline: download -> extract -> LLM parse.
+
+    Each stage has its own pool (threads for I/O, processes for extraction
+    and prompt preprocessing) so downloads, extraction and Gemini calls for
+    different files overlap. At most ``max_in_flight`` files are in flight
+    at once, and downloads are spooled to disk past DOWNLOAD_SPOOL_BYTES
+    rather than held in memory. All database work (parse cache lookups and
+    candidate saves) happens on the calling thread; candidates are written
+    ``save_batch_size`` at a time by a core.persistence.CandidateWriter.
+
+    Short resumes are sent to Gemini ``llm_batch_size`` at a time, up to
+    LLM_BATCH_TOKEN_BUDGET tokens, in one prompt (see structured.parse_batch).
+    Longer ones get a request each.
+
+    In ``cheap`` mode the LLM stage is skipped: candidates are saved with the
+    deterministic fast-path fields only, for bulk triage.
+    """
+
+    def __init__(self, access_token, site_id, drive_id, download_workers=None,
+                 extract_workers=None, llm_workers=None, on_progress=None, cheap=None, save_batch_size=None,
+                 llm_batch_size=None):
+        self.access_token = access_token
+        self.site_id = site_id
+        self.drive_id = drive_id
+        self.download_workers = download_workers or settings.INGEST_DOWNLOAD_WORKERS
+        self.extract_workers = extract_workers or settings.INGEST_EXTRACT_WORKERS
+        self.llm_workers = llm_workers or settings.INGEST_LLM_WORKERS
+        self.max_in_flight = self.download_workers + self.extract_workers + self.llm_workers
+        self.on_progress = on_progress
+        self.cheap = settings.INGEST_CHEAP_MODE if cheap is None else cheap
+        self.save_batch_size = save_batch_size or settings.INGEST_SAVE_BATCH_SIZE
+        self.save_stats = None
+        self.llm_batch_size = llm_batch_size or settings.LLM_BATCH_SIZE
+        self.llm_stats = None
+        # Extraction is CPU-bound, so large batches use processes to get
+        # around the GIL; small ones are not worth the process start-up.
+        self.extract_processes = settings.INGEST_EXTRACT_PROCESSES and self.extract_workers > 1
+
+    def _download(self, item):
+        """A spooled file, or with extract processes the path of a temp file (open files cannot be sent to them)."""
+        if not self.extract_processes:
+            return stream_drive_item(self.access_token, self.site_id, self.drive_id, item['id'])
+        f = tempfile.NamedTemporaryFile(dir=settings.DOWNLOAD_SPOOL_DIR or None, delete=False)
+        try:
+            with f:
+                stream_drive_item(self.access_token, self.site_id, self.drive_id, item['id'], dest=f)
+        except BaseException:
+            _discard(f.name)
+            raise
+        return f.name
+
+    def _extract_pool(self):
+        if self.extract_processes:
+            return extraction.process_pool(self.extract_workers)
+        return ThreadPoolExecutor(self.extract_workers, thread_name_prefix='ingest-ex')
+
+    def run(self, files):
+        pending = deque(files)
+        total = len(pending)
+        results = []
+        in_flight = {}  # future -> (stage, item, started, PreparedText)
+        fps = {}        # file id -> Fingerprint of its prepared text
+        batch = []      # (item, started, PreparedText, queued at) for the next batched LLM request
+        llm_stats = {"resumes": 0, "calls": 0, "batches": 0, "batched": 0, "retried": 0}
+        writer = CandidateWriter(self.save_batch_size)
+
+        # ``spooled`` holds downloaded content until its extraction finishes.
+        with _discarding({}) as spooled, \
+                ThreadPoolExecutor(self.download_workers, thread_name_prefix='ingest-dl') as downloads, \
+                self._extract_pool() as extracts, \
+                ThreadPoolExecutor(self.llm_workers, thread_name_prefix='ingest-llm') as llms:
+
+            def finish(item, started, prepared=None, **kwargs):
+                if prepared is not None:
+                    kwargs.update(chars_saved=prepared.chars_saved, tokens_saved=prepared.tokens_saved)
+                result = FileResult(
+                    file_id=item['id'], name=item.get('name', ''),
+                    seconds=round(time.monotonic() - started, 3), **kwargs
+                )
+                results.append(result)
+                if self.on_progress:
+                    self.on_progress(len(results), total, result)
+
+            def save(item, started, prepared, parsed, mark=True, **kwargs):
+                def done(candidate, error):
+                    if error is not None:
+                        logger.warning("Ingestion of %s failed at save: %s", item['id'], error)
+                        finish(item, started, prepared, status='failed', error=f"save: {error}")
+                    else:
+                        finish(item, started, prepared, status='parsed', candidate_id=candidate.id, **kwargs)
+                writer.add(item['id'], item.get('webUrl', ''), parsed, item.get('eTag'), mark=mark,
+                           fp=fps.pop(item['id'], None), on_done=done)
+
+            def send_batch():
+                members = batch[:]
+                batch.clear()
+                future = llms.submit(query_resume_llm_batch, {item['id']: p.text for item, _, p, _ in members})
+                in_flight[future] = ('llm-batch', members, None, None)
+                llm_stats['resumes'] += len(members)
+                llm_stats['calls'] += 1
+                llm_stats['batches'] += 1
+                llm_stats['batched'] += len(members)
+
+            def queue_llm(item, started, prepared):
+                if self.llm_batch_size < 2 or prepared.tokens_out > settings.LLM_BATCH_ITEM_MAX_TOKENS:
+                    in_flight[llms.submit(query_resume_llm, prepared.text)] = ('llm', item, started, prepared)
+                    llm_stats['resumes'] += 1
+                    llm_stats['calls'] += 1
+                    return
+                if batch and sum(p.tokens_out for _, _, p, _ in batch) + prepared.tokens_out > settings.LLM_BATCH_TOKEN_BUDGET:
+                    send_batch()
+                batch.append((item, started, prepared, time.monotonic()))
+                if len(batch) >= self.llm_batch_size:
+                    send_batch()
+
+            def batch_done(members, future):
+                try:
+                    outcomes, retried = future.result()
+                except Exception as e:
+                    outcomes, retried = {item['id']: e for item, _, _, _ in members}, []
+                llm_stats['retried'] += len(retried)
+                for item, started, prepared, _ in members:
+                    outcome = outcomes.get(item['id'])
+                    try:
+                        if isinstance(outcome, Exception):
+                            raise outcome
+                        parsed, missing = outcome
+                        cache_parse(prepared.text, parsed, missing)
+                        save(item, started, prepared, parsed, cached=False)
+                    except Exception as e:
+                        error = http_client.describe_error(e)
+                        logger.warning("Ingestion of %s failed at llm: %s", item['id'], error)
+                        fps.pop(item['id'], None)
+                        finish(item, started, prepared, status='failed', error=f"llm: {error}")
+
+            def held():
+                """Files between download and LLM result, including those waiting for a batch."""
+                return len(batch) + sum(len(item) if stage == 'llm-batch' else 1
+                                        for stage, item, _, _ in in_flight.values())
+
+            while pending or in_flight or batch:
+                while pending and held() < self.max_in_flight:
+                    item = pending.popleft()
+                    in_flight[downloads.submit(self._download, item)] = ('download', item, time.monotonic(), None)
+
+                # Wake up in time to write a partly filled batch that has waited long enough.
+                timeouts = [writer.max_delay] if len(writer) else []
+                if batch:
+                    timeouts.append(max(0.0, settings.LLM_BATCH_MAX_DELAY - (time.monotonic() - batch[0][3])))
+                done, _ = wait(in_flight, timeout=min(timeouts, default=None), return_when=FIRST_COMPLETED)
+                if writer.due:
+                    writer.flush()
+                for future in done:
+                    stage, item, started, prepared = in_flight.pop(future)
+                    if stage == 'llm-batch':
+                        batch_done(item, future)
+                        continue
+                    if stage == 'extract':
+                        _discard(spooled.pop(item['id'], None))
+                    try:
+                        value = future.result()
+                        if stage == 'download':
+                            spooled[item['id']] = value
+                            future = extracts.submit(
+                                preprocess.extract_and_prepare, value, file_extension(item.get('name', '')),
+                                settings.EXTRACT_MAX_PAGES, settings.EXTRACT_MAX_CHARS, settings.PROMPT_TOKEN_BUDGET,
+                            )
+                            in_flight[future] = ('extract', item, started, None)
+                            continue
+                        if stage == 'extract':
+                            prepared = value
+                            log_savings(item['id'], prepared)
+                            fps[item['id']] = fp = fingerprint.fingerprint(prepared.text, settings.DEDUPE_MIN_SHINGLES)
+                            if self.cheap:
+                                save(item, started, prepared, cheap_parse(prepared.text), mark=False)
+                                continue
+                            parsed = parse_cache.lookup(prepared.text, PROMPT_VERSION)
+                            cached = parsed is not None
+                            duplicate_of = None
+                            if parsed is None:
+                                parsed, duplicate_of = reuse_duplicate_parse(prepared.text, fp, item['id'])
+                            if parsed is None:
+                                queue_llm(item, started, prepared)
+                                continue
+                        else:
+                            parsed, missing = value
+                            cache_parse(prepared.text, parsed, missing)
+                            cached, duplicate_of = False, None
+                        save(item, started, prepared, parsed, cached=cached, duplicate_of=duplicate_of)
+                    except Exception as e:
+                        error = http_client.describe_error(e)
+                        logger.warning("Ingestion of %s failed at %s: %s", item['id'], stage, error)
+                        fps.pop(item['id'], None)
+                        finish(item, started, prepared, status='failed', error=f"{stage}: {error}")
+
+                # Send a partly filled LLM batch once it has waited long enough,
+                # or when nothing still downloading or extracting could join it.
+                if batch and (time.monotonic() - batch[0][3] >= settings.LLM_BATCH_MAX_DELAY or not pending
+                              and all(stage in ('llm', 'llm-batch') for stage, _, _, _ in in_flight.values())):
+                    send_batch()
+            writer.flush()
+        self.save_stats = writer.stats
+        # Retries of failed batch items and field fallbacks are not counted as calls.
+        llm_stats['resumes_per_call'] = round(llm_stats['resumes'] / llm_stats['calls'], 2) if llm_stats['calls'] else None
+        self.llm_stats = llm_stats
+        return results
+
+
+def ingest_site(access_token, site, files=None, delta=False, **limits):
+    """
+    Parse every unparsed resume of a saved SharePointSite and summarise the run.
+
+    With ``delta`` the site is synced incrementally first and only new or
+    changed files (see core.sync) are parsed.
+    """
+    started = time.monotonic()
+    sync_stats = None
+    if files is None and delta:
+        sync_stats = sync_site(access_token, site)
+        files = pending_files(site)
+    elif files is None:
+        files = list_unparsed_resumes(access_token, site)
+    pipeline = IngestionPipeline(access_token, site.site_id, site.drive_id, **limits)
+    results = pipeline.run(files)
+    return {
+        "site": site.id,
+        "cheap": pipeline.cheap,
+        "total": len(results),
+        "parsed": sum(1 for r in results if r.status == 'parsed'),
+        "failed": sum(1 for r in results if r.status == 'failed'),
+        "cache_hits": sum(1 for r in results if r.cached),
+        "duplicates_reused": sum(1 for r in results if r.duplicate_of),
+        "chars_saved": sum(r.chars_saved for r in results),
+        "tokens_saved": sum(r.tokens_saved for r in results),
+        "seconds": round(time.monotonic() - started, 3),
+        "saves": pipeline.save_stats,
+        "llm": pipeline.llm_stats,
+        "sync": sync_stats,
+        "results": [asdict(r) for r in results],
+    }
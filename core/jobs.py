@@ -0,0 +1,307 @@
+"""
+Database-backed parse job queue.
+
+``enqueue_parse`` records a ParseJob and returns immediately; a worker
+process (``manage.py run_parse_worker``) claims queued jobs, runs the parse
+pipeline and records the outcome. Failed jobs are retried with exponential
+backoff and dead-lettered after ``max_attempts``. No broker is needed: on
+Postgres jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, elsewhere
+with a conditional UPDATE. A partial unique constraint allows one queued or
+running job per file. A running job's lock is refreshed on a timer, and every
+status write is conditional on the worker still holding it.
+
+Workers parse with the app-only Graph token, not the token of the caller who
+queued the job, so queueing needs TENANT_ID/CLIENT_ID/CLIENT_SECRET.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import http_client
+from .graph_utils import get_access_token
+from .models import ParseJob
+from .resume_parser.pipeline import UnsupportedFileType, candidate_payload, process_file
+
+logger = logging.getLogger(__name__)
+
+# Errors that will not go away on retry.
+PERMANENT_ERRORS = (UnsupportedFileType,)
+
+
+def _active_job(file_id):
+    return ParseJob.objects.filter(file_id=file_id, status__in=[ParseJob.QUEUED, ParseJob.RUNNING]).first()
+
+
+def queue_available():
+    """Whether workers can parse queued jobs, i.e. the app credentials are configured."""
+    return bool(settings.TENANT_ID and settings.CLIENT_ID and settings.CLIENT_SECRET)
+
+
+def enqueue_parse(file_id, site_id, drive_id, cheap=False):
+    """Queue a parse, reusing a job that is already queued or running for the file."""
+    if not queue_available():
+        raise ImproperlyConfigured(
+            "Queued parsing needs app credentials (TENANT_ID, CLIENT_ID, CLIENT_SECRET); parse with sync instead"
+        )
+    existing = _active_job(file_id)
+    if existing:
+        return existing
+    try:
+        with transaction.atomic():
+            return ParseJob.objects.create(
+                file_id=file_id, site_id=site_id, drive_id=drive_id, cheap=cheap,
+                max_attempts=settings.PARSE_JOB_MAX_ATTEMPTS,
+            )
+    except IntegrityError:
+        # Another request queued the file in the meantime.
+        existing = _active_job(file_id)
+        if existing is None:
+            raise
+        return existing
+
+
+def requeue(job):
+    """Send a dead job back to the queue; returns the file's active job if it already has one."""
+    job.status = ParseJob.QUEUED
+    job.attempts = 0
+    job.error = ''
+    job.available_at = timezone.now()
+    try:
+        with transaction.atomic():
+            job.save(update_fields=['status', 'attempts', 'error', 'available_at', 'updated_at'])
+    except IntegrityError:
+        existing = _active_job(job.file_id)
+        if existing is None:
+            raise
+        return existing
+    return job
+
+
+def release_stale_jobs():
+    """
+    Put back jobs whose worker died mid-run (lock older than PARSE_JOB_LOCK_TIMEOUT);
+    returns how many were released. A job that was on its last attempt is
+    dead-lettered instead, so a file that keeps crashing its worker is not
+    retried forever.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.PARSE_JOB_LOCK_TIMEOUT)
+    stale = ParseJob.objects.filter(status=ParseJob.RUNNING, locked_at__lt=cutoff)
+    dead = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=ParseJob.DEAD, error="Worker stopped responding on the last attempt", locked_by='', locked_at=None,
+    )
+    if dead:
+        logger.error("Dead-lettered %s stale parse jobs that had no attempts left", dead)
+    return dead + stale.update(status=ParseJob.QUEUED, locked_by='', locked_at=None)
+
+
+def release_job(job):
+    """Put a claimed job back without counting the attempt (it never ran)."""
+    return ParseJob.objects.filter(pk=job.pk, status=ParseJob.RUNNING).update(
+        status=ParseJob.QUEUED, locked_by='', locked_at=None, attempts=F('attempts') - 1,
+    )
+
+
+def _try_claim(job_id, worker_id, now):
+    return ParseJob.objects.filter(pk=job_id, status=ParseJob.QUEUED).update(
+        status=ParseJob.RUNNING, locked_by=worker_id, locked_at=now,
+        attempts=F('attempts') + 1, updated_at=now,
+    )
+
+
+def claim_job(worker_id):
+    """Atomically move the oldest available job to RUNNING and return it, or None."""
+    while True:
+        now = timezone.now()
+        qs = ParseJob.objects.filter(status=ParseJob.QUEUED, available_at__lte=now).order_by('available_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                job_id = qs.select_for_update(skip_locked=True).values_list('id', flat=True).first()
+                if job_id is None:
+                    return None
+                _try_claim(job_id, worker_id, now)
+            return ParseJob.objects.get(pk=job_id)
+
+        # No row locks (SQLite): claim with a conditional UPDATE and move on
+        # to the next job if another worker got there first.
+        job_id = qs.values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+        if _try_claim(job_id, worker_id, now):
+            return ParseJob.objects.get(pk=job_id)
+
+
+class LockLost(Exception):
+    """The job was released to another worker while this one was still running it."""
+
+
+def _update_held(job, **fields):
+    """Update the job only while this worker still holds its lock; returns whether it did."""
+    now = timezone.now()
+    return bool(ParseJob.objects.filter(pk=job.pk, status=ParseJob.RUNNING, locked_by=job.locked_by).update(
+        updated_at=now, **fields,
+    ))
+
+
+class _Heartbeat(threading.Thread):
+    """Refreshes the job's lock every PARSE_JOB_HEARTBEAT_INTERVAL seconds so a long stage is not seen as stale."""
+
+    def __init__(self, job):
+        super().__init__(name=f"parse-job-{job.pk}-heartbeat", daemon=True)
+        self.job = job
+        self.done = threading.Event()
+        self.lost = False
+
+    def run(self):
+        try:
+            while not self.done.wait(settings.PARSE_JOB_HEARTBEAT_INTERVAL):
+                if not _update_held(self.job, locked_at=timezone.now()):
+                    self.lost = True
+                    return
+        except Exception:
+            logger.exception("Heartbeat for parse job %s failed", self.job.pk)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+
+def _finish(job, **fields):
+    """Record the outcome unless another worker has taken the job over, in which case it is left to them."""
+    if not _update_held(job, locked_by='', locked_at=None, **fields):
+        logger.warning("Parse job %s lost its lock to another worker; discarding this run's outcome", job.pk)
+    job.refresh_from_db()
+    return job
+
+
+def run_job(job, access_token):
+    def on_stage(stage):
+        if heartbeat.lost or not _update_held(job, stage=stage, locked_at=timezone.now()):
+            raise LockLost(f"Parse job {job.pk} is no longer held by {job.locked_by}")
+
+    heartbeat = _Heartbeat(job)
+    heartbeat.start()
+    try:
+        candidate = process_file(access_token, job.site_id, job.drive_id, job.file_id,
+                                 on_stage=on_stage, cheap=job.cheap)
+    except LockLost:
+        return _finish(job)
+    except Exception as e:
+        permanent = isinstance(e, PERMANENT_ERRORS)
+        error = http_client.describe_error(e)
+        if permanent or job.attempts >= job.max_attempts:
+            logger.error("Parse job %s for %s dead-lettered: %s", job.pk, job.file_id, error)
+            return _finish(job, status=ParseJob.DEAD, error=error)
+        delay = settings.PARSE_JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+        logger.warning("Parse job %s failed (attempt %s/%s), retrying in %ss: %s",
+                       job.pk, job.attempts, job.max_attempts, delay, error)
+        return _finish(job, status=ParseJob.QUEUED, error=error,
+                       available_at=timezone.now() + timedelta(seconds=delay))
+    finally:
+        heartbeat.stop()
+
+    return _finish(job, status=ParseJob.SUCCEEDED, stage='done', candidate=candidate, error='')
+
+
+class Worker:
+    """Runs ``concurrency`` threads that claim and process jobs until stopped."""
+
+    def __init__(self, concurrency=None, poll_interval=None, burst=False, token_provider=get_access_token):
+        self.concurrency = concurrency or settings.PARSE_WORKER_CONCURRENCY
+        self.poll_interval = poll_interval or settings.PARSE_WORKER_POLL_INTERVAL
+        self.burst = burst  # exit once the queue is empty
+        self.token_provider = token_provider
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+        self.processed = 0
+        self._lock = threading.Lock()
+
+    def _loop(self, index):
+        worker_id = f"{self.name}:{index}"
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                try:
+                    job = claim_job(worker_id)
+                    if job is None:
+                        if self.burst:
+                            return
+                        self.stopping.wait(self.poll_interval)
+                        continue
+                    try:
+                        token = self.token_provider()
+                    except Exception:
+                        release_job(job)
+                        raise
+                    job = run_job(job, token)
+                except Exception:
+                    logger.exception("Parse worker %s error", worker_id)
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                with self._lock:
+                    self.processed += 1
+                logger.info("Parse job %s for %s: %s", job.pk, job.file_id, job.status)
+        finally:
+            connection.close()
+
+    def _release_stale(self):
+        try:
+            released = release_stale_jobs()
+        except Exception:
+            logger.exception("Could not re-queue stale parse jobs")
+            return
+        if released:
+            logger.warning("Re-queued %s stale parse jobs", released)
+
+    def run(self):
+        """Process jobs until stopped, re-queueing stale jobs every PARSE_JOB_STALE_CHECK_INTERVAL seconds."""
+        self._release_stale()
+        next_check = time.monotonic() + settings.PARSE_JOB_STALE_CHECK_INTERVAL
+        threads = [
+            threading.Thread(target=self._loop, args=(i,), name=f"parse-worker-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for t in threads:
+            t.start()
+        try:
+            while any(t.is_alive() for t in threads):
+                time.sleep(0.5)
+                if time.monotonic() >= next_check:
+                    self._release_stale()
+                    next_check = time.monotonic() + settings.PARSE_JOB_STALE_CHECK_INTERVAL
+        except KeyboardInterrupt:
+            self.stopping.set()
+            for t in threads:
+                t.join()
+        finally:
+            connection.close()
+        return self.processed
+
+    def stop(self):
+        self.stopping.set()
+
+
+def job_payload(job):
+    return {
+        "id": job.id,
+        "file_id": job.file_id,
+        "status": job.status,
+        "stage": job.stage,
+        "cheap": job.cheap,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "error": job.error or None,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "candidate": candidate_payload(job.candidate) if job.candidate_id else None,
+    }
@@ -1,15 +1,46 @@
 import os
-import requests
 
-def query_gemini(prompt: str) -> str:
+from django.conf import settings
+
+from core import http_client, metrics, ratelimit
+from core.resume_parser.preprocess import estimate_tokens
+
+LLM_TOKENS = metrics.counter('resume_llm_tokens_total', "Gemini tokens billed, by direction (in/out).",
+                             ('direction',))
+LLM_PROMPT_TOKENS = metrics.histogram('resume_llm_prompt_tokens', "Prompt tokens per Gemini call.",
+                                      buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000))
+
+def query_gemini(prompt: str, response_schema: dict = None) -> str:
+    """
+    Send one prompt to Gemini and return the text of the first candidate.
+
+    With ``response_schema`` the model is asked for JSON matching that
+    (OpenAPI-subset) schema, so the returned text can be passed to json.loads.
+    """
     API_KEY = os.getenv("GOOGLE_API_KEY")
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={API_KEY}"
+    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
 
-    headers = {"Content-Type": "application/json"}
+    # The key goes in a header: a URL ends up in exception messages and logs.
+    headers = {"Content-Type": "application/json", "x-goog-api-key": API_KEY or ''}
     body = {
         "contents": [{"parts": [{"text": prompt}]}]
     }
+    if response_schema is not None:
+        body["generationConfig"] = {
+            "responseMimeType": "application/json",
+            "responseSchema": response_schema,
+        }
 
-    response = requests.post(url, headers=headers, json=body)
-    response.raise_for_status()
-    return response.json()["candidates"][0]["content"]["parts"][0]["text"]
+    # Charged to the Gemini token quota up front, settled with the billed count.
+    estimated = estimate_tokens(prompt) + settings.GEMINI_OUTPUT_TOKEN_ESTIMATE
+    with metrics.span('llm.gemini'):
+        response = http_client.post(url, headers=headers, json=body, endpoint='gemini.generate', tokens=estimated)
+        response.raise_for_status()
+        data = response.json()
+    usage = data.get("usageMetadata") or {}
+    if usage:
+        ratelimit.settle('gemini.generate', estimated, usage.get("totalTokenCount", estimated))
+        LLM_TOKENS.inc(usage.get("promptTokenCount", 0), direction='in')
+        LLM_TOKENS.inc(usage.get("candidatesTokenCount", 0), direction='out')
+        LLM_PROMPT_TOKENS.observe(usage.get("promptTokenCount", 0))
+    return data["candidates"][0]["content"]["parts"][0]["text"]
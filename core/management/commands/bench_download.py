@@ -0,0 +1,177 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import fitz
+from django.core.management.base import BaseCommand
+
+MB = 1024 * 1024
+CHUNK = 64 * 1024
+SITE, DRIVE = 'bench-site', 'bench-drive'
+
+
+def scanned_pdf(path, size_mb):
+    """A PDF of incompressible page images (like a scan) of about ``size_mb``, with a line of text per page."""
+    side = 1024
+    doc = fitz.open()
+    for number in range(max(1, round(size_mb * MB / (side * side * 3)))):
+        page = doc.new_page()
+        pixmap = fitz.Pixmap(fitz.csRGB, side, side, os.urandom(side * side * 3), 0)
+        page.insert_image(page.rect, pixmap=pixmap)
+        page.insert_text((72, 72), f"Jane Doe - Data Engineer - page {number + 1}")
+    doc.save(path)
+    doc.close()
+
+
+def _rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+class _PeakRSS:
+    """Samples the process's resident set every few milliseconds while running (Linux only)."""
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.baseline = self.peak = _rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss())
+
+    @property
+    def growth_mb(self):
+        return (self.peak - self.baseline) / MB
+
+
+class _GraphStub(BaseHTTPRequestHandler):
+    """Serves /sites/<site>/drives/<drive>/items/<id>/content from ``items``: id -> (path, content type)."""
+    items = {}
+
+    def do_GET(self):
+        item = self.items.get(self.path.rstrip('/').split('/')[-2])
+        if item is None:
+            self.send_error(404)
+            return
+        path, content_type = item
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(os.path.getsize(path)))
+        self.end_headers()
+        try:
+            with open(path, 'rb') as f:
+                while chunk := f.read(CHUNK):
+                    self.wfile.write(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client aborted the download
+
+    def log_message(self, *args):
+        pass
+
+
+def _measure(mode, endpoint, ids, concurrency):
+    """Run in a fresh process: download and extract ``ids``; return (seconds, peak RSS growth in MB)."""
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.test import override_settings
+
+    from core import http_client
+    from core.graph_utils import stream_drive_item
+    from core.resume_parser import extraction
+
+    def buffered(file_id):
+        # What the pipeline did before: the whole body in memory, then a bytes copy for PyMuPDF.
+        url = f"{endpoint}/sites/{SITE}/drives/{DRIVE}/items/{file_id}/content"
+        response = http_client.get(url, headers={'Authorization': 'Bearer bench'}, endpoint='graph.content')
+        response.raise_for_status()
+        return extraction.extract_text(response.content, 'pdf', settings.EXTRACT_MAX_PAGES, settings.EXTRACT_MAX_CHARS)
+
+    def streamed(file_id):
+        with stream_drive_item('bench', SITE, DRIVE, file_id) as f:
+            return extraction.extract_text(f, 'pdf', settings.EXTRACT_MAX_PAGES, settings.EXTRACT_MAX_CHARS)
+
+    work = buffered if mode == 'buffered' else streamed
+    with override_settings(GRAPH_API_ENDPOINT=endpoint, DOWNLOAD_MAX_BYTES=0):
+        work(ids[0])  # warm up the connection pool and MuPDF
+        with _PeakRSS() as rss:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                texts = list(pool.map(work, ids))
+            seconds = time.perf_counter() - started
+    assert all('Jane Doe' in text for text in texts)
+    return seconds, rss.growth_mb
+
+
+def _rejected(endpoint, file_id):
+    import django
+    django.setup()
+    from django.test import override_settings
+
+    from core.graph_utils import DownloadRejected, stream_drive_item
+
+    with override_settings(GRAPH_API_ENDPOINT=endpoint):
+        try:
+            stream_drive_item('bench', SITE, DRIVE, file_id).close()
+        except DownloadRejected as e:
+            return str(e)
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark peak memory of resume download + extraction: whole-body downloads against "
+        "streamed, spooled downloads, served by a local Graph stub. Each mode runs in a fresh process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=8)
+        parser.add_argument('--size-mb', type=float, default=20)
+        parser.add_argument('--concurrency', type=int, default=4)
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp(prefix='bench-download-')
+        server = None
+        try:
+            pdf = os.path.join(workdir, 'scan.pdf')
+            scanned_pdf(pdf, options['size_mb'])
+            ids = [f'resume-{i}' for i in range(options['files'])]
+            _GraphStub.items = {file_id: (pdf, 'application/pdf') for file_id in ids}
+            _GraphStub.items['photo'] = (pdf, 'image/png')
+
+            server = ThreadingHTTPServer(('127.0.0.1', 0), _GraphStub)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            endpoint = f"http://127.0.0.1:{server.server_port}"
+
+            self.stdout.write(
+                f"{len(ids)} PDFs of {os.path.getsize(pdf) / MB:.1f} MB, {options['concurrency']} at a time\n"
+            )
+            self.stdout.write(f"{'mode':<10} {'seconds':>8} {'peak RSS +MB':>13}")
+            context = multiprocessing.get_context('spawn')
+            for mode in ('buffered', 'streamed'):
+                with ProcessPoolExecutor(1, mp_context=context) as pool:
+                    seconds, peak = pool.submit(_measure, mode, endpoint, ids, options['concurrency']).result()
+                self.stdout.write(f"{mode:<10} {seconds:>8.2f} {peak:>13.1f}")
+            with ProcessPoolExecutor(1, mp_context=context) as pool:
+                self.stdout.write(f"\nimage/png item: {pool.submit(_rejected, endpoint, 'photo').result()}")
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+            shutil.rmtree(workdir, ignore_errors=True)
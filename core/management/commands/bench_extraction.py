@@ -0,0 +1,139 @@
+import os
+import random
+import time
+from io import BytesIO
+from pathlib import Path
+
+import fitz  # PyMuPDF
+import PyPDF2
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from docx import Document
+
+from core.resume_parser import extraction
+
+WORDS = (
+    "python django react aws docker kubernetes postgres kafka spark terraform led team built "
+    "designed migrated services pipeline latency reduced improved customers platform api data"
+).split()
+
+
+# The extractors as they were before core.resume_parser.extraction, kept here as the baseline.
+
+def legacy_pdf_fitz(pdf_bytes):
+    text = ""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page in doc:
+            text += page.get_text()
+    return text
+
+
+def legacy_pdf_pypdf2(pdf_bytes):
+    pdf = PyPDF2.PdfReader(BytesIO(pdf_bytes))
+    text = ""
+    for page in pdf.pages:
+        text += page.extract_text()
+    return text
+
+
+def legacy_docx(docx_bytes):
+    doc = Document(BytesIO(docx_bytes))
+    return "\n".join(p.text for p in doc.paragraphs)
+
+
+def _sentence(rng, n=14):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def generate_corpus(count, pages, seed=7):
+    """Synthetic CVs: multi-page PDFs and DOCX files with a skills table and header."""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        if i % 2 == 0:
+            doc = fitz.open()
+            for _ in range(pages):
+                page = doc.new_page()
+                page.insert_text((40, 50), "\n".join(_sentence(rng, 10) for _ in range(50)), fontsize=9)
+            corpus.append((f"cv{i}.pdf", doc.tobytes(), 'pdf'))
+        else:
+            doc = Document()
+            doc.sections[0].header.paragraphs[0].text = f"Candidate {i} | cv{i}@example.com | +1 555 0100"
+            for _ in range(pages * 12):
+                doc.add_paragraph(_sentence(rng))
+            table = doc.add_table(rows=4, cols=3)
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = rng.choice(WORDS)
+            buf = BytesIO()
+            doc.save(buf)
+            corpus.append((f"cv{i}.docx", buf.getvalue(), 'docx'))
+    return corpus
+
+
+def load_corpus(path):
+    corpus = []
+    for file in sorted(Path(path).iterdir()):
+        ext = file.suffix.lower().lstrip('.')
+        if ext in extraction.BACKENDS:
+            corpus.append((file.name, file.read_bytes(), ext))
+    return corpus
+
+
+class Command(BaseCommand):
+    help = "Benchmark resume text extraction against the previous extractors."
+
+    def add_arguments(self, parser):
+        parser.add_argument('corpus', nargs='?', help="Directory of .pdf/.docx CVs (omit to generate one)")
+        parser.add_argument('--generate', type=int, default=40, help="Synthetic CVs to generate without a corpus")
+        parser.add_argument('--pages', type=int, default=3, help="Pages per synthetic CV")
+        parser.add_argument('--processes', type=int, default=os.cpu_count(), help="Process pool size")
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def _time(self, label, fn, files, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            chars = fn()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        self.stdout.write(
+            f"{label:<38} {best * 1000:9.1f} ms  {files / best:8.1f} files/s  {chars:>10} chars"
+        )
+        return best
+
+    def handle(self, *args, **options):
+        if options['corpus']:
+            if not os.path.isdir(options['corpus']):
+                raise CommandError(f"{options['corpus']} is not a directory")
+            corpus = load_corpus(options['corpus'])
+        else:
+            corpus = generate_corpus(options['generate'], options['pages'])
+        if not corpus:
+            raise CommandError("No .pdf or .docx files found")
+
+        pdfs = [c for c in corpus if c[2] == 'pdf']
+        docxs = [c for c in corpus if c[2] != 'pdf']
+        repeat = options['repeat']
+        caps = dict(max_pages=settings.EXTRACT_MAX_PAGES, max_chars=settings.EXTRACT_MAX_CHARS)
+        self.stdout.write(f"{len(pdfs)} PDFs, {len(docxs)} DOCX, best of {repeat} runs\n")
+
+        if pdfs:
+            self._time("PDF  legacy PyMuPDF (+=)", lambda: sum(len(legacy_pdf_fitz(c)) for _, c, _ in pdfs), len(pdfs), repeat)
+            self._time("PDF  legacy PyPDF2 (utils/pdf_reader)", lambda: sum(len(legacy_pdf_pypdf2(c)) for _, c, _ in pdfs), len(pdfs), repeat)
+            self._time("PDF  extraction.extract_pdf", lambda: sum(len(extraction.extract_pdf(c, **caps)) for _, c, _ in pdfs), len(pdfs), repeat)
+        if docxs:
+            self._time("DOCX legacy paragraphs only", lambda: sum(len(legacy_docx(c)) for _, c, _ in docxs), len(docxs), repeat)
+            self._time("DOCX extraction.extract_docx (+tables)", lambda: sum(len(extraction.extract_docx(c, **caps)) for _, c, _ in docxs), len(docxs), repeat)
+
+        items = [(name, content, ext) for name, content, ext in corpus]
+        self._time(
+            "ALL  extract_many, 1 process",
+            lambda: sum(len(t) for t in extraction.extract_many(items, processes=1, **caps).values() if isinstance(t, str)),
+            len(items), repeat,
+        )
+        self._time(
+            f"ALL  extract_many, {options['processes']} processes",
+            lambda: sum(len(t) for t in extraction.extract_many(items, processes=options['processes'], **caps).values() if isinstance(t, str)),
+            len(items), repeat,
+        )
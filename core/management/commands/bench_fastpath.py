@@ -0,0 +1,104 @@
+import random
+import re
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.management.commands.bench_extraction import WORDS, load_corpus
+from core.resume_parser import extraction, fastpath, preprocess
+
+FIRST_NAMES = ["Jane", "Arjun", "Maria", "Chen", "Olu", "Sofia", "Liam", "Priya"]
+LAST_NAMES = ["Doe", "Sharma", "Garcia", "Wei", "Adeyemi", "Rossi", "Murphy", "Nair"]
+
+
+def generate_texts(count, skills, seed=7):
+    """Synthetic resume texts with contact details and dictionary skills in the prose."""
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        lines = [
+            f"{first} {last}",
+            f"{first.lower()}.{last.lower()}{i}@example.com | +1 (555) 010-{i % 10000:04d} | Berlin",
+            "SUMMARY",
+            " ".join(rng.choice(WORDS) for _ in range(60)),
+            "SKILLS",
+            ", ".join(rng.sample(skills, 15)),
+            "EXPERIENCE",
+        ]
+        for _ in range(12):
+            words = [rng.choice(WORDS) for _ in range(25)] + rng.sample(skills, 2)
+            rng.shuffle(words)
+            lines.append("- " + " ".join(words))
+        texts.append("\n".join(lines))
+    return texts
+
+
+def naive_matcher(aliases):
+    """One regex per alias: the obvious approach, for comparison."""
+    patterns = [
+        (re.compile(r"(?<!\w)" + re.escape(alias) + r"(?!\w)", re.IGNORECASE), canonical)
+        for alias, canonical in aliases.items()
+    ]
+
+    def find(text):
+        return list(dict.fromkeys(canonical for pattern, canonical in patterns if pattern.search(text)))
+    return find
+
+
+class Command(BaseCommand):
+    help = "Benchmark the deterministic fast-path extractor (resumes per second on one core)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('corpus', nargs='?', help="Directory of .pdf/.docx CVs (omit to generate texts)")
+        parser.add_argument('--generate', type=int, default=500, help="Synthetic resumes to generate without a corpus")
+        parser.add_argument('--dictionary', default=settings.SKILLS_DICTIONARY)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def _time(self, label, fn, texts, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for text in texts:
+                fn(text)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        self.stdout.write(f"{label:<34} {best * 1000:9.1f} ms  {len(texts) / best:9.1f} resumes/s")
+
+    def handle(self, *args, **options):
+        aliases = fastpath.read_dictionary(options['dictionary'])
+        started = time.perf_counter()
+        matcher = fastpath.SkillMatcher(aliases)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        if options['corpus']:
+            texts = []
+            for name, content, ext in load_corpus(options['corpus']):
+                try:
+                    texts.append(preprocess.prepare(extraction.extract_text(content, ext)).text)
+                except Exception as e:
+                    self.stderr.write(f"Skipping {name}: {e}")
+        else:
+            texts = generate_texts(options['generate'], sorted(set(aliases.values())))
+        if not texts:
+            raise CommandError("No resumes to benchmark")
+
+        chars = sum(len(t) for t in texts)
+        self.stdout.write(
+            f"{len(texts)} resumes ({chars // len(texts)} chars on average), {matcher.size} skills / "
+            f"{len(aliases)} aliases, automaton built in {build_ms:.1f} ms, best of {options['repeat']} runs\n"
+        )
+        repeat = options['repeat']
+        self._time("skills: per-alias regex (naive)", naive_matcher(aliases), texts, repeat)
+        self._time("skills: Aho-Corasick", matcher.find, texts, repeat)
+        self._time("contacts: email + phone + name",
+                   lambda t: (fastpath.find_emails(t), fastpath.find_phones(t), fastpath.guess_name(t)),
+                   texts, repeat)
+        self._time("fastpath.extract (all fields)", lambda t: fastpath.extract(t, matcher), texts, repeat)
+
+        sample = fastpath.extract(texts[0], matcher)
+        self.stdout.write(
+            f"\nFirst resume: name={sample.name!r} email={sample.email!r} phone={sample.phone!r} "
+            f"skills={sample.skills[:8]}{'…' if len(sample.skills) > 8 else ''}"
+        )
@@ -0,0 +1,66 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import embeddings, search_index
+from core.management.commands.loadtest_db import parsed_resume
+from core.models import Candidate
+from core.persistence import CandidateWriter
+from core.resume_parser.fastpath import read_dictionary
+from core.resume_parser.pipeline import save_candidate
+
+PREFIX = 'bench-persist-'
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark candidate writes: save_candidate per row against CandidateWriter at several "
+        "batch sizes, for new rows, changed rows and unchanged rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500)
+        parser.add_argument('--batch-sizes', default='1,10,50,200')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(n) for n in options['batch_sizes'].split(',') if n.strip()]
+        except ValueError:
+            raise CommandError("--batch-sizes must be comma-separated integers")
+        skills = sorted(set(read_dictionary(settings.SKILLS_DICTIONARY).values()))
+        rows = options['rows']
+        rng = random.Random(5)
+        parsed = [parsed_resume(rng, skills) for _ in range(rows)]
+        changed = [{**p, 'total_years_of_experience': p['total_years_of_experience'] + 1} for p in parsed]
+
+        self.stdout.write(f"{rows} rows per pass on {Candidate.objects.db}; rows/s\n")
+        self.stdout.write(f"{'writer':<22} {'insert':>9} {'update':>9} {'unchanged':>9}")
+        try:
+            self._report("save_candidate per row", rows, parsed, changed,
+                         lambda file_id, p: save_candidate(file_id, '', p, mark=False), lambda: None)
+            for size in sizes:
+                writer = CandidateWriter(batch_size=size, max_delay=0)
+                self._report(f"CandidateWriter({size})", rows, parsed, changed,
+                             lambda file_id, p: writer.add(file_id, '', p, mark=False), writer.flush)
+        finally:
+            self._cleanup()
+
+    def _report(self, label, rows, parsed, changed, write, flush):
+        self._cleanup()
+        timings = []
+        for data in (parsed, changed, changed):
+            started = time.perf_counter()
+            for i, p in enumerate(data):
+                write(f"{PREFIX}{i}", p)
+            flush()
+            timings.append(rows / (time.perf_counter() - started))
+        self.stdout.write(f"{label:<22} {timings[0]:>9.1f} {timings[1]:>9.1f} {timings[2]:>9.1f}")
+
+    def _cleanup(self):
+        ids = list(Candidate.objects.filter(file_id__startswith=PREFIX).values_list('pk', flat=True))
+        for candidate_id in ids:
+            search_index.remove_candidate(candidate_id)
+        Candidate.objects.filter(pk__in=ids).delete()
+        embeddings.forget(ids)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core import dedupe
+from core.models import Candidate
+
+
+class Command(BaseCommand):
+    help = "Link duplicate candidates from their stored fingerprints and contact details."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Drop every existing link and relink from scratch")
+
+    def handle(self, *args, **options):
+        candidates = Candidate.objects.only('id', 'email_key', 'phone_key', 'canonical_id').order_by('pk')
+        clusters = dedupe.relink(candidates.iterator(chunk_size=500), reset=options['reset'])
+        duplicates = Candidate.objects.exclude(canonical=None).count()
+        self.stdout.write(self.style.SUCCESS(f"{clusters} clusters, {duplicates} duplicate candidates"))
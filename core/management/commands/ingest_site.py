@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.graph_utils import get_access_token
+from core.ingestion import ingest_site
+from core.models import SharePointSite
+
+
+class Command(BaseCommand):
+    help = "Parse every unparsed resume of a saved SharePoint site."
+
+    def add_arguments(self, parser):
+        parser.add_argument('site', type=int, help="Primary key of the SharePointSite")
+        parser.add_argument('--token', help="Graph access token (defaults to an app token)")
+        parser.add_argument('--delta', action='store_true',
+                            help="Sync via Graph delta queries and parse only new or changed files")
+        parser.add_argument('--cheap', action='store_true',
+                            help="Skip Gemini: save only the regex/dictionary fields (bulk triage)")
+        parser.add_argument('--download-workers', type=int)
+        parser.add_argument('--extract-workers', type=int)
+        parser.add_argument('--llm-workers', type=int)
+        parser.add_argument('--save-batch-size', type=int, help="Candidates written per transaction")
+        parser.add_argument('--llm-batch-size', type=int, help="Short resumes per Gemini request (1 disables batching)")
+
+    def handle(self, *args, **options):
+        try:
+            site = SharePointSite.objects.get(pk=options['site'])
+        except SharePointSite.DoesNotExist:
+            raise CommandError(f"Site {options['site']} not found")
+
+        token = options['token'] or get_access_token()
+        if not token:
+            raise CommandError("Could not obtain a Graph access token")
+
+        def progress(done, total, result):
+            line = f"[{done}/{total}] {result.status:<6} {result.name} ({result.seconds}s)"
+            if result.error:
+                line += f" - {result.error}"
+            self.stdout.write(line)
+
+        summary = ingest_site(
+            token, site,
+            delta=options['delta'],
+            cheap=options['cheap'] or None,
+            download_workers=options['download_workers'],
+            extract_workers=options['extract_workers'],
+            llm_workers=options['llm_workers'],
+            save_batch_size=options['save_batch_size'],
+            llm_batch_size=options['llm_batch_size'],
+            on_progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Parsed {summary['parsed']}/{summary['total']} resumes "
+            f"({summary['failed']} failed) in {summary['seconds']}s"
+        ))
+        llm = summary['llm']
+        if llm['calls']:
+            self.stdout.write(
+                f"{llm['resumes']} resumes in {llm['calls']} Gemini requests ({llm['resumes_per_call']} per request, "
+                f"{llm['batched']} batched, {llm['retried']} retried alone)"
+            )
@@ -0,0 +1,148 @@
+import random
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from core import embeddings, search_index
+from core.management.commands.bench_fastpath import FIRST_NAMES, LAST_NAMES
+from core.models import Candidate, CandidateEmbedding
+from core.resume_parser.fastpath import read_dictionary
+from core.resume_parser.pipeline import save_candidate
+from core.taxonomy import filter_candidates
+
+PREFIX = 'loadtest-'
+
+
+def parsed_resume(rng, skills):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return {
+        'name': f"{first} {last}",
+        'email': f"{first.lower()}.{last.lower()}{rng.randint(1, 10**6)}@example.com",
+        'phone': f"+1 555 {rng.randint(1000000, 9999999)}",
+        'skills': rng.sample(skills, 12),
+        'domain_classification': [rng.choice(["Software", "Data", "Finance", "Healthcare"])],
+        'total_years_of_experience': rng.randint(0, 25),
+        'profile_summary': f"Engineer working with {', '.join(rng.sample(skills, 4))}.",
+    }
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * pct / 100), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent write/search load test against the configured database: at each concurrency "
+        "level N, N writer threads save candidates while N reader threads search."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--levels', default='1,2,4,8', help="Comma-separated thread counts per side")
+        parser.add_argument('--ops', type=int, default=50, help="Operations per thread per level")
+        parser.add_argument('--seed-candidates', type=int, default=500,
+                            help="Candidates written before the first level, so searches have data")
+        parser.add_argument('--keep', action='store_true', help="Do not delete the load-test candidates")
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(n) for n in options['levels'].split(',') if n.strip()]
+        except ValueError:
+            raise CommandError("--levels must be comma-separated integers")
+        skills = sorted(set(read_dictionary(settings.SKILLS_DICTIONARY).values()))
+        db = connection.settings_dict
+        self.stdout.write(f"Database: {connection.vendor} ({db['NAME']}), CONN_MAX_AGE={db['CONN_MAX_AGE']}")
+
+        rng = random.Random(1)
+        started = time.perf_counter()
+        for i in range(options['seed_candidates']):
+            save_candidate(f"{PREFIX}seed-{i}", '', parsed_resume(rng, skills), mark=False)
+        if options['seed_candidates']:
+            self.stdout.write(f"Seeded {options['seed_candidates']} candidates in "
+                              f"{time.perf_counter() - started:.1f}s\n")
+
+        self.stdout.write("Latencies in ms; locked = \"database is locked\" errors.")
+        self.stdout.write(f"{'threads':>7} {'writes/s':>9} {'w p50':>8} {'w p95':>8} "
+                          f"{'searches/s':>10} {'s p50':>8} {'s p95':>8} {'locked':>6} {'errors':>6}")
+        try:
+            for level in levels:
+                self._run_level(level, options['ops'], skills)
+        finally:
+            if not options['keep']:
+                self._cleanup()
+
+    def _run_level(self, level, ops, skills):
+        write_ms, search_ms = [], []
+        failures = {'locked': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def record(samples, fn):
+            started = time.perf_counter()
+            try:
+                fn()
+            except OperationalError as e:
+                with lock:
+                    failures['locked' if 'locked' in str(e) else 'errors'] += 1
+                return
+            except Exception:
+                with lock:
+                    failures['errors'] += 1
+                return
+            with lock:
+                samples.append((time.perf_counter() - started) * 1000)
+
+        def writer(n):
+            rng = random.Random(f"w{level}-{n}")
+            try:
+                for i in range(ops):
+                    file_id = f"{PREFIX}{level}-{n}-{i}"
+                    record(write_ms, lambda: save_candidate(file_id, '', parsed_resume(rng, skills), mark=False))
+            finally:
+                connection.close()
+
+        def reader(n):
+            rng = random.Random(f"r{level}-{n}")
+            try:
+                for i in range(ops):
+                    if i % 2:
+                        terms = " ".join(rng.sample(skills, 2))
+                        record(search_ms, lambda: search_index.search(terms, page_size=20))
+                    else:
+                        picked = rng.sample(skills, 2)
+                        record(search_ms, lambda: list(
+                            filter_candidates(Candidate.objects.all(), skills=picked, match='any', min_experience=3)
+                            .defer('parsed_data').order_by('-total_years_of_experience', 'id')[:100]
+                        ))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(level)]
+        threads += [threading.Thread(target=reader, args=(n,)) for n in range(level)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{level:>7} {len(write_ms) / elapsed:>9.1f} {statistics.median(write_ms or [0]):>8.1f} "
+            f"{percentile(write_ms, 95):>8.1f} {len(search_ms) / elapsed:>10.1f} "
+            f"{statistics.median(search_ms or [0]):>8.1f} {percentile(search_ms, 95):>8.1f} "
+            f"{failures['locked']:>6} {failures['errors']:>6}"
+        )
+
+    def _cleanup(self):
+        ids = list(Candidate.objects.filter(file_id__startswith=PREFIX).values_list('pk', flat=True))
+        for candidate_id in ids:
+            search_index.remove_candidate(candidate_id)
+        CandidateEmbedding.objects.filter(candidate_id__in=ids).delete()
+        Candidate.objects.filter(pk__in=ids).delete()
+        embeddings.forget(ids)
+        self.stdout.write(f"\nRemoved {len(ids)} load-test candidates")
@@ -0,0 +1,229 @@
+import asyncio
+import importlib.util
+import json
+import os
+import shlex
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.management.commands.loadtest_db import percentile
+from core.models import SharePointSite
+
+SITE_URL = 'https://loadtest.sharepoint.com/sites/LoadTest'
+SITE, DRIVE, FOLDER = 'loadtest-site', 'loadtest-drive', 'loadtest-folder'
+
+# Route name -> (method, WSGI path, ASGI path, JSON body)
+ROUTES = {
+    'get-site-id': ('POST', '/api/get-site-id/', '/api/async/get-site-id/', {'site_url': SITE_URL}),
+    'get-drives': ('POST', '/api/get-drives/', '/api/async/get-drives/', {'site_id': SITE}),
+    'fetch-resumes': ('POST', '/api/fetch-resumes/', '/api/async/fetch-resumes/',
+                      {'site_id': SITE, 'drive_id': DRIVE}),
+    'site-resumes': ('GET', '/api/sites/{pk}/resumes/', '/api/async/sites/{pk}/resumes/', None),
+}
+
+WSGI_SERVER = (f"{sys.executable} -m gunicorn config.wsgi:application --bind 127.0.0.1:{{port}} "
+               "--workers 1 --threads 8")
+ASGI_SERVER = (f"{sys.executable} -m uvicorn config.asgi:application --host 127.0.0.1 --port {{port}} "
+               "--workers 1 --no-access-log")
+
+
+class _GraphStub(BaseHTTPRequestHandler):
+    """Answers the Graph calls behind the proxy views after ``latency`` seconds, counting calls in flight."""
+    protocol_version = 'HTTP/1.1'
+    latency = 0.1
+    files = []
+    lock = threading.Lock()
+    in_flight = peak = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.peak = max(cls.peak, cls.in_flight)
+        try:
+            time.sleep(cls.latency)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+        path = self.path.split('?')[0]
+        if path.endswith('/children'):
+            body = {'value': self.files}
+        elif path.endswith('root:/Resume'):
+            body = {'id': FOLDER}
+        elif path.endswith('/drives'):
+            body = {'value': [{'id': DRIVE, 'name': 'Documents'}]}
+        else:
+            body = {'id': SITE}
+        raw = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # the default backlog of 5 drops connects from a burst of requests
+
+
+def _missing(command):
+    """The program or ``-m`` module of a server command that is not installed, else None."""
+    argv = shlex.split(command)
+    if len(argv) > 2 and argv[1] == '-m':
+        return None if importlib.util.find_spec(argv[2]) else argv[2]
+    return None if shutil.which(argv[0]) else argv[0]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_listening(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+async def _load(base_url, method, path, body, total, concurrency, pool_size=20):
+    """Send ``total`` requests, ``concurrency`` at a time; returns (seconds, latencies in ms, errors)."""
+    latencies, errors = [], 0
+    # Small pools used in turn, like http_client.get_async_client: one large httpx pool
+    # would make the load generator the bottleneck.
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    clients = [httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120,
+                                 headers={'Authorization': 'Bearer loadtest'})
+               for _ in range(-(-concurrency // pool_size))]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(client):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+            except httpx.HTTPError:
+                errors += 1
+                return
+            if response.status_code != 200:
+                errors += 1
+                return
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(clients[n % len(clients)]) for n in range(total)))
+        return time.perf_counter() - started, latencies, errors
+    finally:
+        for client in clients:
+            await client.aclose()
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the Graph proxy endpoints: the sync views under a WSGI server against the async "
+        "views (/api/async/) under an ASGI server, both calling a local Graph stub with fixed latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--route', choices=sorted(ROUTES), default='fetch-resumes')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=100)
+        parser.add_argument('--latency-ms', type=float, default=100, help="Graph stub latency per call")
+        parser.add_argument('--files', type=int, default=50, help="Files in the stub's Resume folder")
+        parser.add_argument('--wsgi-server', default=WSGI_SERVER,
+                            help="Command starting the WSGI deployment; {port} is filled in")
+        parser.add_argument('--asgi-server', default=ASGI_SERVER,
+                            help="Command starting the ASGI deployment; {port} is filled in")
+
+    def handle(self, *args, **options):
+        for name in ('wsgi_server', 'asgi_server'):
+            missing = _missing(options[name])
+            if missing:
+                raise CommandError(
+                    f"{missing} is not installed; the load test needs gunicorn and uvicorn "
+                    f"(pip install gunicorn uvicorn) or another --{name.replace('_', '-')} command"
+                )
+        method, wsgi_path, asgi_path, body = ROUTES[options['route']]
+        if options['route'] == 'site-resumes':
+            site, _ = SharePointSite.objects.update_or_create(
+                site_url=SITE_URL, defaults={'site_id': SITE, 'drive_id': DRIVE, 'resume_folder_id': FOLDER},
+            )
+            wsgi_path, asgi_path = wsgi_path.format(pk=site.pk), asgi_path.format(pk=site.pk)
+
+        _GraphStub.latency = options['latency_ms'] / 1000
+        _GraphStub.files = [{'id': f'loadtest-{i}', 'name': f'resume-{i}.pdf'} for i in range(options['files'])]
+        stub = _StubServer(('127.0.0.1', 0), _GraphStub)
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+        env = dict(
+            os.environ,
+            GRAPH_API_ENDPOINT=f"http://127.0.0.1:{stub.server_port}",
+            GRAPH_METADATA_CACHE_TTL='0',  # every request goes to the stub
+            GRAPH_RPM='0',
+            SLOW_REQUEST_MS=str(10 ** 9),
+        )
+
+        self.stdout.write(
+            f"{options['route']}: {options['requests']} requests, {options['concurrency']} concurrent, "
+            f"Graph stub latency {options['latency_ms']:.0f} ms\n"
+        )
+        self.stdout.write(f"{'deployment':<10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} "
+                          f"{'errors':>6} {'graph in flight':>15}")
+        try:
+            for name, command, path in (('WSGI', options['wsgi_server'], wsgi_path),
+                                        ('ASGI', options['asgi_server'], asgi_path)):
+                self._run(name, command, path, method, body, env, options)
+        finally:
+            stub.shutdown()
+            stub.server_close()
+
+    def _run(self, name, command, path, method, body, env, options):
+        port = _free_port()
+        argv = shlex.split(command.format(port=port))
+        with tempfile.TemporaryFile() as log:
+            process = subprocess.Popen(argv, env=env, cwd=settings.BASE_DIR, stdout=log, stderr=subprocess.STDOUT)
+            try:
+                if not _wait_until_listening(port, process):
+                    log.seek(0)
+                    self.stdout.write(f"{name:<10} server did not start:\n"
+                                      f"{log.read().decode('utf-8', 'replace')[-2000:]}")
+                    return
+                # Warm up the worker (imports, connection pools) before measuring.
+                asyncio.run(_load(f"http://127.0.0.1:{port}", method, path, body, 5, 5))
+                _GraphStub.peak = 0
+                seconds, latencies, errors = asyncio.run(_load(
+                    f"http://127.0.0.1:{port}", method, path, body, options['requests'], options['concurrency'],
+                ))
+            finally:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+        self.stdout.write(
+            f"{name:<10} {len(latencies) / seconds:>8.1f} {statistics.median(latencies or [0]):>8.1f} "
+            f"{percentile(latencies, 95):>8.1f} {max(latencies or [0]):>8.1f} {errors:>6} {_GraphStub.peak:>15}"
+        )
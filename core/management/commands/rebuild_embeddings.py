@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core import embeddings
+from core.models import Candidate, CandidateEmbedding
+
+
+class Command(BaseCommand):
+    help = "Compute embeddings for candidates whose profile text changed (or all, with --force)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Re-encode every candidate")
+        parser.add_argument('--batch-size', type=int, default=64)
+
+    def handle(self, *args, **options):
+        encoder = embeddings.get_encoder()
+        self.stdout.write(f"Encoder: {encoder.name} ({encoder.dim} dimensions)")
+        encoded, skipped = embeddings.rebuild(
+            Candidate.objects.iterator(chunk_size=500),
+            batch_size=options['batch_size'], force=options['force'],
+        )
+        stale = CandidateEmbedding.objects.exclude(encoder=encoder.name).delete()[0]
+        self.stdout.write(self.style.SUCCESS(
+            f"Encoded {encoded} candidates, {skipped} unchanged, removed {stale} vectors from other encoders"
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core import search_index
+from core.models import Candidate
+
+
+class Command(BaseCommand):
+    help = "Re-index every candidate in the full-text search index."
+
+    def handle(self, *args, **options):
+        count = search_index.rebuild(Candidate.objects.iterator(chunk_size=500))
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} candidates"))
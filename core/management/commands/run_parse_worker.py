@@ -0,0 +1,25 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from core.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = "Process queued parse jobs until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help="Jobs processed in parallel")
+        parser.add_argument('--poll-interval', type=float, help="Seconds to wait when the queue is empty")
+        parser.add_argument('--burst', action='store_true', help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+        worker = Worker(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+            burst=options['burst'],
+        )
+        self.stdout.write(f"Parse worker {worker.name} started with {worker.concurrency} threads")
+        processed = worker.run()
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} jobs"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import scoring
+from core.models import JobOpening
+
+
+class Command(BaseCommand):
+    help = "Recompute stored candidate scores for every active job opening (or one, with --job)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', type=int, help="Primary key of a single JobOpening")
+        parser.add_argument('--batch-size', type=int, default=scoring.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['job']:
+            jobs = JobOpening.objects.filter(pk=options['job'])
+            if not jobs:
+                raise CommandError(f"Job opening {options['job']} not found")
+        else:
+            jobs = JobOpening.objects.filter(is_active=True)
+        for job in jobs:
+            count = scoring.score_job(job, batch_size=options['batch_size'])
+            self.stdout.write(f"{job.pk} {job.title}: scored {count} candidates")
+        self.stdout.write(self.style.SUCCESS("Done"))
@@ -0,0 +1,209 @@
+"""
+Process-local metrics in the Prometheus text format.
+
+Counters, gauges and histograms are registered once at import time
+(``counter`` / ``gauge`` / ``histogram``) and updated from anywhere; ``render``
+produces the body of the ``/metrics`` endpoint. No client library is needed.
+Values live in the memory of each process, so with several workers every
+worker must be scraped (or the request routed to a single metrics process).
+
+``span(stage)`` times a block of code into ``resume_stage_seconds`` and,
+inside a request (see core.middleware.TimingMiddleware), adds it to that
+request's timing breakdown, which is logged and sent as Server-Timing.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTE_BUCKETS = (1024, 10240, 102400, 524288, 1048576, 5242880, 10485760, 52428800)
+
+_registry = {}
+_registry_lock = threading.Lock()
+# Per-request {stage: [seconds, count]}; None outside a request.
+_request_spans = ContextVar('request_spans', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}  # tuple of label values -> value
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self.lock:
+            return self.values.get(self._key(labels), 0)
+
+    def lines(self):
+        with self.lock:
+            values = sorted(self.values.items())
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in values]
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        with self.lock:
+            return self.values.get(self._key(labels), 0)
+
+    lines = Counter.lines
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def snapshot(self, **labels):
+        with self.lock:
+            state = self.values.get(self._key(labels))
+            return None if state is None else {'sum': state['sum'], 'count': state['count']}
+
+    def lines(self):
+        with self.lock:
+            values = sorted((key, dict(state, counts=list(state['counts']))) for key, state in self.values.items())
+        lines = []
+        for key, state in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, ('le', _number(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(state['sum'])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {state['count']}")
+        return lines
+
+
+def _register(cls, name, *args, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, *args, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"{name} is already registered as a {metric.kind}")
+        return metric
+
+
+def counter(name, help_text, labels=()) -> Counter:
+    return _register(Counter, name, help_text, labels)
+
+
+def gauge(name, help_text, labels=()) -> Gauge:
+    return _register(Gauge, name, help_text, labels)
+
+
+def histogram(name, help_text, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram, name, help_text, labels, buckets=buckets)
+
+
+def render() -> str:
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: m.name)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.header())
+        lines.extend(metric.lines())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = histogram('resume_stage_seconds', "Time spent per pipeline stage.", ('stage',))
+STAGE_ERRORS = counter('resume_stage_errors_total', "Stages that raised an exception.", ('stage',))
+
+
+@contextmanager
+def span(stage):
+    """Time the block as ``stage``; exceptions are counted and re-raised."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        spans = _request_spans.get()
+        if spans is not None:
+            total = spans.setdefault(stage, [0.0, 0])
+            total[0] += elapsed
+            total[1] += 1
+
+
+def start_request():
+    """Begin collecting spans for the current request; returns a token for ``end_request``."""
+    return _request_spans.set({})
+
+
+def end_request(token) -> dict:
+    """Stop collecting and return {stage: [seconds, count]} for the request."""
+    spans = _request_spans.get() or {}
+    _request_spans.reset(token)
+    return spans
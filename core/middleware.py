@@ -0,0 +1,127 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+
+from . import metrics
+from .profiling import SamplingProfiler
+
+logger = logging.getLogger('core.timing')
+
+REQUEST_SECONDS = metrics.histogram(
+    'resume_http_request_seconds', "Time to produce a response, per view.", ('view', 'method'),
+)
+REQUESTS = metrics.counter('resume_http_requests_total', "Responses sent, per view and status.",
+                           ('view', 'method', 'status'))
+DB_SECONDS = metrics.histogram('resume_db_seconds', "Database time per request, per view.", ('view',))
+DB_QUERIES = metrics.counter('resume_db_queries_total', "Database queries run by requests, per view.", ('view',))
+
+
+class _QueryTimer:
+    """connection.execute_wrapper that adds up the time spent in the database."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+class TimingMiddleware:
+    """
+    Times every request end to end, with the database and the spans
+    (core.metrics.span) opened while handling it.
+
+    The breakdown is recorded in the request metrics, returned in a
+    Server-Timing header and logged as one JSON line on the "core.timing"
+    logger. Requests slower than SLOW_REQUEST_MS are logged as warnings and,
+    with PROFILE_SLOW_REQUESTS, with their sampled hot stacks (core.profiling).
+    It is async-capable, so async views under ASGI stay on the event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _start(self):
+        token = metrics.start_request()
+        profiler = None
+        if settings.PROFILE_SLOW_REQUESTS:
+            profiler = SamplingProfiler(interval=settings.PROFILE_SAMPLE_INTERVAL_MS / 1000).start()
+        return token, profiler
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token, profiler = self._start()
+        db = _QueryTimer()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(db):
+                response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            spans = metrics.end_request(token)
+            if profiler is not None:
+                profiler.stop()
+        return self._finish(request, response, elapsed, db, spans, profiler)
+
+    async def __acall__(self, request):
+        # Under ASGI the ORM runs queries in Django's sync thread, out of reach
+        # of an execute_wrapper installed here, so db time is not broken out.
+        token, profiler = self._start()
+        db = _QueryTimer()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            spans = metrics.end_request(token)
+            if profiler is not None:
+                profiler.stop()
+        return self._finish(request, response, elapsed, db, spans, profiler)
+
+    def _finish(self, request, response, elapsed, db, spans, profiler):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        REQUEST_SECONDS.observe(elapsed, view=view, method=request.method)
+        REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        DB_SECONDS.observe(db.seconds, view=view)
+        DB_QUERIES.inc(db.queries, view=view)
+
+        timing = [f"total;dur={elapsed * 1000:.1f}", f"db;dur={db.seconds * 1000:.1f}"]
+        timing += [f"{stage};dur={seconds * 1000:.1f}" for stage, (seconds, _) in spans.items()]
+        response['Server-Timing'] = ", ".join(timing)
+
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": view,
+            "status": response.status_code,
+            "ms": round(elapsed * 1000, 1),
+            "db_ms": round(db.seconds * 1000, 1),
+            "db_queries": db.queries,
+            "spans": {stage: {"ms": round(seconds * 1000, 1), "count": count}
+                      for stage, (seconds, count) in spans.items()},
+        }
+        slow = elapsed * 1000 >= settings.SLOW_REQUEST_MS
+        if slow and profiler is not None and profiler.samples:
+            record["profile"] = {"samples": profiler.samples, "top": profiler.top()}
+            if settings.PROFILE_DIR:
+                record["profile"]["file"] = profiler.write_collapsed(settings.PROFILE_DIR, view.replace(':', '-'))
+        logger.log(logging.WARNING if slow else logging.INFO, json.dumps(record))
+        return response
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-17 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_remove_candidate_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParseCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('prompt_version', models.CharField(max_length=32)),
+                ('parsed_data', models.JSONField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+    ]
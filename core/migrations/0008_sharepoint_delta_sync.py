@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-17 19:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_parsecacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sharepointsite',
+            name='delta_link',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='sharepointsite',
+            name='last_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sharepointsite',
+            name='resume_folder_id',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.CreateModel(
+            name='SharePointFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_id', models.CharField(max_length=255)),
+                ('name', models.CharField(blank=True, default='', max_length=255)),
+                ('web_url', models.URLField(blank=True, default='', max_length=1000)),
+                ('etag', models.CharField(blank=True, default='', max_length=255)),
+                ('parsed_etag', models.CharField(blank=True, default='', max_length=255)),
+                ('needs_parse', models.BooleanField(db_index=True, default=True)),
+                ('deleted', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='files', to='core.sharepointsite')),
+            ],
+            options={
+                'unique_together': {('site', 'file_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-17 19:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_sharepoint_delta_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Domain',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('normalized', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Skill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('normalized', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='candidate',
+            name='total_years_of_experience',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, max_digits=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='candidate',
+            name='domains',
+            field=models.ManyToManyField(blank=True, related_name='candidates', to='core.domain'),
+        ),
+        migrations.AddField(
+            model_name='candidate',
+            name='skill_set',
+            field=models.ManyToManyField(blank=True, related_name='candidates', to='core.skill'),
+        ),
+    ]
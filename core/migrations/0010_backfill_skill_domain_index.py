@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-17 19:33
+
+from django.db import migrations
+
+
+def _normalize(term):
+    if not isinstance(term, str):
+        return ''
+    return " ".join(term.split()).lower()[:255]
+
+
+def _terms(model, names, cache):
+    terms = []
+    for name in names or []:
+        key = _normalize(name)
+        if not key:
+            continue
+        if key not in cache:
+            cache[key], _ = model.objects.get_or_create(
+                normalized=key, defaults={'name': " ".join(name.split())[:255]}
+            )
+        terms.append(cache[key])
+    return terms
+
+
+def backfill(apps, schema_editor):
+    Candidate = apps.get_model('core', 'Candidate')
+    Skill = apps.get_model('core', 'Skill')
+    Domain = apps.get_model('core', 'Domain')
+    skills, domains = {}, {}
+    for candidate in Candidate.objects.only('id', 'skills', 'domain_classification').iterator():
+        candidate.skill_set.set(_terms(Skill, candidate.skills, skills))
+        candidate.domains.set(_terms(Domain, candidate.domain_classification, domains))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_skill_domain_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
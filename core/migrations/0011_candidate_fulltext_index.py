@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-17 19:34
+
+from django.db import migrations
+
+from core import search_index
+
+
+def create_index(apps, schema_editor):
+    search_index.create_index(schema_editor)
+    Candidate = apps.get_model('core', 'Candidate')
+    alias = schema_editor.connection.alias
+    search_index.rebuild(Candidate.objects.using(alias).iterator(), using=alias)
+
+
+def drop_index(apps, schema_editor):
+    search_index.drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_backfill_skill_domain_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
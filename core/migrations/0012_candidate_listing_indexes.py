@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-17 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_candidate_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(fields=['name', 'id'], name='candidate_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(fields=['total_years_of_experience', 'id'], name='candidate_experience_id_idx'),
+        ),
+    ]
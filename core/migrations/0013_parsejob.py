@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-17 19:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_candidate_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParseJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_id', models.CharField(db_index=True, max_length=255)),
+                ('site_id', models.CharField(max_length=255)),
+                ('drive_id', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('queued', 'queued'), ('running', 'running'), ('succeeded', 'succeeded'), ('dead', 'dead')], default='queued', max_length=16)),
+                ('stage', models.CharField(blank=True, default='', max_length=32)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3)),
+                ('error', models.TextField(blank=True, default='')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, default='', max_length=64)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('candidate', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='parse_jobs', to='core.candidate')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'available_at'], name='parsejob_claim_idx')],
+            },
+        ),
+    ]
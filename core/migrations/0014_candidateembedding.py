@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-17 19:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_parsejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateEmbedding',
+            fields=[
+                ('candidate', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='embedding', serialize=False, to='core.candidate')),
+                ('encoder', models.CharField(max_length=128)),
+                ('vector', models.BinaryField()),
+                ('text_hash', models.CharField(max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-17 19:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_candidateembedding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobOpening',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True, default='')),
+                ('required_skills', models.JSONField(blank=True, default=list)),
+                ('preferred_skills', models.JSONField(blank=True, default=list)),
+                ('domain', models.CharField(blank=True, default='', max_length=255)),
+                ('min_experience', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('max_experience', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('is_active', models.BooleanField(db_index=True, default=True)),
+                ('scored_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CandidateScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('required_matched', models.PositiveSmallIntegerField(default=0)),
+                ('preferred_matched', models.PositiveSmallIntegerField(default=0)),
+                ('domain_match', models.BooleanField(default=False)),
+                ('experience_fit', models.FloatField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='job_scores', to='core.candidate')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scores', to='core.jobopening')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['job', '-score'], name='candidatescore_rank_idx')],
+                'unique_together': {('job', 'candidate')},
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-17 19:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_jobopening_candidatescore'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='parsecacheentry',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='parsejob',
+            name='file_id',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(models.OrderBy(models.F('total_years_of_experience'), descending=True), models.F('id'), name='candidate_experience_desc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(fields=['email'], name='candidate_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidateembedding',
+            index=models.Index(fields=['encoder', 'updated_at'], name='embedding_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parsejob',
+            index=models.Index(fields=['status', 'locked_at'], name='parsejob_stale_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parsejob',
+            index=models.Index(fields=['file_id', 'status'], name='parsejob_file_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sharepointfile',
+            index=models.Index(fields=['site', 'needs_parse', 'deleted'], name='spfile_pending_idx'),
+        ),
+    ]
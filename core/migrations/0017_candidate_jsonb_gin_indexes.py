@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-17 19:55
+
+from django.db import migrations
+
+# GIN indexes only exist on PostgreSQL (JSONField is jsonb there); on other
+# backends this migration is a no-op. Built CONCURRENTLY so applying it on a
+# live database does not block writes, hence atomic = False.
+INDEXES = [
+    # jsonb_path_ops: smaller and faster, supports containment (parsed_data @> '{...}')
+    ('candidate_parsed_data_gin', 'parsed_data jsonb_path_ops'),
+    # default jsonb_ops also supports key/element existence (skills ? 'Python')
+    ('candidate_skills_gin', 'skills'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON core_candidate USING GIN ({column})"
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0016_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
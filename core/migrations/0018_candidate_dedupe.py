@@ -0,0 +1,61 @@
+# Generated by Django 5.2 on 2026-10-17 19:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.resume_parser.fastpath import email_key, phone_key
+
+
+def backfill_contact_keys(apps, schema_editor):
+    Candidate = apps.get_model('core', 'Candidate')
+    for candidate in Candidate.objects.only('id', 'email', 'phone').iterator():
+        candidate.email_key = email_key(candidate.email)
+        candidate.phone_key = phone_key(candidate.phone)
+        candidate.save(update_fields=['email_key', 'phone_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_candidate_jsonb_gin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumeFingerprint',
+            fields=[
+                ('candidate', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='core.candidate')),
+                ('text_hash', models.CharField(db_index=True, max_length=64)),
+                ('minhash', models.BinaryField()),
+                ('simhash', models.BigIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='candidate',
+            name='canonical',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='core.candidate'),
+        ),
+        migrations.AddField(
+            model_name='candidate',
+            name='email_key',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='candidate',
+            name='phone_key',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='FingerprintBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True)),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprint_bands', to='core.candidate')),
+            ],
+            options={
+                'unique_together': {('candidate', 'key')},
+            },
+        ),
+        migrations.RunPython(backfill_contact_keys, migrations.RunPython.noop),
+    ]
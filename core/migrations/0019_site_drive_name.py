@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_candidate_dedupe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sharepointsite',
+            name='drive_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
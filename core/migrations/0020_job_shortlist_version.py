@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 20:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_site_drive_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobopening',
+            name='shortlist_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
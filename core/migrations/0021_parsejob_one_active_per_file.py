@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-17 20:38
+
+from django.db import migrations, models
+
+
+def dead_letter_duplicates(apps, schema_editor):
+    """Keep the oldest queued or running job of each file; the others could not be constrained."""
+    ParseJob = apps.get_model('core', 'ParseJob')
+    db = schema_editor.connection.alias
+    active = ParseJob.objects.using(db).filter(status__in=['queued', 'running'])
+    kept = set()
+    duplicates = []
+    for pk, file_id in active.order_by('file_id', 'id').values_list('id', 'file_id'):
+        if file_id in kept:
+            duplicates.append(pk)
+        else:
+            kept.add(file_id)
+    ParseJob.objects.using(db).filter(pk__in=duplicates).update(
+        status='dead', error='Duplicate of an earlier job for the same file', locked_by='', locked_at=None,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_job_shortlist_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(dead_letter_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='parsejob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('file_id',), name='parsejob_one_active_per_file'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-17 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_parsejob_one_active_per_file'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='candidate',
+            name='candidate_email_idx',
+        ),
+        migrations.AlterField(
+            model_name='candidate',
+            name='total_years_of_experience',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True),
+        ),
+    ]
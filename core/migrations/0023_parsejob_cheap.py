@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_drop_redundant_candidate_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parsejob',
+            name='cheap',
+            field=models.BooleanField(default=False),
+        ),
+    ]
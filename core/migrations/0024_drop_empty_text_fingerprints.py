@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-17 21:05
+
+import hashlib
+
+from django.db import migrations
+
+# sha256 of the normalized words of a text without any: every scan without a
+# text layer had this fingerprint, so they all matched one another.
+EMPTY_TEXT_HASH = hashlib.sha256(b"").hexdigest()
+
+
+def drop_empty_text_fingerprints(apps, schema_editor):
+    """Forget fingerprints of empty texts; `manage.py dedupe_candidates --reset` then undoes their links."""
+    ResumeFingerprint = apps.get_model('core', 'ResumeFingerprint')
+    FingerprintBand = apps.get_model('core', 'FingerprintBand')
+    db = schema_editor.connection.alias
+    empty = ResumeFingerprint.objects.using(db).filter(text_hash=EMPTY_TEXT_HASH)
+    FingerprintBand.objects.using(db).filter(candidate_id__in=empty.values('candidate_id')).delete()
+    empty.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_parsejob_cheap'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_empty_text_fingerprints, migrations.RunPython.noop),
+    ]
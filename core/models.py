@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class ParsedResume(models.Model):
     filename = models.CharField(max_length=255)
@@ -12,11 +13,49 @@ class SharePointSite(models.Model):
     site_url = models.URLField(unique=True)
     site_id = models.CharField(max_length=255)
     drive_id = models.CharField(max_length=255)
+    drive_name = models.CharField(max_length=255, blank=True, default='')
+    resume_folder_id = models.CharField(max_length=255, blank=True, default='')
+    delta_link = models.TextField(blank=True, default='')       # Graph delta link for incremental sync
+    last_synced_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.site_url
 
+class SharePointFile(models.Model):
+    """A file in a site's Resume folder, as last seen by delta sync."""
+    site = models.ForeignKey(SharePointSite, on_delete=models.CASCADE, related_name='files')
+    file_id = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, blank=True, default='')
+    web_url = models.URLField(max_length=1000, blank=True, default='')
+    etag = models.CharField(max_length=255, blank=True, default='')
+    parsed_etag = models.CharField(max_length=255, blank=True, default='')  # eTag of the version last parsed
+    needs_parse = models.BooleanField(default=True, db_index=True)
+    deleted = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('site', 'file_id')
+        # Ingestion picks up site.files.filter(needs_parse=True, deleted=False)
+        indexes = [models.Index(fields=['site', 'needs_parse', 'deleted'], name='spfile_pending_idx')]
+
+    def __str__(self):
+        return self.name
+
+class Skill(models.Model):
+    name = models.CharField(max_length=255)                         # Display form, as first seen
+    normalized = models.CharField(max_length=255, unique=True)      # Lower-cased, whitespace-collapsed
+
+    def __str__(self):
+        return self.name
+
+class Domain(models.Model):
+    name = models.CharField(max_length=255)
+    normalized = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
+
 class Candidate(models.Model):
     file_id = models.CharField(max_length=255, unique=True)
     resume_id = models.CharField(max_length=12, unique=True)
@@ -29,7 +68,156 @@ class Candidate(models.Model):
     skills = models.JSONField(default=list, blank=True, null=True)                  # Stores the list of skills
     domain_classification = models.JSONField(default=list, blank=True, null=True)   # Stores the domain classifications
     total_years_of_experience = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)  # Stores the years of experience
+    skill_set = models.ManyToManyField(Skill, related_name='candidates', blank=True)     # Normalized, indexed copy of skills
+    domains = models.ManyToManyField(Domain, related_name='candidates', blank=True)      # Normalized copy of domain_classification
+    email_key = models.CharField(max_length=255, blank=True, default='', db_index=True)  # fastpath.email_key(email)
+    phone_key = models.CharField(max_length=20, blank=True, default='', db_index=True)   # fastpath.phone_key(phone)
+    canonical = models.ForeignKey('self', on_delete=models.SET_NULL, blank=True, null=True,
+                                  related_name='duplicates')  # Set on duplicates only; see core.dedupe
+
+    class Meta:
+        indexes = [
+            # Keyset pagination in list_candidates sorts on (field, id), either way round;
+            # the experience one also serves min_experience filters.
+            models.Index(fields=['name', 'id'], name='candidate_name_id_idx'),
+            models.Index(fields=['total_years_of_experience', 'id'], name='candidate_experience_id_idx'),
+            # Search ranks by experience descending with id ascending as the tie-breaker,
+            # an order the index above cannot be scanned in.
+            models.Index(models.F('total_years_of_experience').desc(), 'id',
+                         name='candidate_experience_desc_idx'),
+        ]
+
+
+    def __str__(self):
+        return self.name
+
+
+class CandidateEmbedding(models.Model):
+    """Float32 embedding of a candidate's profile text, loaded into the in-memory index in core.embeddings."""
+    candidate = models.OneToOneField(Candidate, on_delete=models.CASCADE, primary_key=True, related_name='embedding')
+    encoder = models.CharField(max_length=128)                 # Encoder that produced the vector, e.g. "hashing-384"
+    vector = models.BinaryField()                              # L2-normalized float32 array, tobytes()
+    text_hash = models.CharField(max_length=64)                # sha256 of the embedded text; unchanged text is not re-encoded
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # VectorIndex.refresh loads rows of one encoder written since the last sync
+        indexes = [models.Index(fields=['encoder', 'updated_at'], name='embedding_sync_idx')]
+
+    def __str__(self):
+        return f"{self.candidate_id} ({self.encoder})"
+
+
+class ResumeFingerprint(models.Model):
+    """MinHash/SimHash of the text a candidate was parsed from, for near-duplicate detection (core.dedupe)."""
+    candidate = models.OneToOneField(Candidate, on_delete=models.CASCADE, primary_key=True, related_name='fingerprint')
+    text_hash = models.CharField(max_length=64, db_index=True)    # sha256 of the normalized words
+    minhash = models.BinaryField()                                 # uint32 signature, tobytes()
+    simhash = models.BigIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.candidate_id} ({self.text_hash[:12]})"
+
+
+class FingerprintBand(models.Model):
+    """One LSH band key of a fingerprint; candidates sharing a key are compared as possible duplicates."""
+    candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, related_name='fingerprint_bands')
+    key = models.BigIntegerField(db_index=True)
+
+    class Meta:
+        unique_together = ('candidate', 'key')
+
+    def __str__(self):
+        return f"{self.candidate_id}: {self.key}"
+
+
+class JobOpening(models.Model):
+    """An open position; candidates are scored against it in core.scoring."""
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True, default='')
+    required_skills = models.JSONField(default=list, blank=True)
+    preferred_skills = models.JSONField(default=list, blank=True)
+    domain = models.CharField(max_length=255, blank=True, default='')
+    min_experience = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
+    max_experience = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
+    is_active = models.BooleanField(default=True, db_index=True)
+    scored_at = models.DateTimeField(blank=True, null=True)          # Last full scoring run
+    shortlist_version = models.PositiveIntegerField(default=0)       # Bumped on rescoring; keys cached shortlists
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.title
+
+
+class CandidateScore(models.Model):
+    """Precomputed fit of one candidate for one job opening; shortlists read from here."""
+    job = models.ForeignKey(JobOpening, on_delete=models.CASCADE, related_name='scores')
+    candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, related_name='job_scores')
+    score = models.FloatField()                                       # 0..1, weighted sum of the parts below
+    required_matched = models.PositiveSmallIntegerField(default=0)
+    preferred_matched = models.PositiveSmallIntegerField(default=0)
+    domain_match = models.BooleanField(default=False)
+    experience_fit = models.FloatField(default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('job', 'candidate')
+        indexes = [models.Index(fields=['job', '-score'], name='candidatescore_rank_idx')]
+
+    def __str__(self):
+        return f"{self.job_id}/{self.candidate_id}: {self.score:.3f}"
+
+
+class ParseCacheEntry(models.Model):
+    """LLM parse result keyed by a hash of the extracted resume text and prompt version."""
+    key = models.CharField(max_length=64, unique=True)
+    prompt_version = models.CharField(max_length=32)
+    parsed_data = models.JSONField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    last_used_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+class ParseJob(models.Model):
+    """A queued parse of one drive item, processed by `manage.py run_parse_worker`."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    DEAD = 'dead'           # Failed max_attempts times (or permanently); needs a manual retry
+    STATUS_CHOICES = [(s, s) for s in (QUEUED, RUNNING, SUCCEEDED, DEAD)]
+
+    file_id = models.CharField(max_length=255)   # Indexed with status below
+    site_id = models.CharField(max_length=255)
+    drive_id = models.CharField(max_length=255)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    stage = models.CharField(max_length=32, blank=True, default='')      # Last pipeline stage reached
+    cheap = models.BooleanField(default=False)                           # Fast-path fields only, no Gemini call
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    error = models.TextField(blank=True, default='')
+    candidate = models.ForeignKey(Candidate, on_delete=models.SET_NULL, blank=True, null=True, related_name='parse_jobs')
+    available_at = models.DateTimeField(default=timezone.now)              # Not claimed before this (retry backoff)
+    locked_by = models.CharField(max_length=64, blank=True, default='')
+    locked_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='parsejob_claim_idx'),
+            models.Index(fields=['status', 'locked_at'], name='parsejob_stale_idx'),
+            models.Index(fields=['file_id', 'status'], name='parsejob_file_status_idx'),
+        ]
+        constraints = [
+            # One queued or running job per file; enqueue_parse relies on it.
+            models.UniqueConstraint(fields=['file_id'], condition=models.Q(status__in=['queued', 'running']),
+                                    name='parsejob_one_active_per_file'),
+        ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f"{self.file_id} ({self.status})"
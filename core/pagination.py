@@ -0,0 +1,54 @@
+"""
+Keyset (cursor) pagination for candidate listings.
+
+The cursor encodes the sort value and id of the last row returned, so each
+page is an indexed range scan no matter how deep the client pages, unlike
+OFFSET which re-reads every skipped row. NULL sort values are ordered last.
+"""
+import base64
+import json
+from decimal import Decimal
+
+from django.db.models import F, Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(value, pk):
+    if isinstance(value, Decimal):
+        value = str(value)
+    raw = json.dumps([value, pk]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+        return value, int(pk)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def order_queryset(qs, field, descending):
+    if field == 'id':
+        return qs.order_by('-id' if descending else 'id')
+    expr = F(field).desc(nulls_last=True) if descending else F(field).asc(nulls_last=True)
+    return qs.order_by(expr, '-id' if descending else 'id')
+
+
+def after_cursor(qs, field, descending, value, pk):
+    """Restrict an ordered queryset to the rows that come after (value, pk)."""
+    if field == 'id':
+        return qs.filter(id__lt=pk) if descending else qs.filter(id__gt=pk)
+    past_id = Q(id__lt=pk) if descending else Q(id__gt=pk)
+    if value is None:
+        return qs.filter(Q(**{f'{field}__isnull': True}) & past_id)
+    past_value = Q(**{f'{field}__lt': value}) if descending else Q(**{f'{field}__gt': value})
+    return qs.filter(
+        past_value
+        | (Q(**{field: value}) & past_id)
+        | Q(**{f'{field}__isnull': True})
+    )
@@ -0,0 +1,171 @@
+"""
+Batched candidate writes for ingestion runs.
+
+``save_candidate`` costs a get_or_create, a full save() and the per-candidate
+hooks (skill/domain links, search index, scores, embedding, duplicates), each
+in its own autocommit transaction. CandidateWriter buffers parsed results and
+writes a batch at a time instead:
+
+* one query loads the batch's existing rows, and each row is compared with
+  its new values so only the fields that changed are written (rows with no
+  change are not written at all);
+* new and changed rows are upserted with bulk_create(update_conflicts=True),
+  one statement per set of changed fields, in one transaction per batch that
+  also covers the links, the search index, the scores and the sync flags;
+* embeddings and duplicate links, being derived data, are written after the
+  commit in one batch each, and never fail the batch.
+
+If a batch cannot be written its rows are saved one by one with
+``save_candidate``, so one bad row does not fail the others.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils.crypto import get_random_string
+
+from . import dedupe, embeddings, scoring, search_index
+from .models import Candidate
+from .resume_parser.pipeline import candidate_defaults, save_candidate
+from .sync import mark_parsed
+from .taxonomy import sync_terms_bulk
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingSave:
+    file_id: str
+    resume_url: str
+    parsed: dict
+    etag: str = None
+    mark: bool = True
+    fp: object = None           # resume_parser.fingerprint.Fingerprint
+    on_done: object = None      # callable(candidate, error), called once the row is written or has failed
+
+
+def _comparable(field, value):
+    value = field.to_python(value)
+    if isinstance(field, models.DecimalField) and value is not None:
+        value = value.quantize(Decimal(1).scaleb(-field.decimal_places))
+    return value
+
+
+def changed_fields(candidate, values) -> list:
+    """Names of the fields whose new value differs from the stored one."""
+    changed = []
+    for name, value in values.items():
+        field = Candidate._meta.get_field(name)
+        if _comparable(field, value) != _comparable(field, getattr(candidate, name)):
+            changed.append(name)
+    return changed
+
+
+class CandidateWriter:
+    """Collects parsed resumes and writes them ``batch_size`` at a time (see the module docstring)."""
+
+    def __init__(self, batch_size=None, max_delay=None):
+        self.batch_size = max(batch_size or settings.INGEST_SAVE_BATCH_SIZE, 1)
+        self.max_delay = settings.INGEST_SAVE_MAX_DELAY if max_delay is None else max_delay
+        self.pending = []
+        self.first_added = None
+        self.stats = {'batches': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'fields_written': 0, 'failed': 0}
+
+    def __len__(self):
+        return len(self.pending)
+
+    @property
+    def due(self):
+        """Whether the buffered rows have waited max_delay seconds and should be written now."""
+        return bool(self.pending) and time.monotonic() - self.first_added >= self.max_delay
+
+    def add(self, file_id, resume_url, parsed, etag=None, mark=True, fp=None, on_done=None):
+        if not self.pending:
+            self.first_added = time.monotonic()
+        self.pending.append(PendingSave(file_id, resume_url, parsed, etag, mark, fp, on_done))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered row; returns [(PendingSave, Candidate or None, error or None)]."""
+        batch, self.pending = self.pending, []
+        if not batch:
+            return []
+        # A file queued twice in one batch is written once, with its latest result.
+        latest = {}
+        for item in batch:
+            latest[item.file_id] = item
+        try:
+            saved = self._write(list(latest.values()))
+            results = [(item, saved[item.file_id], None) for item in batch]
+        except Exception as e:
+            logger.warning("Batch of %d candidates failed (%s); saving them one by one", len(latest), e)
+            results = []
+            for item in latest.values():
+                try:
+                    candidate = save_candidate(item.file_id, item.resume_url, item.parsed, item.etag,
+                                               mark=item.mark, fp=item.fp)
+                    results.append((item, candidate, None))
+                except Exception as row_error:
+                    self.stats['failed'] += 1
+                    results.append((item, None, row_error))
+            by_file = {item.file_id: (candidate, error) for item, candidate, error in results}
+            results = [(item, *by_file[item.file_id]) for item in batch]
+        self.stats['batches'] += 1
+        for item, candidate, error in results:
+            if item.on_done:
+                item.on_done(candidate, error)
+        return results
+
+    def _write(self, items):
+        values = {item.file_id: candidate_defaults(item.parsed, item.resume_url) for item in items}
+        counts = dict.fromkeys(('created', 'updated', 'unchanged', 'fields_written'), 0)
+        with transaction.atomic():
+            existing = Candidate.objects.in_bulk(list(values), field_name='file_id')
+            groups = {}  # frozenset of changed fields (None for new rows) -> [Candidate]
+            for file_id, row in values.items():
+                current = existing.get(file_id)
+                if current is None:
+                    key = None
+                    obj = Candidate(file_id=file_id, resume_id=get_random_string(12), **row)
+                else:
+                    key = frozenset(changed_fields(current, row))
+                    if not key:
+                        counts['unchanged'] += 1
+                        continue
+                    obj = Candidate(file_id=file_id, resume_id=current.resume_id, **row)
+                    counts['fields_written'] += len(key)
+                groups.setdefault(key, []).append(obj)
+
+            for key, objs in groups.items():
+                fields = sorted(key) if key is not None else sorted(values[objs[0].file_id])
+                Candidate.objects.bulk_create(
+                    objs, update_conflicts=True, unique_fields=['file_id'], update_fields=fields,
+                )
+                counts['created' if key is None else 'updated'] += len(objs)
+
+            written = [obj.file_id for objs in groups.values() for obj in objs]
+            saved = Candidate.objects.in_bulk(list(values), field_name='file_id')
+            changed = [saved[file_id] for file_id in written]
+            if changed:
+                sync_terms_bulk(changed)
+                search_index.rebuild(changed)
+                scoring.score_candidates(changed)
+            for item in items:
+                if item.mark:
+                    mark_parsed(item.file_id, item.etag)
+        for key, n in counts.items():
+            self.stats[key] += n
+
+        try:
+            embeddings.embed_candidates(changed)
+        except Exception:
+            logger.exception("Could not embed a batch of %d candidates", len(changed))
+        try:
+            dedupe.register_bulk([(saved[item.file_id], item.fp) for item in items])
+        except Exception:
+            logger.exception("Could not link duplicates for a batch of %d candidates", len(items))
+        return saved
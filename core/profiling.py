@@ -0,0 +1,73 @@
+"""
+Opt-in sampling profiler for slow requests.
+
+With PROFILE_SLOW_REQUESTS on, TimingMiddleware starts a SamplingProfiler
+for each request: a daemon thread that reads the request thread's stack
+(``sys._current_frames``) every PROFILE_SAMPLE_INTERVAL_MS milliseconds.
+Nothing is traced, so the request itself runs at full speed; the cost is the
+sampler thread waking up. When the request took longer than
+SLOW_REQUEST_MS, the most frequent stacks are logged and, with PROFILE_DIR
+set, written in the collapsed "frame;frame;frame count" format that
+flamegraph.pl and speedscope read.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+MAX_DEPTH = 64
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None and len(stack) < MAX_DEPTH:
+            stack.append(_frame_name(frame))
+            frame = frame.f_back
+        if stack:
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def top(self, limit=10, depth=4):
+        """The ``limit`` hottest call sites as (innermost ``depth`` frames, share of samples)."""
+        sites = Counter()
+        for stack, count in self.stacks.items():
+            sites[" <- ".join(reversed(stack.split(";")[-depth:]))] += count
+        return [(site, round(count / self.samples, 3)) for site, count in sites.most_common(limit)]
+
+    def write_collapsed(self, directory, name):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
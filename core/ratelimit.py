@@ -0,0 +1,264 @@
+"""
+Client-side rate limits for Graph and Gemini, shared by every worker process.
+
+Each upstream (the part of the http_client endpoint name before the first
+dot: "graph", "gemini") has a token bucket for requests and, for Gemini, a
+second one for LLM tokens, refilled continuously at the per-minute quota
+from RATE_LIMITS. A caller takes one request and its estimated tokens before
+each attempt and sleeps until the buckets hold enough; a request larger than
+the token bucket waits for a full bucket and leaves it in debt. Usage reported
+by the upstream is settled afterwards (``settle``), and a 429 pauses the whole
+upstream for its Retry-After (``pause``), so the workers back off together
+instead of retrying into a storm.
+
+The bucket state lives in a small JSON file per upstream under
+RATE_LIMIT_DIR, read and written under an exclusive ``fcntl.flock``, so all
+processes on the host draw from the same buckets. Where fcntl is not
+available the state is kept per process. Async callers (``aacquire``,
+``apause``) share the same buckets; the locked file access runs in a worker
+thread and the waits are event-loop sleeps, so neither blocks the loop.
+"""
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from . import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to per-process buckets
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+WAITING = metrics.gauge('resume_ratelimit_waiting', "Callers in this process waiting for a rate limit.",
+                        ('upstream',))
+WAIT_SECONDS = metrics.histogram('resume_ratelimit_wait_seconds', "Time spent waiting for a rate limit.",
+                                 ('upstream',))
+THROTTLED = metrics.counter('resume_ratelimit_throttled_total', "Requests that had to wait for a rate limit.",
+                            ('upstream',))
+PAUSES = metrics.counter('resume_ratelimit_pauses_total', "Upstream pauses after a 429 response.", ('upstream',))
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+class RateLimitTimeout(RuntimeError):
+    pass
+
+
+class _SharedState:
+    """The bucket state as a JSON file, locked with flock while it is read and updated."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()  # one thread per process at a time contends for the flock
+
+    @contextmanager
+    def open(self):
+        with self.lock, open(self.path, 'a+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                try:
+                    state = json.loads(raw) if raw else {}
+                except ValueError:
+                    state = {}
+                yield state
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class _LocalState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = {}
+
+    @contextmanager
+    def open(self):
+        with self.lock:
+            yield self.state
+
+
+class TokenBucket:
+    """Request and token buckets for one upstream."""
+
+    def __init__(self, upstream, requests_per_minute=0, tokens_per_minute=0, burst_seconds=1.0, store=None):
+        self.upstream = upstream
+        # Bucket kind -> (refill per second, capacity)
+        self.buckets = {}
+        for kind, per_minute in (('requests', requests_per_minute), ('tokens', tokens_per_minute)):
+            if per_minute > 0:
+                rate = per_minute / 60
+                self.buckets[kind] = (rate, max(1.0, rate * burst_seconds))
+        self.store = store or _LocalState()
+
+    def _refill(self, state, now):
+        levels = state.setdefault('levels', {})
+        elapsed = max(0.0, now - state.get('at', now))
+        for kind, (rate, capacity) in self.buckets.items():
+            levels[kind] = min(capacity, levels.get(kind, capacity) + elapsed * rate)
+        state['at'] = now
+        return levels
+
+    def _take(self, state, now, amounts):
+        """Take ``amounts`` and return 0, or return how long to wait before trying again."""
+        levels = self._refill(state, now)
+        paused = state.get('paused_until', 0) - now
+        if paused > 0:
+            return paused
+        wait = 0.0
+        for kind, (rate, capacity) in self.buckets.items():
+            needed = min(amounts.get(kind, 0), capacity)
+            if levels[kind] < needed:
+                wait = max(wait, (needed - levels[kind]) / rate)
+        if wait:
+            return wait
+        for kind in self.buckets:
+            levels[kind] -= amounts.get(kind, 0)
+        return 0.0
+
+    def _waits(self, tokens, max_wait):
+        """Take one request (and ``tokens``), yielding how long to sleep each time capacity falls short."""
+        amounts = {'requests': 1, 'tokens': tokens}
+        started = time.monotonic()
+        waiting = False
+        try:
+            while True:
+                with self.store.open() as state:
+                    delay = self._take(state, time.time(), amounts)
+                if not delay:
+                    break
+                if not waiting:
+                    waiting = True
+                    WAITING.inc(upstream=self.upstream)
+                    THROTTLED.inc(upstream=self.upstream)
+                waited = time.monotonic() - started
+                if max_wait is not None and waited + delay > max_wait:
+                    raise RateLimitTimeout(
+                        f"{self.upstream} rate limit: would wait over {max_wait:.0f}s for capacity"
+                    )
+                # Short naps, so a pause or a settled refund elsewhere is noticed.
+                yield min(delay, 1.0)
+        finally:
+            if waiting:
+                WAITING.dec(upstream=self.upstream)
+        WAIT_SECONDS.observe(time.monotonic() - started, upstream=self.upstream)
+
+    def acquire(self, tokens=0, max_wait=None):
+        """Block until one request (and ``tokens``) may be sent; returns the seconds waited."""
+        started = time.monotonic()
+        for delay in self._waits(tokens, max_wait):
+            time.sleep(delay)
+        return time.monotonic() - started
+
+    async def aacquire(self, tokens=0, max_wait=None):
+        """``acquire`` for async callers: waits without blocking the event loop."""
+        started = time.monotonic()
+        waits = self._waits(tokens, max_wait)
+        # Each step takes the (flock-ed) store, so it runs in a thread.
+        while (delay := await asyncio.to_thread(next, waits, None)) is not None:
+            await asyncio.sleep(delay)
+        return time.monotonic() - started
+
+    def settle(self, estimated, actual):
+        """Correct the token bucket once the real token count of a request is known."""
+        if 'tokens' not in self.buckets or actual == estimated:
+            return
+        with self.store.open() as state:
+            levels = self._refill(state, time.time())
+            levels['tokens'] = min(self.buckets['tokens'][1], levels['tokens'] + estimated - actual)
+
+    def pause(self, seconds):
+        """Hold every caller off this upstream for ``seconds`` (after a 429)."""
+        PAUSES.inc(upstream=self.upstream)
+        with self.store.open() as state:
+            state['paused_until'] = max(state.get('paused_until', 0), time.time() + seconds)
+
+    def snapshot(self):
+        with self.store.open() as state:
+            levels = self._refill(state, time.time())
+            return {
+                "levels": {kind: round(level, 1) for kind, level in levels.items()},
+                "paused_for": round(max(0.0, state.get('paused_until', 0) - time.time()), 1),
+                "waiting_here": WAITING.value(upstream=self.upstream),
+            }
+
+
+def _store(upstream):
+    if fcntl is None:
+        return _LocalState()
+    directory = settings.RATE_LIMIT_DIR or os.path.join(tempfile.gettempdir(), 'resume-ratelimit')
+    os.makedirs(directory, exist_ok=True)
+    return _SharedState(os.path.join(directory, f"{upstream}.json"))
+
+
+def upstream_of(endpoint):
+    return (endpoint or '').split('.', 1)[0]
+
+
+def bucket(endpoint):
+    """The TokenBucket for the endpoint's upstream, or None when it has no limits configured."""
+    upstream = upstream_of(endpoint)
+    with _buckets_lock:
+        if upstream not in _buckets:
+            limits = settings.RATE_LIMITS.get(upstream) or {}
+            limiter = TokenBucket(
+                upstream,
+                requests_per_minute=limits.get('requests_per_minute', 0),
+                tokens_per_minute=limits.get('tokens_per_minute', 0),
+                burst_seconds=settings.RATE_LIMIT_BURST_SECONDS,
+                store=_store(upstream),
+            )
+            _buckets[upstream] = limiter if limiter.buckets else None
+        return _buckets[upstream]
+
+
+def acquire(endpoint, tokens=0):
+    limiter = bucket(endpoint)
+    if limiter is None:
+        return 0.0
+    return limiter.acquire(tokens, max_wait=settings.RATE_LIMIT_MAX_WAIT or None)
+
+
+async def aacquire(endpoint, tokens=0):
+    limiter = bucket(endpoint)
+    if limiter is None:
+        return 0.0
+    return await limiter.aacquire(tokens, max_wait=settings.RATE_LIMIT_MAX_WAIT or None)
+
+
+def settle(endpoint, estimated, actual):
+    limiter = bucket(endpoint)
+    if limiter is not None:
+        limiter.settle(estimated, actual)
+
+
+def pause(endpoint, seconds):
+    limiter = bucket(endpoint)
+    if limiter is not None and seconds > 0:
+        logger.warning("%s throttled upstream, pausing all callers for %.1fs", limiter.upstream, seconds)
+        limiter.pause(seconds)
+
+
+async def apause(endpoint, seconds):
+    """``pause`` for async callers; the store is updated in a thread."""
+    await asyncio.to_thread(pause, endpoint, seconds)
+
+
+def snapshot():
+    """Current bucket levels per configured upstream."""
+    return {upstream: limiter.snapshot()
+            for upstream, limiter in ((u, bucket(u)) for u in settings.RATE_LIMITS) if limiter is not None}
@@ -0,0 +1,104 @@
+"""
+Persistent cache of LLM parse results.
+
+Entries are keyed by a SHA-256 of the whitespace-normalised resume text and
+the prompt version, so the same CV uploaded under another file_id or site is
+parsed only once. Least recently used entries are evicted past
+PARSE_CACHE_MAX_ENTRIES and entries older than PARSE_CACHE_TTL_DAYS expire.
+"""
+import hashlib
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from core import metrics
+from core.models import ParseCacheEntry
+
+EVICT_EVERY = 50  # stores between eviction passes
+
+_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+EVENTS = metrics.counter('resume_parse_cache_events_total', "Parse cache hits, misses, stores and evictions.",
+                         ('event',))
+
+
+def _bump(name, n=1):
+    EVENTS.inc(n, event=name)
+    with _lock:
+        _counters[name] += n
+        return _counters[name]
+
+
+def cache_key(resume_text: str, prompt_version: str) -> str:
+    normalized = " ".join(resume_text.split())
+    return hashlib.sha256(f"{prompt_version}\0{normalized}".encode('utf-8')).hexdigest()
+
+
+def _expiry_cutoff():
+    if settings.PARSE_CACHE_TTL_DAYS <= 0:
+        return None
+    return timezone.now() - timedelta(days=settings.PARSE_CACHE_TTL_DAYS)
+
+
+def lookup(resume_text: str, prompt_version: str):
+    """Return the cached parse for this text, or None on a miss."""
+    if not settings.PARSE_CACHE_ENABLED:
+        return None
+    qs = ParseCacheEntry.objects.filter(key=cache_key(resume_text, prompt_version))
+    cutoff = _expiry_cutoff()
+    if cutoff is not None:
+        qs = qs.filter(created_at__gte=cutoff)
+    entry = qs.only('id', 'parsed_data').first()
+    if entry is None:
+        _bump("misses")
+        return None
+    ParseCacheEntry.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    _bump("hits")
+    return entry.parsed_data
+
+
+def store(resume_text: str, prompt_version: str, parsed: dict):
+    if not settings.PARSE_CACHE_ENABLED:
+        return
+    ParseCacheEntry.objects.update_or_create(
+        key=cache_key(resume_text, prompt_version),
+        defaults={'prompt_version': prompt_version, 'parsed_data': parsed},
+    )
+    if _bump("stores") % EVICT_EVERY == 1:
+        evict()
+
+
+def evict() -> int:
+    """Drop expired entries and trim the cache to PARSE_CACHE_MAX_ENTRIES."""
+    removed = 0
+    cutoff = _expiry_cutoff()
+    if cutoff is not None:
+        removed += ParseCacheEntry.objects.filter(created_at__lt=cutoff).delete()[0]
+
+    overflow = ParseCacheEntry.objects.count() - settings.PARSE_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        stale = list(
+            ParseCacheEntry.objects.order_by('last_used_at').values_list('pk', flat=True)[:overflow]
+        )
+        removed += ParseCacheEntry.objects.filter(pk__in=stale).delete()[0]
+    if removed:
+        _bump("evictions", removed)
+    return removed
+
+
+def stats() -> dict:
+    with _lock:
+        counters = dict(_counters)
+    lookups = counters["hits"] + counters["misses"]
+    totals = ParseCacheEntry.objects.aggregate(total_hits=Sum('hits'))
+    return {
+        "enabled": settings.PARSE_CACHE_ENABLED,
+        "entries": ParseCacheEntry.objects.count(),
+        "max_entries": settings.PARSE_CACHE_MAX_ENTRIES,
+        "lifetime_hits": totals["total_hits"] or 0,
+        "hit_ratio": round(counters["hits"] / lookups, 4) if lookups else None,
+        **counters,
+    }
@@ -0,0 +1,196 @@
+"""
+Text extraction for resumes, one backend per file type.
+
+PDFs go through PyMuPDF and DOCX through python-docx (body paragraphs and
+tables in document order, plus headers and footers, where many CVs keep
+contact details and skill grids). Page and character caps bound the work
+spent on very large scans. Text is collected in lists and joined once.
+
+Content can be bytes, a path or a binary file. Files of MMAP_MIN_BYTES or
+more are memory-mapped for PyMuPDF rather than read into the heap, so a 50 MB
+scan costs the pages MuPDF touches instead of a second 50 MB copy.
+
+The module has no Django dependency, so ``extract_many`` can fan batches
+out to a spawned process pool.
+"""
+import mmap
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+
+import fitz  # PyMuPDF
+from docx import Document  # python-docx for .docx
+from docx.table import Table
+
+MMAP_MIN_BYTES = 1024 * 1024
+
+
+class UnsupportedFileType(ValueError):
+    pass
+
+
+class _Collector:
+    """Accumulates text parts until max_chars is reached."""
+
+    def __init__(self, max_chars):
+        self.parts = []
+        self.remaining = max_chars
+
+    @property
+    def full(self):
+        return self.remaining is not None and self.remaining <= 0
+
+    def add(self, text):
+        if not text or self.full:
+            return
+        if self.remaining is not None:
+            text = text[:self.remaining]
+            self.remaining -= len(text)
+        self.parts.append(text)
+
+    def text(self, sep=""):
+        return sep.join(self.parts)
+
+
+def _is_path(content):
+    return isinstance(content, (str, os.PathLike))
+
+
+@contextmanager
+def _buffer(content):
+    """The bytes of ``content``: as given, read from a small file, or a memory map of a large one."""
+    if isinstance(content, (bytes, memoryview)):
+        yield content
+        return
+    content.seek(0, os.SEEK_END)
+    size = content.tell()
+    content.seek(0)
+    try:
+        fileno = content.fileno() if size >= MMAP_MIN_BYTES else None
+    except (AttributeError, OSError):
+        fileno = None  # In-memory stream (BytesIO, an uploaded file): nothing to map
+    if fileno is None:
+        yield content.read()
+        return
+    with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            view.release()
+
+
+@contextmanager
+def _open_pdf(content):
+    if _is_path(content):
+        # MuPDF reads the file itself, as it needs it.
+        with fitz.open(content, filetype="pdf") as doc:
+            yield doc
+        return
+    with _buffer(content) as data, fitz.open(stream=data, filetype="pdf") as doc:
+        yield doc
+
+
+def extract_pdf(data, max_pages=None, max_chars=None) -> str:
+    out = _Collector(max_chars)
+    with _open_pdf(data) as doc:
+        pages = doc.page_count if max_pages is None else min(doc.page_count, max_pages)
+        for number in range(pages):
+            out.add(doc.load_page(number).get_text())
+            if out.full:
+                break
+    # Pages are separated by form feeds so preprocess can find repeated headers and footers.
+    return out.text("\f")
+
+
+def _table_rows(table):
+    for row in table.rows:
+        cells = []
+        for cell in row.cells:
+            text = cell.text.strip()
+            # Merged cells are repeated across the row; keep one copy.
+            if text and (not cells or cells[-1] != text):
+                cells.append(text)
+        if cells:
+            yield " | ".join(cells)
+
+
+def _block_text(container, out):
+    """Paragraphs and tables of a document body, header or footer, in order."""
+    for block in container.iter_inner_content():
+        if isinstance(block, Table):
+            for line in _table_rows(block):
+                out.add(line + "\n")
+        else:
+            out.add(block.text + "\n")
+        if out.full:
+            return
+
+
+def extract_docx(data, max_pages=None, max_chars=None) -> str:
+    # python-docx takes a path or a seekable file and reads the zip members it needs.
+    doc = Document(BytesIO(data) if isinstance(data, (bytes, memoryview)) else data)
+    out = _Collector(max_chars)
+    seen = set()
+
+    def add_part(part):
+        if part.is_linked_to_previous:
+            return
+        text = _Collector(None)
+        _block_text(part, text)
+        value = text.text().strip()
+        if value and value not in seen:
+            seen.add(value)
+            out.add(value + "\n")
+
+    for section in doc.sections:
+        add_part(section.header)
+    _block_text(doc, out)
+    for section in doc.sections:
+        add_part(section.footer)
+    return out.text()
+
+
+BACKENDS = {
+    'pdf': extract_pdf,
+    'docx': extract_docx,
+    'doc': extract_docx,
+}
+
+
+def extract_text(content, ext: str, max_pages=None, max_chars=None) -> str:
+    """Extract text from bytes, a path or a binary file with the backend registered for ``ext``."""
+    backend = BACKENDS.get(ext)
+    if backend is None:
+        raise UnsupportedFileType(f"Unsupported file type: .{ext}")
+    return backend(content, max_pages=max_pages, max_chars=max_chars)
+
+
+def _extract_safely(key, content, ext, max_pages, max_chars):
+    try:
+        return key, extract_text(content, ext, max_pages, max_chars)
+    except Exception as e:
+        return key, e
+
+
+def process_pool(processes):
+    # Spawned (not forked) workers: callers such as the ingestion pipeline
+    # are multi-threaded, and forking a threaded process is unsafe.
+    return ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'))
+
+
+def extract_many(items, processes=None, max_pages=None, max_chars=None):
+    """
+    Extract a batch of ``(key, content, ext)`` items across a process pool.
+
+    Returns ``{key: text}``; failures are returned as the exception instance
+    instead of text so one bad file does not abort the batch.
+    """
+    items = list(items)
+    if processes == 1 or len(items) < 2:
+        return dict(_extract_safely(k, c, e, max_pages, max_chars) for k, c, e in items)
+    with process_pool(processes) as pool:
+        futures = [pool.submit(_extract_safely, k, c, e, max_pages, max_chars) for k, c, e in items]
+        return dict(f.result() for f in futures)
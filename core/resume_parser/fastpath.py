@@ -0,0 +1,221 @@
+"""
+Deterministic extraction of contact details and skills, without the LLM.
+
+Emails and phone numbers are found with regexes, the name with a heuristic
+over the first lines, and skills with an Aho-Corasick automaton built from
+a dictionary file (see SKILLS_DICTIONARY), so matching costs one pass over
+the text however many skills are known. The results back up the LLM output
+(``cross_check``) and, in cheap mode, replace it altogether.
+
+Dictionary format: one skill per line, optionally followed by aliases, all
+separated by "|"; blank lines and lines starting with "#" are ignored::
+
+    Kubernetes | k8s
+"""
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+PHONE_RE = re.compile(r"(?<![\w+])\+?\(?\d[\d ().-]{6,18}\d(?!\w)")
+_YEAR_RANGE = re.compile(r"^(19|20)\d\d\s*[-–]\s*(19|20)\d\d$")
+_NAME_SPLIT = re.compile(r"\s*[|•,;]\s*")
+_NAME_TOKEN = re.compile(r"^[A-Za-zÀ-ÿ][A-Za-zÀ-ÿ'.-]*$")
+NOT_NAMES = {'resume', 'curriculum vitae', 'cv', 'profile', 'contact', 'summary'}
+
+
+class SkillMatcher:
+    """Aho-Corasick automaton over lower-cased skill aliases."""
+
+    def __init__(self, aliases):
+        # aliases: {alias: canonical name}
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for alias, canonical in aliases.items():
+            alias = alias.lower()
+            node = 0
+            for ch in alias:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append((len(alias), canonical))
+        self.size = len(set(aliases.values()))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                state = self.fail[node]
+                while state and ch not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[nxt] = self.goto[state].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find(self, text: str) -> list:
+        """Canonical names of the skills in ``text``, in order of first appearance."""
+        text = text.lower()
+        goto, fail, out = self.goto, self.fail, self.out
+        end = len(text)
+        found = {}
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, canonical in out[node]:
+                start = i - length + 1
+                # Whole words only: "java" must not match inside "javascript".
+                if (start == 0 or not text[start - 1].isalnum()) and (i + 1 == end or not text[i + 1].isalnum()):
+                    found.setdefault(canonical, start)
+        return sorted(found, key=found.get)
+
+
+def read_dictionary(path) -> dict:
+    aliases = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            names = [n.strip() for n in line.split('|') if n.strip()]
+            for name in names:
+                aliases[name.lower()] = names[0]
+    return aliases
+
+
+@lru_cache(maxsize=4)
+def load_matcher(path) -> SkillMatcher:
+    return SkillMatcher(read_dictionary(path))
+
+
+def find_emails(text: str) -> list:
+    return list(dict.fromkeys(m.rstrip('.') for m in EMAIL_RE.findall(text)))
+
+
+def phone_digits(phone: str) -> str:
+    return re.sub(r"\D", "", phone or "")
+
+
+def email_key(email) -> str:
+    """Lower-cased address without "+tag" (and without dots, for Gmail), for duplicate matching."""
+    email = (email or "").strip().lower()
+    if "@" not in email:
+        return ""
+    local, domain = email.rsplit("@", 1)
+    local = local.split("+", 1)[0]
+    if domain in ("gmail.com", "googlemail.com"):
+        local, domain = local.replace(".", ""), "gmail.com"
+    return f"{local}@{domain}" if local else ""
+
+
+def phone_key(phone) -> str:
+    """Last 9 digits (the national number without country code or trunk prefix), or "" if too short."""
+    digits = phone_digits(phone)
+    return digits[-9:] if len(digits) >= 8 else ""
+
+
+def find_phones(text: str) -> list:
+    phones = []
+    for match in PHONE_RE.finditer(text):
+        phone = match.group().strip(" .-")
+        digits = phone_digits(phone)
+        if not 8 <= len(digits) <= 15 or _YEAR_RANGE.match(phone):
+            continue
+        if phone not in phones:
+            phones.append(phone)
+    return phones
+
+
+def guess_name(text: str, max_lines: int = 6):
+    """The first short, all-alphabetic line (or "|"-separated part) near the top."""
+    lines = [line.strip() for line in text.split("\n") if line.strip()][:max_lines]
+    for line in lines:
+        for part in _NAME_SPLIT.split(line):
+            tokens = part.split()
+            if (2 <= len(tokens) <= 4 and part.lower() not in NOT_NAMES
+                    and all(_NAME_TOKEN.match(t) for t in tokens)):
+                return " ".join(t if not t.isupper() else t.title() for t in tokens)
+    return None
+
+
+@dataclass
+class FastFields:
+    name: str = None
+    emails: list = field(default_factory=list)
+    phones: list = field(default_factory=list)
+    skills: list = field(default_factory=list)
+
+    @property
+    def email(self):
+        return self.emails[0] if self.emails else None
+
+    @property
+    def phone(self):
+        return self.phones[0] if self.phones else None
+
+    def as_parsed(self) -> dict:
+        """The fields in the shape of an LLM parse, for cheap mode."""
+        return {
+            'name': self.name or '',
+            'email': self.email or '',
+            'phone': self.phone or '',
+            'skills': list(self.skills),
+            'parse_mode': 'cheap',
+        }
+
+
+def extract(text: str, matcher: SkillMatcher) -> FastFields:
+    return FastFields(
+        name=guess_name(text),
+        emails=find_emails(text),
+        phones=find_phones(text),
+        skills=matcher.find(text),
+    )
+
+
+def cross_check(parsed: dict, fast: FastFields):
+    """
+    Check an LLM parse against the deterministic fields.
+
+    Emails and phone numbers the LLM returned that do not occur in the text
+    are replaced by the ones that do, missing name/contact fields are filled
+    in, and dictionary skills the LLM left out are appended. Returns the
+    merged dict and a list of the corrections made.
+    """
+    merged = dict(parsed)
+    issues = []
+
+    def check(key, found, same):
+        value = parsed.get(key)
+        if not found:
+            return
+        if not value:
+            issues.append(f"{key} filled from text")
+        elif not any(same(value, f) for f in found):
+            issues.append(f"{key} {value!r} not in text")
+        else:
+            return
+        merged[key] = found[0]
+
+    check('email', fast.emails, lambda a, b: a.strip().lower() == b.lower())
+    # Compare national numbers, ignoring formatting and a country code prefix.
+    check('phone', fast.phones, lambda a, b: phone_digits(a)[-9:] == phone_digits(b)[-9:] and len(phone_digits(a)) >= 7)
+    if not parsed.get('name') and fast.name:
+        merged['name'] = fast.name
+        issues.append("name filled from text")
+
+    llm_skills = [s for s in parsed.get('skills') or [] if isinstance(s, str)]
+    known = {s.lower() for s in llm_skills}
+    missed = [s for s in fast.skills if s.lower() not in known]
+    if missed:
+        merged['skills'] = llm_skills + missed
+        issues.append(f"{len(missed)} dictionary skill(s) added")
+    return merged, issues
@@ -0,0 +1,121 @@
+"""
+Near-duplicate fingerprints of resume text.
+
+A MinHash signature over word 5-gram shingles estimates the Jaccard
+similarity of two texts (the fraction of equal signature slots), and is cut
+into LSH bands so likely duplicates can be looked up by equal band keys
+instead of comparing against every stored resume (see core.dedupe). A 64-bit
+SimHash over word counts is kept alongside as a cheap second opinion: near-
+identical texts differ in only a few bits.
+
+Texts too short to compare (MIN_SHINGLES) get no fingerprint at all.
+
+Like ``preprocess`` this has no Django dependency.
+"""
+import hashlib
+import re
+import zlib
+from dataclasses import dataclass
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS  # a pair with Jaccard s shares a band with probability 1 - (1 - s**8)**16
+SHINGLE = 5
+# Fewer distinct shingles than this (a scan without a text layer, a one-line
+# file) is too little text to call two resumes the same: an empty text would
+# get the same signature as every other empty text.
+MIN_SHINGLES = 20
+
+_WORD = re.compile(r"\w+")
+_MASK = np.uint64(0xFFFFFFFFFFFFFFFF)
+# Fixed seeds, so signatures stay comparable across processes and releases.
+_SEEDS = np.random.default_rng(20240617).integers(1, 2**63, size=NUM_PERM, dtype=np.uint64)
+_BITS = np.arange(64, dtype=np.uint64)
+
+
+def _mix(x):
+    """splitmix64 finalizer, vectorized (uint64 arithmetic wraps)."""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _hash64(token):
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def tokens(text: str) -> list:
+    return _WORD.findall(text.lower())
+
+
+def shingles(words, size=SHINGLE) -> set:
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(words) -> np.ndarray:
+    """NUM_PERM uint32 minimums of the seeded hashes of the shingles."""
+    found = shingles(words)
+    if not found:
+        return np.full(NUM_PERM, 0xFFFFFFFF, dtype=np.uint32)
+    base = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in found), dtype=np.uint64, count=len(found))
+    with np.errstate(over='ignore'):
+        hashed = _mix(base[None, :] ^ _SEEDS[:, None])
+    return (hashed.min(axis=1) >> np.uint64(32)).astype(np.uint32)
+
+
+def simhash(words) -> int:
+    """64-bit SimHash of the word counts, as a signed int (fits a BigIntegerField)."""
+    if not words:
+        return 0
+    unique, counts = np.unique(np.array(words), return_counts=True)
+    hashes = np.array([_hash64(w) for w in unique], dtype=np.uint64)
+    bits = ((hashes[:, None] >> _BITS) & np.uint64(1)).astype(np.int64)
+    weights = (counts[:, None] * (2 * bits - 1)).sum(axis=0)
+    value = sum(1 << i for i in range(64) if weights[i] > 0)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & 0xFFFFFFFFFFFFFFFF).bit_count()
+
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    """Jaccard similarity estimated from two MinHash signatures."""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def band_keys(signature: np.ndarray) -> list:
+    """One signed 64-bit key per LSH band (the band number is part of the key)."""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS].tobytes()
+        digest = hashlib.blake2b(bytes([band]) + rows, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+@dataclass
+class Fingerprint:
+    text_hash: str
+    minhash: np.ndarray
+    simhash: int
+
+    @property
+    def bands(self):
+        return band_keys(self.minhash)
+
+
+def fingerprint(text: str, min_shingles: int = MIN_SHINGLES):
+    """The Fingerprint of ``text``, or None when it has fewer than ``min_shingles`` shingles."""
+    words = tokens(text)
+    if len(shingles(words)) < min_shingles:
+        return None
+    return Fingerprint(
+        text_hash=hashlib.sha256(" ".join(words).encode('utf-8')).hexdigest(),
+        minhash=minhash(words),
+        simhash=simhash(words),
+    )
@@ -0,0 +1,114 @@
+"""
+Tolerant decoding of JSON written by an LLM.
+
+Structured output is usually valid JSON, but not always: it can come wrapped
+in a Markdown fence or a sentence of prose, carry trailing commas, or stop
+mid-value when the response hits its token limit. ``decode`` finds the first
+top-level object (or array), skips whatever surrounds it and drops trailing
+commas. A value cut off by truncation is closed after its last *complete*
+top-level member, so a half-written field or array item is left out rather
+than returned incomplete, and callers can ask again for just that part.
+
+The module has no Django dependency.
+"""
+import json
+from typing import NamedTuple
+
+OPENERS = {'{': '}', '[': ']'}
+MAX_STARTS = 5  # opening brackets tried before giving up on wrapper text
+
+
+class Decoded(NamedTuple):
+    value: object
+    repaired: bool   # the text was not valid JSON as it stood
+    truncated: bool  # the top-level value was never closed; its last member was dropped
+
+
+def _strip_trailing_comma(out):
+    end = len(out)
+    while end and out[end - 1].isspace():
+        end -= 1
+    if end and out[end - 1] == ',':
+        del out[end - 1:]
+
+
+def _repair(text, start):
+    """
+    Rewrite the value starting at ``text[start]``.
+
+    Returns (json text, truncated); the json text is None when the value was
+    truncated before any top-level member was complete.
+    """
+    out = []
+    stack = []
+    in_string = escaped = False
+    safe = None  # length of ``out`` just before the last top-level comma
+    for ch in text[start:]:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in OPENERS:
+            stack.append(OPENERS[ch])
+        elif ch in '}]':
+            _strip_trailing_comma(out)
+            if not stack or stack[-1] != ch:
+                break  # mismatched bracket: treat what came before as truncated
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                return ''.join(out), False
+            continue
+        elif ch == ',' and len(stack) == 1:
+            safe = len(out)
+        out.append(ch)
+    if not stack:
+        return None, True
+    if safe is None:
+        # Nothing complete: an empty container is all that can be recovered.
+        return text[start] + stack[0], True
+    kept = out[:safe]
+    _strip_trailing_comma(kept)
+    return ''.join(kept) + stack[0], True
+
+
+def decode(text: str, expected=dict) -> Decoded:
+    """
+    Decode the first JSON ``expected`` (dict or list) in ``text``.
+
+    Raises ValueError when no such value can be recovered.
+    """
+    stripped = text.strip()
+    try:
+        value = json.loads(stripped)
+    except ValueError:
+        pass
+    else:
+        if isinstance(value, expected):
+            return Decoded(value, repaired=False, truncated=False)
+
+    opener = '{' if expected is dict else '['
+    start = stripped.find(opener)
+    error = None
+    for _ in range(MAX_STARTS):
+        if start < 0:
+            break
+        candidate, truncated = _repair(stripped, start)
+        if candidate is not None:
+            try:
+                value = json.loads(candidate)
+            except ValueError as e:
+                error = e
+            else:
+                if isinstance(value, expected):
+                    return Decoded(value, repaired=True, truncated=truncated)
+        start = stripped.find(opener, start + 1)
+    raise ValueError(f"No JSON {expected.__name__} could be recovered from the response"
+                     + (f" ({error})" if error else ""))
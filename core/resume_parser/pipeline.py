@@ -0,0 +1,235 @@
+import logging
+
+from django.conf import settings
+from django.utils.crypto import get_random_string
+
+from core import dedupe, embeddings, metrics, scoring, search_index
+from core.graph_utils import get_drive_item, stream_drive_item
+from core.models import Candidate
+from core.resume_parser import cache as parse_cache
+from core.resume_parser import extraction, fastpath, fingerprint, preprocess, structured
+from core.resume_parser.extraction import UnsupportedFileType  # noqa: F401 (re-exported)
+from core.sync import mark_parsed
+from core.taxonomy import sync_candidate_terms
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the schema or prompt in structured.py or the post-processing
+# in query_resume_llm() changes, so cached parses from the old prompt are no
+# longer served.
+PROMPT_VERSION = "4"
+
+
+def file_extension(filename: str) -> str:
+    return filename.rsplit('.', 1)[-1].lower()
+
+
+def extract_resume_text(content, ext: str) -> str:
+    """Extract text with the backend for ``ext``, within the configured caps."""
+    return extraction.extract_text(
+        content, ext,
+        max_pages=settings.EXTRACT_MAX_PAGES, max_chars=settings.EXTRACT_MAX_CHARS,
+    )
+
+
+def prepare_resume_text(resume_text: str) -> preprocess.PreparedText:
+    """Clean extracted text and fit it to PROMPT_TOKEN_BUDGET (see preprocess.prepare)."""
+    return preprocess.prepare(resume_text, settings.PROMPT_TOKEN_BUDGET)
+
+
+def log_savings(file_id: str, prepared: preprocess.PreparedText):
+    logger.info(
+        "Prompt text for %s: %d -> %d chars, %d tokens saved (~%d sent)%s",
+        file_id, prepared.chars_in, prepared.chars_out, prepared.tokens_saved, prepared.tokens_out,
+        ", truncated to budget" if prepared.truncated else "",
+    )
+
+
+def fast_fields(resume_text: str) -> fastpath.FastFields:
+    """Contact details and dictionary skills found without the LLM."""
+    return fastpath.extract(resume_text, fastpath.load_matcher(settings.SKILLS_DICTIONARY))
+
+
+def cheap_parse(resume_text: str) -> dict:
+    """Cheap mode: the deterministic fields only, no Gemini call."""
+    return fast_fields(resume_text).as_parsed()
+
+
+def _check_llm_parse(parsed: dict, resume_text: str) -> dict:
+    # Normalize skills
+    parsed['skills'] = list(dict.fromkeys(parsed.get('skills', [])))  # Remove duplicates
+    parsed, corrections = fastpath.cross_check(parsed, fast_fields(resume_text))
+    if corrections:
+        logger.info("Cross-check corrected the LLM parse: %s", "; ".join(corrections))
+    return parsed
+
+
+def _missing(parsed: dict) -> list:
+    return [f for f in structured.FIELDS if f not in parsed]
+
+
+def query_resume_llm(resume_text: str):
+    """
+    Parse the resume text with one structured Gemini call (see structured.parse),
+    cross-checked against the deterministic fields. Returns (parsed, fields
+    the LLM left out); the cross-check can fill some of those in, so only the
+    second value tells whether the parse may be cached (see cache_parse).
+    """
+    parsed = structured.parse(resume_text)
+    return _check_llm_parse(parsed, resume_text), _missing(parsed)
+
+
+def query_resume_llm_batch(resume_texts: dict):
+    """
+    Parse several short resumes ({key: text}) with one Gemini call (see
+    structured.parse_batch). Returns ({key: (parsed, missing fields) or exception},
+    [keys retried alone]).
+    """
+    results, retried = structured.parse_batch(resume_texts)
+    for key, parsed in results.items():
+        if not isinstance(parsed, Exception):
+            results[key] = _check_llm_parse(parsed, resume_texts[key]), _missing(parsed)
+    return results, retried
+
+
+def reuse_duplicate_parse(resume_text: str, fp: fingerprint.Fingerprint, file_id: str = None):
+    """
+    The parse of an earlier near-identical resume (see dedupe.find_near_duplicate),
+    cross-checked against this text's contact details, and that candidate's id;
+    (None, None) when there is none. The candidate of ``file_id`` itself is never
+    reused: a changed file must be parsed again. The parse is returned as is;
+    the saved copy is linked to the original through its fingerprint
+    (dedupe.register sets ``canonical``). Without a fingerprint (too little
+    text) nothing is reused.
+    """
+    if fp is None:
+        return None, None
+    own = Candidate.objects.filter(file_id=file_id).values_list('pk', flat=True).first() if file_id else None
+    original = dedupe.find_near_duplicate(fp, exclude=own)
+    if original is None:
+        return None, None
+    parsed, corrections = fastpath.cross_check(original.parsed_data, fast_fields(resume_text))
+    parsed.pop('duplicate_of', None)  # left in parsed_data by earlier versions
+    logger.info("Reusing the parse of near-duplicate candidate %s%s", original.pk,
+                f" ({'; '.join(corrections)})" if corrections else "")
+    return parsed, original.pk
+
+
+def cache_parse(resume_text: str, parsed: dict, missing):
+    """Keep an LLM parse in the parse cache, unless the LLM left ``missing`` fields out of it."""
+    if not missing:
+        parse_cache.store(resume_text, PROMPT_VERSION, parsed)
+    else:
+        logger.info("Not caching a partial parse (missing: %s)", ", ".join(missing))
+
+
+def parse_resume_text(resume_text: str, fp: fingerprint.Fingerprint = None, file_id: str = None) -> dict:
+    """
+    Return the parsed resume, from the parse cache when the same text was seen
+    before or, given its fingerprint, from a near-identical resume.
+    """
+    parsed = parse_cache.lookup(resume_text, PROMPT_VERSION)
+    if parsed is None and fp is not None:
+        parsed, _ = reuse_duplicate_parse(resume_text, fp, file_id)
+    if parsed is None:
+        parsed, missing = query_resume_llm(resume_text)
+        cache_parse(resume_text, parsed, missing)
+    return parsed
+
+
+def candidate_defaults(parsed: dict, resume_url: str) -> dict:
+    return {
+        'name': parsed.get('name', ''),
+        'email': parsed.get('email', ''),
+        'phone': parsed.get('phone', ''),
+        'email_key': fastpath.email_key(parsed.get('email')),
+        'phone_key': fastpath.phone_key(parsed.get('phone')),
+        'profile_summary': parsed.get('profile_summary', ''),
+        'parsed_data': parsed,
+        'resume_url': resume_url,
+        'skills': parsed.get('skills', []),
+        'domain_classification': parsed.get('domain_classification', []),
+        'total_years_of_experience': parsed.get('total_years_of_experience', 0)
+    }
+
+
+def save_candidate(file_id: str, resume_url: str, parsed: dict, etag: str = None, mark: bool = True,
+                   fp: fingerprint.Fingerprint = None) -> Candidate:
+    """
+    Create or update the candidate record for a parsed file.
+
+    With ``mark=False`` (cheap-mode results) the file stays pending, so a
+    later full run still parses it with the LLM. ``fp``, the fingerprint of
+    the resume text, is stored for duplicate detection.
+    """
+    defaults = candidate_defaults(parsed, resume_url)
+    candidate, created = Candidate.objects.get_or_create(
+        file_id=file_id,
+        defaults={'resume_id': get_random_string(12), **defaults}
+    )
+    if not created:
+        for field, val in defaults.items():
+            setattr(candidate, field, val)
+        candidate.save()
+    sync_candidate_terms(candidate)
+    search_index.index_candidate(candidate)
+    scoring.score_candidate(candidate)
+    try:
+        embeddings.embed_candidate(candidate)
+    except Exception:
+        # The vector index is derived data (see rebuild_embeddings); never fail a parse on it.
+        logger.exception("Could not embed candidate %s", candidate.pk)
+    try:
+        dedupe.register(candidate, fp)
+    except Exception:
+        logger.exception("Could not link duplicates of candidate %s", candidate.pk)
+    if mark:
+        mark_parsed(file_id, etag)
+    return candidate
+
+
+def process_file(access_token, site_id, drive_id, file_id, on_stage=None, cheap=False) -> Candidate:
+    """
+    Parse one drive item end to end: metadata, download, extract, LLM, save.
+    With ``cheap`` the LLM stage is replaced by the deterministic fast path.
+    """
+    def stage(name):
+        if on_stage:
+            on_stage(name)
+
+    stage('metadata')
+    meta = get_drive_item(access_token, site_id, drive_id, file_id)
+    stage('download')
+    with stream_drive_item(access_token, site_id, drive_id, file_id) as content:
+        stage('extract')
+        with metrics.span('extract'):
+            prepared = prepare_resume_text(extract_resume_text(content, file_extension(meta.get('name', ''))))
+            fp = fingerprint.fingerprint(prepared.text, settings.DEDUPE_MIN_SHINGLES)
+    log_savings(file_id, prepared)
+    if cheap:
+        parsed = cheap_parse(prepared.text)
+    else:
+        stage('llm')
+        with metrics.span('parse'):
+            parsed = parse_resume_text(prepared.text, fp, file_id)
+    stage('save')
+    with metrics.span('save'):
+        return save_candidate(file_id, meta.get('webUrl', ''), parsed, meta.get('eTag'), mark=not cheap, fp=fp)
+
+
+def candidate_payload(candidate: Candidate) -> dict:
+    return {
+        "id": candidate.id,
+        "resume_id": candidate.resume_id,
+        "file_id": candidate.file_id,
+        "name": candidate.name,
+        "email": candidate.email,
+        "phone": candidate.phone,
+        "profile_summary": candidate.profile_summary,
+        "skills": candidate.skills,
+        "domain_classification": candidate.domain_classification,
+        "total_years_of_experience": candidate.total_years_of_experience,
+        "parsed_data": candidate.parsed_data,
+        "resume_url": candidate.resume_url,
+        "canonical_id": candidate.canonical_id,
+    }
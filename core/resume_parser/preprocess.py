@@ -0,0 +1,197 @@
+"""
+Clean-up of extracted resume text before it goes into the LLM prompt.
+
+``prepare`` normalizes whitespace, strips control and private-use glyphs
+(icon fonts, bullets rendered as boxes), drops page numbers and per-page
+headers/footers repeated across a PDF (the first copy is kept, since it
+often carries the contact details), and finally trims the text section by
+section to a token budget. Like ``extraction`` it has no Django dependency,
+so ``extract_and_prepare`` can run in the extraction process pool.
+
+Token counts are estimated at CHARS_PER_TOKEN characters per token, which is
+close enough for English resumes to size a budget without a tokenizer call.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+
+from core.resume_parser import extraction
+
+CHARS_PER_TOKEN = 4
+PAGE_BREAK = "\f"
+TRUNCATED = "[…]"
+
+_SPACES = re.compile(r"[ \t]+")  # other space characters are folded into " " by NFKC
+_BLANK_LINES = re.compile(r"\n{3,}")
+_PAGE_NUMBER = re.compile(r"^[-–—\s]*(page\s*)?\d{1,3}(\s*(of|/)\s*\d{1,3})?[-–—\s]*$", re.IGNORECASE)
+_RULE = re.compile(r"^[\W_]+$")  # lines of only punctuation, e.g. "______" or "• • •"
+
+# Headings that start a resume section, mapped to a priority (lower is kept first).
+SECTIONS = {
+    'skills': 1, 'technical skills': 1, 'core competencies': 1, 'key skills': 1,
+    'experience': 1, 'work experience': 1, 'professional experience': 1,
+    'employment history': 1, 'work history': 1, 'employment': 1,
+    'summary': 2, 'profile': 2, 'professional summary': 2, 'profile summary': 2,
+    'objective': 2, 'career objective': 2, 'about me': 2,
+    'education': 2, 'academic background': 2, 'qualifications': 2,
+    'projects': 3, 'key projects': 3, 'certifications': 3, 'certificates': 3,
+    'achievements': 3, 'awards': 3, 'publications': 3, 'languages': 3,
+    'training': 3, 'courses': 3, 'volunteering': 3,
+    'interests': 4, 'hobbies': 4, 'personal details': 4, 'personal information': 4,
+    'references': 4, 'declaration': 4, 'extracurricular activities': 4,
+}
+_HEADING = re.compile(
+    r"^(?:%s)\s*:?$" % "|".join(sorted((re.escape(s) for s in SECTIONS), key=len, reverse=True)),
+    re.IGNORECASE,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+@dataclass
+class PreparedText:
+    text: str
+    chars_in: int
+    tokens_in: int
+    truncated: bool = False
+
+    @property
+    def chars_out(self):
+        return len(self.text)
+
+    @property
+    def tokens_out(self):
+        return estimate_tokens(self.text)
+
+    @property
+    def chars_saved(self):
+        return self.chars_in - self.chars_out
+
+    @property
+    def tokens_saved(self):
+        return self.tokens_in - self.tokens_out
+
+
+def _is_junk(ch):
+    category = unicodedata.category(ch)
+    # Control, format, private-use, surrogate and unassigned code points.
+    return category[0] == 'C' and ch not in "\n\t"
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize('NFKC', text.replace("\r\n", "\n").replace("\r", "\n"))
+    text = "".join(ch for ch in text if not _is_junk(ch))
+    lines = []
+    for line in text.split("\n"):
+        line = _SPACES.sub(" ", line).strip()
+        if line and (_PAGE_NUMBER.match(line) or _RULE.match(line)):
+            continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _edge_lines(page, depth):
+    lines = [line for line in page.split("\n") if line]
+    return set(lines[:depth] + lines[-depth:])
+
+
+def strip_repeated_lines(pages, depth=3):
+    """Drop header/footer lines that recur on at least half of the pages, keeping the first copy."""
+    if len(pages) < 2:
+        return pages
+    # Page numbers are already gone (normalize), so exact matches are enough.
+    counts = Counter(line for page in pages for line in _edge_lines(page, depth))
+    threshold = max(2, math.ceil(len(pages) / 2))
+    repeated = {key for key, n in counts.items() if n >= threshold}
+    if not repeated:
+        return pages
+    seen = set()
+    cleaned = []
+    for page in pages:
+        edges = _edge_lines(page, depth)
+        kept = []
+        for line in page.split("\n"):
+            if line in edges and line in repeated:
+                if line in seen:
+                    continue
+                seen.add(line)
+            kept.append(line)
+        cleaned.append("\n".join(kept))
+    return cleaned
+
+
+def split_sections(text: str):
+    """Split into [(heading or None, body), ...] at recognised section headings."""
+    sections = [(None, [])]
+    for line in text.split("\n"):
+        if _HEADING.match(line):
+            sections.append((line, []))
+        else:
+            sections[-1][1].append(line)
+    return [(heading, "\n".join(body).strip()) for heading, body in sections if heading or any(body)]
+
+
+def _priority(heading):
+    if heading is None:
+        return 0  # the preamble: name and contact details
+    return SECTIONS.get(heading.rstrip(': ').lower(), 3)
+
+
+def _cut(body, limit):
+    if len(body) <= limit:
+        return body
+    head = body[:max(limit - len(TRUNCATED) - 1, 0)]
+    if "\n" in head:
+        head = head.rsplit("\n", 1)[0]
+    return f"{head}\n{TRUNCATED}" if head else TRUNCATED
+
+
+def fit_to_budget(sections, max_chars):
+    """
+    Trim sections so the joined text fits ``max_chars``.
+
+    Lowest-priority sections (hobbies, references, ...) are dropped first;
+    the remaining budget is then shared out evenly, with sections shorter
+    than their share kept whole and the slack passed on to longer ones.
+    """
+    def size(items):
+        return sum(len(h or '') + len(b) + 2 for h, b in items)
+
+    kept = list(sections)
+    for level in (4, 3):
+        if size(kept) <= max_chars:
+            return kept, len(kept) < len(sections)
+        kept = [s for s in kept if _priority(s[0]) < level] or kept
+    if size(kept) <= max_chars:
+        return kept, True
+
+    available = max_chars - sum(len(h or '') + 2 for h, _ in kept)
+    limits = {}
+    order = sorted(range(len(kept)), key=lambda i: len(kept[i][1]))
+    for n, i in enumerate(order):
+        share = max(available // (len(order) - n), 0)
+        limits[i] = min(len(kept[i][1]), share)
+        available -= limits[i]
+    return [(h, _cut(b, limits[i])) for i, (h, b) in enumerate(kept)], True
+
+
+def prepare(text: str, max_tokens: int = None) -> PreparedText:
+    """Clean ``text`` for the prompt and, with ``max_tokens``, fit it to that budget."""
+    pages = [normalize(page) for page in text.split(PAGE_BREAK)]
+    pages = strip_repeated_lines(pages)
+    cleaned = _BLANK_LINES.sub("\n\n", "\n\n".join(p for p in pages if p.strip())).strip()
+
+    truncated = False
+    if max_tokens and estimate_tokens(cleaned) > max_tokens:
+        sections, truncated = fit_to_budget(split_sections(cleaned), max_tokens * CHARS_PER_TOKEN)
+        cleaned = "\n\n".join(f"{h}\n{b}" if h else b for h, b in sections)
+    return PreparedText(cleaned, chars_in=len(text), tokens_in=estimate_tokens(text), truncated=truncated)
+
+
+def extract_and_prepare(content, ext: str, max_pages=None, max_chars=None, max_tokens=None) -> PreparedText:
+    """Extraction plus ``prepare`` in one call, for the ingestion process pool."""
+    return prepare(extraction.extract_text(content, ext, max_pages, max_chars), max_tokens)
@@ -0,0 +1,270 @@
+"""
+Schema-driven resume parsing with a single Gemini request.
+
+All requested fields are described by one response schema and come back
+from one structured-output call. The response is validated against the same
+schema. The response text is decoded leniently (``jsonrepair``): wrapper text
+and code fences are skipped, trailing commas dropped, and a response cut off
+mid-way keeps its complete fields. Fields that are missing or invalid are
+then re-requested together in one follow-up call that asks for just those
+keys, when the fallback is enabled. Both ``ResumeProcessor`` and the parse
+pipeline go through ``parse``.
+
+``parse_batch`` packs several short resumes into one request, each between
+delimiters carrying its id, and splits the returned JSON array back out by
+id. Items that are missing or fail validation are parsed again on their own.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from core import metrics
+from core.llm_service import query_gemini
+
+from . import jsonrepair
+
+logger = logging.getLogger(__name__)
+
+DECODES = metrics.counter('resume_llm_json_decodes_total',
+                          "Structured LLM responses decoded, by outcome (clean, repaired, truncated, failed).",
+                          ('outcome',))
+
+
+def _string(description, nullable=False):
+    schema = {'type': 'STRING', 'description': description}
+    if nullable:
+        schema['nullable'] = True
+    return schema
+
+
+def _list_of(items, description):
+    return {'type': 'ARRAY', 'items': items, 'description': description}
+
+
+def _record(**properties):
+    return {'type': 'OBJECT', 'properties': properties}
+
+
+# Gemini response schema (OpenAPI subset) for every field the parser knows.
+FIELDS = {
+    'name': _string("The full name of the candidate"),
+    'email': _string("The email address of the candidate", nullable=True),
+    'phone': _string("The contact number of the candidate", nullable=True),
+    'skills': _list_of(
+        {'type': 'STRING'},
+        'A flat list of all technical and professional skills (e.g. ["Python", "AWS", "React"])',
+    ),
+    'projects': _list_of(
+        _record(
+            name=_string("The project name", nullable=True),
+            description=_string("A brief description of the project, including the technical stack used", nullable=True),
+        ),
+        "The candidate's projects",
+    ),
+    'education': _list_of(
+        _record(
+            degree=_string("Name of the degree", nullable=True),
+            institution=_string("Educational institution", nullable=True),
+            duration=_string("Duration of the course", nullable=True),
+        ),
+        "Education details",
+    ),
+    'experience': _list_of(
+        _record(
+            company=_string("Company name", nullable=True),
+            role=_string("Job role", nullable=True),
+            start_date=_string("Start date", nullable=True),
+            end_date=_string("End date", nullable=True),
+            description=_string("Role description", nullable=True),
+        ),
+        "Work experience in chronological order",
+    ),
+    'profile_summary': _string(
+        "A brief professional summary; if the resume has none, write one based on the "
+        "candidate's experience and education"
+    ),
+    'domain_classification': _list_of(
+        {'type': 'STRING'},
+        'One or more roles such as "Frontend Developer", "Backend Developer", "Data Engineer", '
+        '"Full Stack Developer", "DevOps Engineer", "ML Engineer", "Database Administrator"',
+    ),
+    'total_years_of_experience': {
+        'type': 'NUMBER',
+        'description': "Total years of professional experience",
+    },
+}
+
+
+class StructuredOutputError(ValueError):
+    pass
+
+
+def response_schema(fields) -> dict:
+    return {
+        'type': 'OBJECT',
+        'properties': {f: FIELDS[f] for f in fields},
+        'required': list(fields),
+    }
+
+
+def build_prompt(resume_text: str, fields) -> str:
+    described = "\n".join(f'- "{f}": {FIELDS[f]["description"]}' for f in fields)
+    return f"""
+You are a highly advanced resume parsing assistant.
+Parse the following resume text and return a JSON object with these fields:
+
+{described}
+
+Resume text:
+\"\"\"
+{resume_text}
+\"\"\"
+"""
+
+
+def is_valid(value, schema) -> bool:
+    """Check a decoded value against a FIELDS schema."""
+    if value is None:
+        return schema.get('nullable', False)
+    kind = schema['type']
+    if kind == 'STRING':
+        return isinstance(value, str)
+    if kind == 'NUMBER':
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if kind == 'ARRAY':
+        return isinstance(value, list) and all(is_valid(v, schema['items']) for v in value)
+    if kind == 'OBJECT':
+        return isinstance(value, dict) and all(
+            is_valid(value[k], s) for k, s in schema['properties'].items() if k in value
+        )
+    return False
+
+
+def is_complete(parsed: dict, fields=None) -> bool:
+    """Whether ``parse`` got every one of ``fields`` (all of FIELDS by default)."""
+    return all(f in parsed for f in (fields or FIELDS))
+
+
+def _decode(raw_text: str, expected=dict):
+    try:
+        decoded = jsonrepair.decode(raw_text, expected)
+    except ValueError as e:
+        DECODES.inc(outcome='failed')
+        raise StructuredOutputError(str(e)) from e
+    if decoded.truncated:
+        DECODES.inc(outcome='truncated')
+        logger.warning("Structured response was truncated; keeping its complete %s",
+                       "fields" if expected is dict else "items")
+    else:
+        DECODES.inc(outcome='repaired' if decoded.repaired else 'clean')
+    return decoded.value
+
+
+def request_fields(resume_text: str, fields) -> dict:
+    """One Gemini call for ``fields``; returns only the fields that validate."""
+    data = _decode(query_gemini(build_prompt(resume_text, fields), response_schema(fields)))
+    return {f: data[f] for f in fields if f in data and is_valid(data[f], FIELDS[f])}
+
+
+def parse(resume_text: str, fields=None, fallback=None) -> dict:
+    """
+    Parse ``fields`` (all of FIELDS by default) from the resume text.
+
+    Missing or invalid fields (including any a truncated response cut off)
+    are requested again, all in one call, when ``fallback`` (default
+    ``LLM_FIELD_FALLBACK``) is on. Fields that are still missing afterwards
+    are left out of the result; ``is_complete`` tells such a partial parse
+    apart.
+    """
+    fields = list(fields or FIELDS)
+    if fallback is None:
+        fallback = settings.LLM_FIELD_FALLBACK
+    try:
+        parsed = request_fields(resume_text, fields)
+    except ValueError as e:
+        logger.warning("Structured response could not be decoded: %s", e)
+        parsed = {}
+
+    missing = [f for f in fields if f not in parsed]
+    if missing and fallback:
+        logger.info("Re-requesting %d missing field(s): %s", len(missing), ", ".join(missing))
+        try:
+            parsed.update(request_fields(resume_text, missing))
+        except Exception as e:
+            logger.warning("Follow-up request for the missing fields failed: %s", e)
+    if not parsed:
+        raise StructuredOutputError("No valid fields in the LLM response")
+    return parsed
+
+
+def batch_schema(fields) -> dict:
+    item = response_schema(fields)
+    item['properties'] = {'id': _string("The id of the resume, exactly as given"), **item['properties']}
+    item['required'] = ['id'] + item['required']
+    return {'type': 'ARRAY', 'items': item}
+
+
+def build_batch_prompt(resumes: dict, fields) -> str:
+    described = "\n".join(f'- "{f}": {FIELDS[f]["description"]}' for f in fields)
+    blocks = "\n\n".join(
+        f"=== RESUME {resume_id} ===\n{text}\n=== END RESUME {resume_id} ===" for resume_id, text in resumes.items()
+    )
+    return f"""
+You are a highly advanced resume parsing assistant.
+Below are {len(resumes)} separate resumes, each between "=== RESUME <id> ===" and
+"=== END RESUME <id> ===". Parse each one on its own, never mixing details between
+resumes, and return a JSON array with one object per resume containing "id" (the
+resume's id, exactly as given) and these fields:
+
+{described}
+
+{blocks}
+"""
+
+
+def request_batch(resumes: dict, fields) -> dict:
+    """
+    One Gemini call for several resumes ({id: text}); returns {id: fields}
+    for the items whose fields are all present and valid.
+    """
+    data = _decode(query_gemini(build_batch_prompt(resumes, fields), batch_schema(fields)), list)
+    results = {}
+    for item in data:
+        if not isinstance(item, dict) or str(item.get('id')) not in resumes or str(item['id']) in results:
+            continue
+        if all(f in item and is_valid(item[f], FIELDS[f]) for f in fields):
+            results[str(item['id'])] = {f: item[f] for f in fields}
+    return results
+
+
+def parse_batch(resumes: dict, fields=None, fallback=None):
+    """
+    Parse several resumes ({key: text}) in one request.
+
+    Returns ({key: parsed or the exception raised}, [keys retried]). Items
+    the batch response leaves out or gets wrong are parsed again on their
+    own with ``parse``, in parallel.
+    """
+    fields = list(fields or FIELDS)
+    # Short ids in the prompt; the keys (file ids) can be long and opaque.
+    labels = {f"R{n}": key for n, key in enumerate(resumes, 1)}
+    try:
+        batch = request_batch({label: resumes[key] for label, key in labels.items()}, fields)
+    except Exception as e:
+        logger.warning("Batch request for %d resumes failed: %s", len(resumes), e)
+        batch = {}
+    results = {labels[label]: parsed for label, parsed in batch.items()}
+
+    retried = [key for key in resumes if key not in results]
+    if retried:
+        logger.info("Parsing %d of %d batched resume(s) on their own", len(retried), len(resumes))
+        workers = min(len(retried), settings.LLM_FIELD_FALLBACK_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {key: pool.submit(parse, resumes[key], fields, fallback) for key in retried}
+            for key, future in futures.items():
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    results[key] = e
+    return results, retried
@@ -0,0 +1,278 @@
+"""
+Candidate fit scores for job openings.
+
+Scores are computed with numpy over batches of candidates: the skill and
+domain links of a batch are read from the M2M through tables in one query
+each and turned into a membership matrix against the job's skills, so a
+batch of thousands of candidates is scored with a handful of array ops.
+Results are upserted into CandidateScore, which shortlists are read from
+(and cached on top of, see ``shortlist``).
+
+``score_job`` rescores every candidate for one opening (after it is created
+or its requirements change); ``score_candidate`` rescores one candidate
+against every active opening and is called when a candidate is saved.
+
+    score = 0.5 * required skills matched + 0.2 * preferred skills matched
+          + 0.15 * domain match + 0.15 * experience fit
+
+Weights of parts a job does not specify are shared out over the others.
+"""
+import logging
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Candidate, CandidateScore, Domain, JobOpening, Skill
+from .taxonomy import normalize
+
+logger = logging.getLogger(__name__)
+
+WEIGHTS = {'required': 0.5, 'preferred': 0.2, 'domain': 0.15, 'experience': 0.15}
+UNKNOWN_EXPERIENCE_FIT = 0.5
+BATCH_SIZE = 5000
+SHORTLIST_CACHE_TIMEOUT = 600
+
+
+def _positions(keys, values):
+    """Index in ``keys`` of each of ``values`` (all of which must be present)."""
+    order = np.argsort(keys)
+    return order[np.searchsorted(keys[order], values)]
+
+
+class JobProfile:
+    """A job's requirements resolved to Skill/Domain ids, ready to score batches against."""
+
+    def __init__(self, job):
+        self.job = job
+        self.required = self._skill_ids(job.required_skills)
+        self.preferred = [s for s in self._skill_ids(job.preferred_skills) if s not in self.required]
+        self.domains = self._domain_ids(job.domain)
+        self.min_years = float(job.min_experience) if job.min_experience is not None else None
+        self.max_years = float(job.max_experience) if job.max_experience is not None else None
+        self.columns = np.array(self.required + self.preferred, dtype=np.int64)
+        # Requested skills no candidate has yet still count in the denominators.
+        required_names = {normalize(s) for s in job.required_skills or []} - {''}
+        self.required_total = len(required_names)
+        self.preferred_total = len({normalize(s) for s in job.preferred_skills or []} - required_names - {''})
+
+    @staticmethod
+    def _skill_ids(names):
+        keys = list(dict.fromkeys(normalize(n) for n in names or [] if normalize(n)))
+        found = dict(Skill.objects.filter(normalized__in=keys).values_list('normalized', 'pk'))
+        return [found[k] for k in keys if k in found]
+
+    @staticmethod
+    def _domain_ids(domain):
+        key = normalize(domain)
+        if not key:
+            return []
+        return list(Domain.objects.filter(normalized__contains=key).values_list('pk', flat=True))
+
+    def weights(self):
+        present = {
+            'required': self.required_total > 0,
+            'preferred': self.preferred_total > 0,
+            'domain': bool(normalize(self.job.domain)),
+            'experience': self.min_years is not None or self.max_years is not None,
+        }
+        total = sum(WEIGHTS[k] for k, on in present.items() if on)
+        return {k: (WEIGHTS[k] / total if on and total else 0.0) for k, on in present.items()}
+
+    def experience_fit(self, years):
+        """1 inside the range, falling off linearly below it and gently above it."""
+        fit = np.ones_like(years)
+        if self.min_years:
+            fit = np.where(years < self.min_years, np.clip(years / self.min_years, 0, 1), fit)
+        if self.max_years:
+            fit = np.where(years > self.max_years, np.maximum(0.5, self.max_years / np.maximum(years, 1e-9)), fit)
+        return np.where(np.isnan(years), UNKNOWN_EXPERIENCE_FIT, fit)
+
+    def score(self, candidate_ids, years, skill_links, domain_links):
+        """
+        Score one batch.
+
+        ``candidate_ids`` and ``years`` (NaN when unknown) are aligned arrays;
+        ``skill_links``/``domain_links`` are (candidate_id, skill/domain id)
+        pairs restricted to this job's ids.
+        """
+        ids = np.asarray(candidate_ids, dtype=np.int64)
+        n, n_required = len(ids), len(self.required)
+
+        has = np.zeros((n, len(self.columns)), dtype=bool)
+        skill_links = np.array(list(skill_links), dtype=np.int64).reshape(-1, 2)
+        if len(skill_links):
+            has[_positions(ids, skill_links[:, 0]), _positions(self.columns, skill_links[:, 1])] = True
+        required_matched = has[:, :n_required].sum(axis=1)
+        preferred_matched = has[:, n_required:].sum(axis=1)
+
+        domain_match = np.zeros(n, dtype=bool)
+        domain_links = np.array(list(domain_links), dtype=np.int64).reshape(-1, 2)
+        if len(domain_links):
+            domain_match[_positions(ids, domain_links[:, 0])] = True
+        experience_fit = self.experience_fit(years)
+
+        w = self.weights()
+        score = (
+            w['required'] * required_matched / max(self.required_total, 1)
+            + w['preferred'] * preferred_matched / max(self.preferred_total, 1)
+            + w['domain'] * domain_match
+            + w['experience'] * experience_fit
+        )
+        return score, required_matched, preferred_matched, domain_match, experience_fit
+
+
+def _links(relation, column, candidate_ids, ids):
+    if not ids:
+        return []
+    through = getattr(Candidate, relation).through
+    return through.objects.filter(
+        candidate_id__in=candidate_ids, **{f'{column}__in': ids}
+    ).values_list('candidate_id', column)
+
+
+def _score_batch(profile, batch):
+    """Score [(candidate_id, years)] against one job and upsert the results."""
+    candidate_ids = [cid for cid, _ in batch]
+    years = np.array([float(y) if y is not None else np.nan for _, y in batch], dtype=np.float64)
+    score, required, preferred, domain, experience = profile.score(
+        candidate_ids, years,
+        _links('skill_set', 'skill_id', candidate_ids, profile.columns.tolist()),
+        _links('domains', 'domain_id', candidate_ids, profile.domains),
+    )
+    CandidateScore.objects.bulk_create(
+        [
+            CandidateScore(
+                job=profile.job, candidate_id=cid, score=round(float(score[i]), 6),
+                required_matched=int(required[i]), preferred_matched=int(preferred[i]),
+                domain_match=bool(domain[i]), experience_fit=round(float(experience[i]), 4),
+            )
+            for i, cid in enumerate(candidate_ids)
+        ],
+        update_conflicts=True,
+        unique_fields=['job', 'candidate'],
+        update_fields=['score', 'required_matched', 'preferred_matched', 'domain_match',
+                       'experience_fit', 'computed_at'],
+    )
+
+
+def score_job(job, batch_size=BATCH_SIZE):
+    """Rescore every candidate for one opening; returns the number scored."""
+    profile = JobProfile(job)
+    qs = Candidate.objects.order_by('id').values_list('id', 'total_years_of_experience')
+    count = 0
+    last_id = 0
+    while True:
+        batch = list(qs.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        _score_batch(profile, batch)
+        count += len(batch)
+        last_id = batch[-1][0]
+    job.scored_at = timezone.now()
+    job.save(update_fields=['scored_at'])
+    invalidate_shortlists(job.pk)
+    logger.info("Scored %d candidates for job %s", count, job.pk)
+    return count
+
+
+def score_candidates(candidates):
+    """Rescore candidates against every active opening, one batch per opening."""
+    batch = [(c.pk, c.total_years_of_experience) for c in candidates]
+    jobs = list(JobOpening.objects.filter(is_active=True)) if batch else []
+    for job in jobs:
+        _score_batch(JobProfile(job), batch)
+        invalidate_shortlists(job.pk)
+    return len(jobs)
+
+
+def score_candidate(candidate):
+    """Rescore one candidate against every active opening."""
+    return score_candidates([candidate])
+
+
+def invalidate_shortlists(job_id):
+    JobOpening.objects.filter(pk=job_id).update(shortlist_version=F('shortlist_version') + 1)
+
+
+def shortlist(job, limit=20, min_score=0.0):
+    """
+    The top ``limit`` (candidate_id, CandidateScore fields) rows for a job.
+
+    Results are cached per job under its ``shortlist_version``. The version
+    lives on the JobOpening row and any rescoring of the job bumps it, so
+    every worker stops using its cached shortlists at once, whatever cache
+    backend each one has.
+    """
+    key = f"shortlist:{job.pk}:{job.shortlist_version}:{limit}:{min_score}"
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(
+            CandidateScore.objects.filter(job=job, score__gte=min_score)
+            .order_by('-score', 'candidate_id')
+            .values('candidate_id', 'score', 'required_matched', 'preferred_matched',
+                    'domain_match', 'experience_fit')[:limit]
+        )
+        cache.set(key, rows, timeout=SHORTLIST_CACHE_TIMEOUT)
+    return rows
+
+
+# Fields whose change invalidates every stored score of a job.
+SCORED_FIELDS = ('required_skills', 'preferred_skills', 'domain', 'min_experience', 'max_experience')
+
+
+def clean_job_data(data, partial=False, instance=None):
+    """Validate JobOpening input; returns the model field values or raises ValueError."""
+    cleaned = {}
+    if not partial or 'title' in data:
+        title = (data.get('title') or '').strip()
+        if not title:
+            raise ValueError("title is required")
+        cleaned['title'] = title[:255]
+    if 'description' in data:
+        cleaned['description'] = data.get('description') or ''
+    for key in ('required_skills', 'preferred_skills'):
+        if key in data:
+            value = data.get(key) or []
+            if isinstance(value, str):
+                value = [s.strip() for s in value.split(',')]
+            if not isinstance(value, list) or not all(isinstance(s, str) for s in value):
+                raise ValueError(f"{key} must be a list of strings")
+            cleaned[key] = [s.strip() for s in value if s.strip()]
+    if 'domain' in data:
+        cleaned['domain'] = (data.get('domain') or '').strip()[:255]
+    for key in ('min_experience', 'max_experience'):
+        if key in data:
+            value = data.get(key)
+            try:
+                cleaned[key] = None if value in (None, '') else Decimal(str(value))
+            except InvalidOperation:
+                raise ValueError(f"{key} must be a number")
+    if 'is_active' in data:
+        value = data.get('is_active')
+        # Form and query-string input arrives as text, so "false" must not count as set.
+        cleaned['is_active'] = value if isinstance(value, bool) else str(value).lower() in ('1', 'true', 'yes')
+    low = cleaned.get('min_experience', instance.min_experience if instance else None)
+    high = cleaned.get('max_experience', instance.max_experience if instance else None)
+    if low is not None and high is not None and low > high:
+        raise ValueError("min_experience must not exceed max_experience")
+    return cleaned
+
+
+def opening_payload(job):
+    return {
+        "id": job.id,
+        "title": job.title,
+        "description": job.description,
+        "required_skills": job.required_skills,
+        "preferred_skills": job.preferred_skills,
+        "domain": job.domain,
+        "min_experience": job.min_experience,
+        "max_experience": job.max_experience,
+        "is_active": job.is_active,
+        "scored_at": job.scored_at,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
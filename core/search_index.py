@@ -0,0 +1,187 @@
+"""
+Full-text candidate search.
+
+Candidates are indexed in a side table chosen by database backend: an FTS5
+virtual table on SQLite (ranked with bm25) or a tsvector column with a GIN
+index on Postgres (ranked with ts_rank_cd). ``index_candidate`` is called
+whenever a candidate is saved, so the index never needs a full rebuild.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.utils.html import escape
+
+FTS_TABLE = 'core_candidate_fts'
+COLUMNS = ('name', 'summary', 'skills', 'experience', 'projects')
+# Relative column weights: skills and summary matter most, projects least.
+SQLITE_WEIGHTS = (1.0, 2.0, 3.0, 1.5, 1.0)
+POSTGRES_WEIGHTS = {'name': 'C', 'summary': 'B', 'skills': 'A', 'experience': 'B', 'projects': 'C'}
+HIGHLIGHT = ('<mark>', '</mark>')
+# The database marks matches with these; the snippet text is escaped before they
+# become HIGHLIGHT, so markup in a resume is never returned as HTML.
+_MARKERS = ('\x02', '\x03')
+
+
+class SearchNotSupported(Exception):
+    pass
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, dict):
+        return " ".join(_text(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return " ".join(_text(v) for v in value)
+    return str(value)
+
+
+def build_document(candidate) -> dict:
+    """The indexed text of a candidate, one entry per column."""
+    pd = candidate.parsed_data or {}
+    return {
+        'name': _text(candidate.name),
+        'summary': _text(candidate.profile_summary or pd.get('profile_summary')),
+        'skills': _text(candidate.skills or pd.get('skills')),
+        'experience': " ".join(
+            _text([e.get('role'), e.get('company'), e.get('description')]) if isinstance(e, dict) else _text(e)
+            for e in pd.get('experience') or []
+        ),
+        'projects': " ".join(
+            _text([p.get('name'), p.get('description')]) if isinstance(p, dict) else _text(p)
+            for p in pd.get('projects') or []
+        ),
+    }
+
+
+def create_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"{', '.join(COLUMNS)}, tokenize='porter unicode61')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {FTS_TABLE} ("
+            "candidate_id bigint PRIMARY KEY REFERENCES core_candidate(id) ON DELETE CASCADE, "
+            "document tsvector NOT NULL, "
+            f"{', '.join(f'{c} text NOT NULL' for c in COLUMNS)})"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {FTS_TABLE}_document ON {FTS_TABLE} USING GIN (document)"
+        )
+
+
+def drop_index(schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def _upsert(cursor, vendor, candidate_id, doc):
+    values = [doc[c] for c in COLUMNS]
+    if vendor == 'sqlite':
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [candidate_id])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(COLUMNS)}) VALUES (%s{', %s' * len(COLUMNS)})",
+            [candidate_id, *values],
+        )
+    elif vendor == 'postgresql':
+        vector = " || ".join(
+            f"setweight(to_tsvector('english', %s), '{POSTGRES_WEIGHTS[c]}')" for c in COLUMNS
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (candidate_id, document, {', '.join(COLUMNS)}) "
+            f"VALUES (%s, {vector}{', %s' * len(COLUMNS)}) "
+            f"ON CONFLICT (candidate_id) DO UPDATE SET document = EXCLUDED.document, "
+            + ", ".join(f"{c} = EXCLUDED.{c}" for c in COLUMNS),
+            [candidate_id, *values, *values],
+        )
+
+
+def index_candidate(candidate):
+    """Add or refresh one candidate in the full-text index."""
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    with connection.cursor() as cursor:
+        _upsert(cursor, connection.vendor, candidate.pk, build_document(candidate))
+
+
+def remove_candidate(candidate_id):
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    column = 'rowid' if connection.vendor == 'sqlite' else 'candidate_id'
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE {column} = %s", [candidate_id])
+
+
+def rebuild(candidates, using=DEFAULT_DB_ALIAS):
+    """Re-index the given candidates (used by the migration and rebuild command) on database ``using``."""
+    count = 0
+    conn = connections[using]
+    with conn.cursor() as cursor:
+        for candidate in candidates:
+            _upsert(cursor, conn.vendor, candidate.pk, build_document(candidate))
+            count += 1
+    return count
+
+
+def _terms(query):
+    return re.findall(r"\w+", query.lower())[:32]
+
+
+def _highlight(snippet):
+    """HTML-escape a database snippet, then turn its match markers into HIGHLIGHT tags."""
+    html = escape(snippet or '')
+    return html.replace(_MARKERS[0], HIGHLIGHT[0]).replace(_MARKERS[1], HIGHLIGHT[1])
+
+
+def search(query, page=1, page_size=20, match='any'):
+    """
+    Return (total, [(candidate_id, score, snippet), ...]) for one page of results,
+    best match first. Terms are OR-ed when ``match`` is "any" and AND-ed for "all".
+    """
+    terms = _terms(query)
+    if not terms:
+        return 0, []
+    offset = (page - 1) * page_size
+    vendor = connection.vendor
+
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            fts_query = (' OR ' if match == 'any' else ' AND ').join(f'"{t}"*' for t in terms)
+            cursor.execute(
+                f"SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [fts_query]
+            )
+            total = cursor.fetchone()[0]
+            cursor.execute(
+                f"SELECT {FTS_TABLE}.rowid, -bm25({FTS_TABLE}, {', '.join(map(str, SQLITE_WEIGHTS))}) AS score, "
+                f"snippet({FTS_TABLE}, -1, %s, %s, '…', 16) "
+                f"FROM {FTS_TABLE} JOIN core_candidate ON core_candidate.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s ORDER BY score DESC, {FTS_TABLE}.rowid LIMIT %s OFFSET %s",
+                [*_MARKERS, fts_query, page_size, offset],
+            )
+        elif vendor == 'postgresql':
+            ts_query = (' | ' if match == 'any' else ' & ').join(f"{t}:*" for t in terms)
+            cursor.execute(
+                f"SELECT count(*) FROM {FTS_TABLE} WHERE document @@ to_tsquery('english', %s)",
+                [ts_query],
+            )
+            total = cursor.fetchone()[0]
+            # Headlines are expensive, so only build them for the page being returned.
+            cursor.execute(
+                "SELECT p.candidate_id, p.score, ts_headline('english', "
+                f"concat_ws(' ', {', '.join('p.' + c for c in COLUMNS)}), to_tsquery('english', %s), "
+                "%s) FROM ("
+                f"  SELECT candidate_id, ts_rank_cd(document, to_tsquery('english', %s)) AS score, "
+                f"  {', '.join(COLUMNS)} FROM {FTS_TABLE} "
+                "  WHERE document @@ to_tsquery('english', %s) "
+                "  ORDER BY score DESC, candidate_id LIMIT %s OFFSET %s"
+                ") p ORDER BY p.score DESC, p.candidate_id",
+                [ts_query, f"StartSel={_MARKERS[0]}, StopSel={_MARKERS[1]}, MaxFragments=2, MaxWords=20",
+                 ts_query, ts_query, page_size, offset],
+            )
+        else:
+            raise SearchNotSupported(f"Full-text search is not supported on {vendor}")
+        rows = [(cid, float(score), _highlight(snippet)) for cid, score, snippet in cursor.fetchall()]
+    return total, rows
@@ -0,0 +1,170 @@
+"""
+Incremental sync of a site's Resume folder using Graph delta queries.
+
+The first sync lists the folder once and stores a delta link; later syncs only
+fetch what changed since then. File state lives in SharePointFile, and files
+whose eTag differs from the version last parsed are flagged ``needs_parse``.
+"""
+import logging
+
+import requests
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .graph_utils import (
+    DeltaLinkExpired, forget_resume_folder, get_drive_delta, get_resume_folder_id, list_resume_folder,
+)
+from .models import Candidate, SharePointFile
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def _chunks(seq, size=BATCH_SIZE):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def parsed_file_ids(file_ids):
+    """
+    The ids among ``file_ids`` whose candidate came from a full (LLM) parse.
+
+    Candidates saved in cheap mode do not count, so a later full run picks
+    their files up again.
+    """
+    parsed = set()
+    for chunk in _chunks(list(file_ids)):
+        # Filtered here: exclude() on a JSON key also drops rows without the key.
+        rows = Candidate.objects.filter(file_id__in=chunk).values_list('file_id', 'parsed_data__parse_mode')
+        parsed.update(file_id for file_id, mode in rows if mode != 'cheap')
+    return parsed
+
+
+def _in_folder(item, folder_id):
+    return 'file' in item and item.get('parentReference', {}).get('id') == folder_id
+
+
+def _apply_changes(site, items, full):
+    stats = {"added": 0, "changed": 0, "deleted": 0}
+    latest = {item['id']: item for item in items}
+    ids = list(latest)
+
+    known = {}
+    for chunk in _chunks(ids):
+        known.update((f.file_id, f) for f in site.files.filter(file_id__in=chunk))
+    already_parsed = parsed_file_ids(ids)
+
+    created, updated = [], []
+    for file_id, item in latest.items():
+        tracked = known.get(file_id)
+        if item.get('deleted') or not _in_folder(item, site.resume_folder_id):
+            if tracked and not tracked.deleted:
+                tracked.deleted = True
+                tracked.needs_parse = False
+                updated.append(tracked)
+                stats["deleted"] += 1
+            continue
+
+        etag = item.get('eTag', '')
+        if tracked is None:
+            parsed = file_id in already_parsed
+            created.append(SharePointFile(
+                site=site, file_id=file_id, name=item.get('name', ''),
+                web_url=item.get('webUrl', ''), etag=etag,
+                parsed_etag=etag if parsed else '', needs_parse=not parsed,
+            ))
+            stats["added"] += 1
+            continue
+
+        if tracked.deleted or tracked.etag != etag:
+            stats["changed"] += 1
+        tracked.name = item.get('name', tracked.name)
+        tracked.web_url = item.get('webUrl', tracked.web_url)
+        tracked.etag = etag
+        tracked.deleted = False
+        tracked.needs_parse = etag != tracked.parsed_etag
+        updated.append(tracked)
+
+    if full:
+        # A full listing is authoritative: anything we track that it lacks is gone.
+        tracked_ids = set(site.files.filter(deleted=False).values_list('file_id', flat=True))
+        for chunk in _chunks(list(tracked_ids - set(ids))):
+            stats["deleted"] += site.files.filter(file_id__in=chunk).update(deleted=True, needs_parse=False)
+
+    with transaction.atomic():
+        SharePointFile.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        SharePointFile.objects.bulk_update(
+            updated, ['name', 'web_url', 'etag', 'deleted', 'needs_parse'], batch_size=BATCH_SIZE
+        )
+    return stats
+
+
+def resume_folder_id(access_token, site):
+    """The site's Resume folder id, looked up once and then kept on the site."""
+    if not site.resume_folder_id:
+        site.resume_folder_id = get_resume_folder_id(access_token, site.site_id, site.drive_id)
+        site.save(update_fields=['resume_folder_id'])
+    return site.resume_folder_id
+
+
+def list_site_resume_folder(access_token, site):
+    """
+    List the site's Resume folder without resolving it again.
+
+    If the stored folder id no longer exists (the folder was deleted or
+    recreated), it is looked up once more and the listing retried.
+    """
+    try:
+        return list_resume_folder(access_token, site.site_id, site.drive_id, resume_folder_id(access_token, site))
+    except requests.HTTPError as e:
+        if e.response is None or e.response.status_code != 404:
+            raise
+    logger.info("Resume folder of site %s not found, resolving it again", site.pk)
+    forget_resume_folder(access_token, site.drive_id)
+    site.resume_folder_id = ''
+    return list_resume_folder(access_token, site.site_id, site.drive_id, resume_folder_id(access_token, site))
+
+
+def sync_site(access_token, site):
+    """Bring the site's SharePointFile rows up to date and report what changed."""
+    full = not site.delta_link
+    resume_folder_id(access_token, site)
+
+    try:
+        if full:
+            # Take the delta link first so nothing added during the listing is missed.
+            _, delta_link = get_drive_delta(access_token, site.site_id, site.drive_id, latest=True)
+            items = list_site_resume_folder(access_token, site)
+        else:
+            items, delta_link = get_drive_delta(
+                access_token, site.site_id, site.drive_id, delta_link=site.delta_link
+            )
+    except DeltaLinkExpired:
+        logger.info("Delta link for site %s expired, running a full sync", site.pk)
+        site.delta_link = ''
+        return sync_site(access_token, site)
+
+    stats = _apply_changes(site, items, full)
+    site.delta_link = delta_link or ''
+    site.last_synced_at = timezone.now()
+    site.save(update_fields=['resume_folder_id', 'delta_link', 'last_synced_at'])
+
+    stats.update(full=full, pending=site.files.filter(needs_parse=True, deleted=False).count())
+    return stats
+
+
+def pending_files(site):
+    """Files queued for (re-)parsing, in the same shape as Graph drive items."""
+    return [
+        {'id': f.file_id, 'name': f.name, 'webUrl': f.web_url, 'eTag': f.etag}
+        for f in site.files.filter(needs_parse=True, deleted=False).order_by('pk')
+    ]
+
+
+def mark_parsed(file_id, etag=None):
+    """Clear the re-parse flag once a file's candidate has been saved."""
+    SharePointFile.objects.filter(file_id=file_id).update(
+        needs_parse=False, parsed_etag=etag or F('etag')
+    )
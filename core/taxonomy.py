@@ -0,0 +1,97 @@
+"""
+Normalized Skill/Domain rows for candidates.
+
+The JSON ``skills`` and ``domain_classification`` fields are kept for
+display; these many-to-many links are what search filters on, so lookups
+go through indexed joins instead of scanning serialized JSON.
+"""
+from django.db.models import Exists, OuterRef
+
+from .models import Candidate, Domain, Skill
+
+
+def normalize(term) -> str:
+    if not isinstance(term, str):
+        return ''
+    return " ".join(term.split()).lower()[:255]
+
+
+def _get_or_create_terms(model, names):
+    wanted = {}
+    for name in names or []:
+        key = normalize(name)
+        if key and key not in wanted:
+            wanted[key] = " ".join(name.split())[:255]
+    if not wanted:
+        return []
+    existing = {t.normalized: t for t in model.objects.filter(normalized__in=wanted)}
+    missing = [model(name=name, normalized=key) for key, name in wanted.items() if key not in existing]
+    if missing:
+        model.objects.bulk_create(missing, ignore_conflicts=True)
+        existing = {t.normalized: t for t in model.objects.filter(normalized__in=wanted)}
+    return list(existing.values())
+
+
+def sync_candidate_terms(candidate: Candidate):
+    """Mirror the candidate's skills and domain_classification into the M2M tables."""
+    candidate.skill_set.set(_get_or_create_terms(Skill, candidate.skills))
+    candidate.domains.set(_get_or_create_terms(Domain, candidate.domain_classification))
+
+
+def sync_terms_bulk(candidates):
+    """sync_candidate_terms for a batch: one lookup per term table and one rewrite of each link table."""
+    ids = [c.pk for c in candidates]
+    for relation, model, attr, column in (('skill_set', Skill, 'skills', 'skill_id'),
+                                          ('domains', Domain, 'domain_classification', 'domain_id')):
+        terms = {t.normalized: t.pk for t in _get_or_create_terms(
+            model, [name for c in candidates for name in getattr(c, attr) or []]
+        )}
+        through = getattr(Candidate, relation).through
+        through.objects.filter(candidate_id__in=ids).delete()
+        through.objects.bulk_create([
+            through(candidate_id=c.pk, **{column: terms[key]})
+            for c in candidates
+            for key in dict.fromkeys(normalize(name) for name in getattr(c, attr) or [])
+            if key in terms
+        ])
+
+
+def _has_any(relation, ids):
+    through = getattr(Candidate, relation).through
+    column = 'skill_id' if relation == 'skill_set' else 'domain_id'
+    return Exists(through.objects.filter(candidate_id=OuterRef('pk'), **{f'{column}__in': ids}))
+
+
+def filter_candidates(qs, skills=(), match='all', keyword=None, domains=(), min_experience=None):
+    """
+    Narrow a Candidate queryset by skills, domains and experience.
+
+    ``skills`` are matched exactly (after normalization), AND-ed together
+    when ``match`` is "all" and OR-ed when it is "any". ``keyword`` is a
+    substring match against skill names, resolved on the small Skill table
+    first. ``domains`` are substring-matched and OR-ed.
+    """
+    if skills:
+        normalized = [normalize(s) for s in skills if normalize(s)]
+        found = dict(Skill.objects.filter(normalized__in=normalized).values_list('normalized', 'pk'))
+        if match == 'any':
+            qs = qs.filter(_has_any('skill_set', list(found.values())))
+        else:
+            if len(found) < len(set(normalized)):
+                return qs.none()
+            for skill_id in found.values():
+                qs = qs.filter(_has_any('skill_set', [skill_id]))
+
+    if keyword:
+        ids = list(Skill.objects.filter(normalized__contains=normalize(keyword)).values_list('pk', flat=True))
+        qs = qs.filter(_has_any('skill_set', ids))
+
+    if domains:
+        ids = set()
+        for domain in domains:
+            ids.update(Domain.objects.filter(normalized__contains=normalize(domain)).values_list('pk', flat=True))
+        qs = qs.filter(_has_any('domains', list(ids)))
+
+    if min_experience is not None:
+        qs = qs.filter(total_years_of_experience__gte=min_experience)
+    return qs
@@ -1,3 +1,921 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+from unittest import mock, skipIf
 
-# Create your tests here.
+import fitz
+import httpx
+import requests
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from core import graph_utils, http_client, jobs, llm_service, ratelimit
+from core.graph_utils import DeltaLinkExpired
+from core.ingestion import IngestionPipeline, list_unparsed_resumes
+from core.models import Candidate, ParseJob, SharePointFile, SharePointSite
+from core.persistence import CandidateWriter
+from core.resume_parser import cache as parse_cache
+from core.resume_parser import extraction, jsonrepair, pipeline, structured
+from core.resume_parser.fingerprint import fingerprint
+from core.resume_parser.pipeline import parse_resume_text, save_candidate
+from core.sync import parsed_file_ids, sync_site
+from core.utils.pdf_reader import extract_text_from_pdf
+
+FOLDER = 'resume-folder'
+
+
+def _site(**fields):
+    return SharePointSite.objects.create(site_url='https://contoso.sharepoint.com/sites/HR', site_id='site',
+                                         drive_id='drive', resume_folder_id=FOLDER, **fields)
+
+
+def _item(file_id, etag='v1', folder=FOLDER):
+    return {'id': file_id, 'name': f'{file_id}.pdf', 'eTag': etag, 'file': {}, 'parentReference': {'id': folder}}
+
+
+def _candidate(file_id, **fields):
+    return Candidate.objects.create(file_id=file_id, resume_id=file_id[-12:], **fields)
+
+
+def _graph_response(body, status_code=200):
+    response = mock.Mock(status_code=status_code, text='')
+    response.json.return_value = body
+    return response
+
+
+@mock.patch('core.sync.list_site_resume_folder')
+@mock.patch('core.sync.get_drive_delta')
+class DeltaSyncTests(TestCase):
+    def _track(self, site, file_id, etag='v1', parsed_etag='v1', **fields):
+        return SharePointFile.objects.create(site=site, file_id=file_id, etag=etag, parsed_etag=parsed_etag,
+                                             needs_parse=etag != parsed_etag, **fields)
+
+    def test_first_sync_lists_the_folder(self, get_drive_delta, list_folder):
+        site = _site()
+        get_drive_delta.return_value = ([], 'link-1')
+        list_folder.return_value = [_item('a'), _item('b')]
+
+        stats = sync_site('token', site)
+
+        self.assertEqual(get_drive_delta.call_args.kwargs, {'latest': True})
+        self.assertEqual(stats, {'added': 2, 'changed': 0, 'deleted': 0, 'full': True, 'pending': 2})
+        site.refresh_from_db()
+        self.assertEqual(site.delta_link, 'link-1')
+
+    def test_delta_applies_added_changed_and_deleted_items(self, get_drive_delta, list_folder):
+        site = _site(delta_link='link-1')
+        self._track(site, 'changed')
+        self._track(site, 'unchanged')
+        self._track(site, 'removed')
+        get_drive_delta.return_value = (
+            [_item('changed', etag='v2'), _item('unchanged'), {'id': 'removed', 'deleted': {}},
+             _item('new'), _item('elsewhere', folder='other-folder')],
+            'link-2',
+        )
+
+        stats = sync_site('token', site)
+
+        list_folder.assert_not_called()
+        self.assertEqual(get_drive_delta.call_args.kwargs, {'delta_link': 'link-1'})
+        self.assertEqual(stats, {'added': 1, 'changed': 1, 'deleted': 1, 'full': False, 'pending': 2})
+        files = {f.file_id: f for f in site.files.all()}
+        self.assertNotIn('elsewhere', files)
+        self.assertTrue(files['changed'].needs_parse)
+        self.assertFalse(files['unchanged'].needs_parse)
+        self.assertTrue(files['removed'].deleted)
+        self.assertTrue(files['new'].needs_parse)
+        site.refresh_from_db()
+        self.assertEqual(site.delta_link, 'link-2')
+
+    def test_expired_delta_link_falls_back_to_a_full_listing(self, get_drive_delta, list_folder):
+        site = _site(delta_link='expired')
+        self._track(site, 'kept')
+        self._track(site, 'gone')
+        get_drive_delta.side_effect = [DeltaLinkExpired('resyncRequired'), ([], 'link-2')]
+        list_folder.return_value = [_item('kept'), _item('new')]
+
+        stats = sync_site('token', site)
+
+        self.assertEqual(get_drive_delta.call_args_list[1].kwargs, {'latest': True})
+        # Deletions that the expired link never reported are found by the full listing.
+        self.assertEqual(stats, {'added': 1, 'changed': 0, 'deleted': 1, 'full': True, 'pending': 1})
+        self.assertTrue(site.files.get(file_id='gone').deleted)
+        site.refresh_from_db()
+        self.assertEqual(site.delta_link, 'link-2')
+
+
+class DriveDeltaTests(TestCase):
+    @mock.patch('core.graph_utils.http_client.get')
+    def test_follows_next_links_to_the_delta_link(self, get):
+        get.side_effect = [
+            _graph_response({'value': [_item('a')], '@odata.nextLink': 'https://graph/next'}),
+            _graph_response({'value': [_item('b')], '@odata.deltaLink': 'https://graph/delta?token=2'}),
+        ]
+        items, delta_link = graph_utils.get_drive_delta('token', 'site', 'drive', delta_link='https://graph/delta')
+        self.assertEqual([i['id'] for i in items], ['a', 'b'])
+        self.assertEqual(delta_link, 'https://graph/delta?token=2')
+
+    @mock.patch('core.graph_utils.http_client.get')
+    def test_gone_raises_delta_link_expired(self, get):
+        get.return_value = _graph_response({}, status_code=410)
+        with self.assertRaises(DeltaLinkExpired):
+            graph_utils.get_drive_delta('token', 'site', 'drive', delta_link='https://graph/delta')
+
+
+class _StubAdapter(HTTPAdapter):
+    """Transport for the shared session: answers each request with the next scripted outcome."""
+
+    def __init__(self, outcomes):
+        super().__init__()
+        self.outcomes = list(outcomes)
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        self.sent.append(request)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        status, headers = outcome if isinstance(outcome, tuple) else (outcome, {})
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response.url = request.url
+        response.request = request
+        response._content = b'{}'
+        return response
+
+
+@override_settings(HTTP_BACKOFF_BASE=0.5, HTTP_BACKOFF_MAX=30, HTTP_MAX_RETRIES=2)
+@mock.patch('core.http_client.random.uniform', lambda low, high: high)
+@mock.patch('core.http_client.time.sleep')
+class HttpClientRetryTests(TestCase):
+    def _stub(self, *outcomes):
+        adapter = _StubAdapter(outcomes)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        patcher = mock.patch('core.http_client.get_session', return_value=session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return adapter
+
+    def test_transient_status_is_retried_with_backoff(self, sleep):
+        adapter = self._stub(503, 502, 200)
+        response = http_client.get('https://upstream.test/items', endpoint='stub.items')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(adapter.sent), 3)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.5, 1.0])
+
+    def test_retry_after_is_honoured_and_capped(self, sleep):
+        self._stub((429, {'Retry-After': '7'}), (503, {'Retry-After': '3600'}), 200)
+        http_client.get('https://upstream.test/items', endpoint='stub.items')
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [7.0, 30])
+
+    def test_client_errors_are_not_retried(self, sleep):
+        adapter = self._stub(404)
+        self.assertEqual(http_client.get('https://upstream.test/items', endpoint='stub.items').status_code, 404)
+        self.assertEqual(len(adapter.sent), 1)
+        sleep.assert_not_called()
+
+    def test_last_attempt_is_returned_or_raised(self, sleep):
+        self._stub(503, 503, 503)
+        self.assertEqual(http_client.get('https://upstream.test/items', endpoint='stub.items').status_code, 503)
+
+        adapter = self._stub(*[requests.ConnectionError("refused")] * 3)
+        with self.assertRaises(requests.ConnectionError):
+            http_client.get('https://upstream.test/items', endpoint='stub.items')
+        self.assertEqual(len(adapter.sent), 3)
+
+    def test_async_requests_retry_the_same_way(self, sleep):
+        statuses = [503, 200]
+
+        def handler(request):
+            return httpx.Response(statuses.pop(0))
+
+        async def run():
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            with mock.patch('core.http_client.get_async_client', return_value=client), \
+                    mock.patch('core.http_client.asyncio.sleep', new=mock.AsyncMock()) as asleep:
+                response = await http_client.aget('https://upstream.test/items', endpoint='stub.items')
+            await client.aclose()
+            return response, asleep
+
+        response, asleep = asyncio.run(run())
+        self.assertEqual(response.status_code, 200)
+        asleep.assert_awaited_once_with(0.5)
+
+
+class UpstreamErrorTests(TestCase):
+    @mock.patch.dict(os.environ, {'GOOGLE_API_KEY': 'secret-key'})
+    @mock.patch('core.llm_service.http_client.post')
+    def test_gemini_key_is_sent_in_a_header(self, post):
+        post.return_value.json.return_value = {'candidates': [{'content': {'parts': [{'text': 'ok'}]}}]}
+        self.assertEqual(llm_service.query_gemini("prompt"), 'ok')
+        url = post.call_args.args[0]
+        self.assertNotIn('secret-key', url)
+        self.assertEqual(post.call_args.kwargs['headers']['x-goog-api-key'], 'secret-key')
+
+    def test_describe_error_leaves_out_urls_and_credentials(self):
+        response = requests.Response()
+        response.status_code = 403
+        response.url = 'https://generativelanguage.googleapis.com/v1beta/models/x?key=secret-key'
+        error = requests.HTTPError(f"403 Client Error: Forbidden for url: {response.url}", response=response)
+        self.assertEqual(http_client.describe_error(error),
+                         "HTTPError: generativelanguage.googleapis.com returned 403")
+        self.assertNotIn('secret-key', http_client.describe_error(ValueError("GET /x?key=secret-key&a=1")))
+
+
+@override_settings(GRAPH_TOKEN_REFRESH_SKEW=300, GRAPH_TOKEN_SHARED_CACHE=False)
+class AppTokenCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.fetches = 0
+        patcher = mock.patch('core.graph_utils._request_access_token', side_effect=self._fetch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, graph_utils, '_token', graph_utils._token)
+        graph_utils._token = {'value': None, 'expires_at': 0.0}
+
+    def _fetch(self):
+        self.fetches += 1
+        time.sleep(0.05)  # long enough for concurrent callers to pile up
+        return {'value': f'token-{self.fetches}', 'expires_at': time.time() + 3600}
+
+    def test_token_is_reused_until_it_nears_expiry(self):
+        self.assertEqual(graph_utils.get_access_token(), 'token-1')
+        self.assertEqual(graph_utils.get_access_token(), 'token-1')
+        self.assertEqual(self.fetches, 1)
+
+    def test_expired_token_is_refreshed(self):
+        graph_utils._token = {'value': 'old', 'expires_at': time.time() - 1}
+        self.assertEqual(graph_utils.get_access_token(), 'token-1')
+
+    def test_token_in_the_refresh_window_is_refreshed_ahead_of_expiry(self):
+        graph_utils._token = {'value': 'old', 'expires_at': time.time() + 60}
+        self.assertEqual(graph_utils.get_access_token(), 'token-1')
+
+    def test_failed_early_refresh_keeps_the_current_token(self):
+        graph_utils._token = {'value': 'old', 'expires_at': time.time() + 60}
+        with mock.patch('core.graph_utils._request_access_token', side_effect=requests.ConnectionError), \
+                self.assertLogs('core.graph_utils', 'WARNING'):
+            self.assertEqual(graph_utils.get_access_token(), 'old')
+
+    def test_concurrent_callers_share_one_fetch(self):
+        graph_utils._token = {'value': 'old', 'expires_at': time.time() - 1}
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(graph_utils.get_access_token()))
+                   for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual(results, ['token-1'] * 8)
+
+    @override_settings(GRAPH_TOKEN_SHARED_CACHE=True)
+    def test_shared_cache_serves_other_workers(self):
+        self.assertEqual(graph_utils.get_access_token(), 'token-1')
+        graph_utils._token = {'value': None, 'expires_at': 0.0}  # another worker process
+        self.assertEqual(graph_utils.get_access_token(), 'token-1')
+        self.assertEqual(self.fetches, 1)
+
+
+class CandidatePaginationTests(TestCase):
+    def setUp(self):
+        for n, years in enumerate([5, None, 2, 5, 9]):
+            _candidate(f'file-{n}', name=f'Candidate {n}', total_years_of_experience=years)
+
+    def _walk(self, sort):
+        ids, cursor = [], None
+        while True:
+            params = {'page_size': 2, 'sort': sort, 'fields': 'id'}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get('/api/candidates/', params)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.json()['results']]
+            cursor = response.json()['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_next_cursor_walks_every_row_once(self):
+        self.assertEqual(self._walk('id'), list(Candidate.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_next_cursor_with_ties_and_nulls(self):
+        ids = self._walk('-total_years_of_experience')
+        self.assertEqual(sorted(ids), sorted(Candidate.objects.values_list('id', flat=True)))
+        years = [Candidate.objects.get(pk=pk).total_years_of_experience for pk in ids]
+        self.assertIsNone(years[-1])  # NULLs come last
+        known = [y for y in years if y is not None]
+        self.assertEqual(known, sorted(known, reverse=True))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/candidates/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unpaginated_request_keeps_the_bare_list(self):
+        response = self.client.get('/api/candidates/')
+        self.assertEqual(response.status_code, 200)
+        rows = response.json()
+        self.assertIsInstance(rows, list)
+        self.assertEqual(len(rows), 5)
+        self.assertIn('parsed_data', rows[0])
+
+
+APP_CREDENTIALS = {'TENANT_ID': 'tenant', 'CLIENT_ID': 'client', 'CLIENT_SECRET': 'secret'}
+
+
+@override_settings(**APP_CREDENTIALS, PARSE_JOB_LOCK_TIMEOUT=60)
+class ParseJobTests(TestCase):
+    def _go_stale(self, job):
+        ParseJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=120))
+
+    def test_enqueue_reuses_the_active_job(self):
+        job = jobs.enqueue_parse('file-1', 'site', 'drive')
+        self.assertEqual(jobs.enqueue_parse('file-1', 'site', 'drive').pk, job.pk)
+        self.assertEqual(ParseJob.objects.count(), 1)
+
+    @override_settings(CLIENT_SECRET=None)
+    def test_enqueue_needs_app_credentials(self):
+        with self.assertRaises(ImproperlyConfigured):
+            jobs.enqueue_parse('file-1', 'site', 'drive')
+        self.assertFalse(ParseJob.objects.exists())
+
+    def test_claim_and_release(self):
+        job = jobs.enqueue_parse('file-1', 'site', 'drive')
+
+        claimed = jobs.claim_job('worker-1')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual((claimed.status, claimed.attempts, claimed.locked_by), (ParseJob.RUNNING, 1, 'worker-1'))
+        self.assertIsNone(jobs.claim_job('worker-2'))
+
+        jobs.release_job(claimed)
+        claimed.refresh_from_db()
+        self.assertEqual((claimed.status, claimed.attempts, claimed.locked_by), (ParseJob.QUEUED, 0, ''))
+        self.assertEqual(jobs.claim_job('worker-2').pk, job.pk)
+
+    def test_stale_jobs_are_released(self):
+        jobs.enqueue_parse('file-1', 'site', 'drive')
+        job = jobs.claim_job('worker-1')
+        self.assertEqual(jobs.release_stale_jobs(), 0)
+
+        self._go_stale(job)
+        self.assertEqual(jobs.release_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ParseJob.QUEUED)
+
+    def test_stale_job_on_its_last_attempt_is_dead_lettered(self):
+        job = jobs.enqueue_parse('file-1', 'site', 'drive')
+        for _ in range(job.max_attempts):
+            job = jobs.claim_job('worker-1')
+            self._go_stale(job)
+            with self.assertLogs('core.jobs', 'ERROR') if job.attempts == job.max_attempts else nullcontext():
+                self.assertEqual(jobs.release_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (ParseJob.DEAD, job.max_attempts))
+        self.assertIsNone(jobs.claim_job('worker-2'))
+
+    def test_token_failure_puts_the_job_back(self):
+        job = jobs.enqueue_parse('file-1', 'site', 'drive')
+        worker = jobs.Worker(concurrency=1, poll_interval=0.01, burst=True, token_provider=mock.Mock())
+        worker.token_provider.side_effect = lambda: worker.stop() or 1 / 0
+        with self.assertLogs('core.jobs', 'ERROR'):
+            worker._loop(0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (ParseJob.QUEUED, 0))
+
+    def _take_over(self, job):
+        """Let the job go stale and another worker claim it."""
+        self._go_stale(job)
+        jobs.release_stale_jobs()
+        return jobs.claim_job('worker-2')
+
+    def test_run_job_records_success(self):
+        jobs.enqueue_parse('file-1', 'site', 'drive')
+        job = jobs.claim_job('worker-1')
+        candidate = _candidate('file-1')
+        with mock.patch('core.jobs.process_file', return_value=candidate):
+            job = jobs.run_job(job, 'token')
+        self.assertEqual((job.status, job.candidate_id, job.locked_by), (ParseJob.SUCCEEDED, candidate.pk, ''))
+
+    def test_outcome_is_discarded_once_another_worker_holds_the_job(self):
+        jobs.enqueue_parse('file-1', 'site', 'drive')
+        job = jobs.claim_job('worker-1')
+        self._take_over(job)
+        with mock.patch('core.jobs.process_file', side_effect=RuntimeError('boom')), \
+                self.assertLogs('core.jobs', 'WARNING') as logs:
+            job = jobs.run_job(job, 'token')
+        self.assertIn('lost its lock', logs.output[-1])
+        self.assertEqual((job.status, job.locked_by, job.error), (ParseJob.RUNNING, 'worker-2', ''))
+
+    def test_stage_update_stops_a_job_whose_lock_moved(self):
+        jobs.enqueue_parse('file-1', 'site', 'drive')
+        job = jobs.claim_job('worker-1')
+
+        def process_file(*args, on_stage, **kwargs):
+            on_stage('download')
+            self._take_over(job)
+            on_stage('extract')
+            self.fail("on_stage should have raised")
+
+        with mock.patch('core.jobs.process_file', process_file), self.assertLogs('core.jobs', 'WARNING'):
+            job = jobs.run_job(job, 'token')
+        self.assertEqual((job.status, job.locked_by, job.stage), (ParseJob.RUNNING, 'worker-2', 'download'))
+
+    @override_settings(PARSE_JOB_HEARTBEAT_INTERVAL=0.01)
+    def test_heartbeat_refreshes_the_lock_until_it_is_lost(self):
+        job = mock.Mock(pk=1)
+        with mock.patch('core.jobs._update_held', side_effect=[True, True, False]) as update:
+            heartbeat = jobs._Heartbeat(job)
+            heartbeat.start()
+            heartbeat.join(timeout=5)
+        self.assertTrue(heartbeat.lost)
+        self.assertEqual(update.call_count, 3)
+
+    def test_cheap_is_carried_through_to_the_worker(self):
+        jobs.enqueue_parse('file-1', 'site', 'drive', cheap=True)
+        job = jobs.claim_job('worker-1')
+        with mock.patch('core.jobs.process_file', return_value=_candidate('file-1')) as process_file:
+            jobs.run_job(job, 'token')
+        self.assertIs(process_file.call_args.kwargs['cheap'], True)
+
+
+@override_settings(**APP_CREDENTIALS)
+class ParseResumeViewTests(TestCase):
+    BODY = {'file_id': 'file-1', 'site_id': 'site', 'drive_id': 'drive'}
+
+    def _post(self, **extra):
+        return self.client.post('/api/parse-resume/', {**self.BODY, **extra}, content_type='application/json',
+                                HTTP_AUTHORIZATION='Bearer user-token')
+
+    def test_queues_by_default(self):
+        response = self._post(cheap=True)
+        self.assertEqual(response.status_code, 202)
+        job = ParseJob.objects.get(pk=response.json()['job_id'])
+        self.assertEqual((job.file_id, job.cheap), ('file-1', True))
+
+    @override_settings(CLIENT_SECRET=None)
+    def test_parses_inline_with_the_callers_token_without_app_credentials(self):
+        with mock.patch('core.views.process_file', return_value=_candidate('file-1')) as process_file:
+            response = self._post(cheap=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['candidate']['file_id'], 'file-1')
+        process_file.assert_called_once_with('user-token', 'site', 'drive', 'file-1', cheap=True)
+        self.assertFalse(ParseJob.objects.exists())
+
+
+def _pdf_bytes(text):
+    with fitz.open() as doc:
+        doc.new_page().insert_text((72, 72), text)
+        return doc.tobytes()
+
+
+class PdfReaderTests(TestCase):
+    def test_reads_a_path_or_a_file(self):
+        data = _pdf_bytes('Alice Example')
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as f:
+            f.write(data)
+            f.flush()
+            self.assertIn('Alice Example', extract_text_from_pdf(f.name))
+            with open(f.name, 'rb') as file:
+                self.assertIn('Alice Example', extract_text_from_pdf(file))
+        self.assertIn('Alice Example', extract_text_from_pdf(data))
+
+    def test_large_in_memory_file_is_read_instead_of_mapped(self):
+        with mock.patch.object(extraction, 'MMAP_MIN_BYTES', 1):
+            self.assertIn('Alice Example', extract_text_from_pdf(io.BytesIO(_pdf_bytes('Alice Example'))))
+
+
+class MetadataCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @mock.patch('core.graph_utils.http_client.get')
+    def test_cached_site_id_is_scoped_to_the_token(self, get):
+        get.return_value = _graph_response({'id': 'site-1'})
+        url = 'https://contoso.sharepoint.com/sites/HR'
+
+        self.assertEqual(graph_utils.resolve_site_id('token-a', url), 'site-1')
+        self.assertEqual(graph_utils.resolve_site_id('token-a', url), 'site-1')
+        self.assertEqual(get.call_count, 1)
+
+        # Another bearer string must go to Graph itself, not read token-a's answer.
+        graph_utils.resolve_site_id('token-b', url)
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(get.call_args.kwargs['headers'], {'Authorization': 'Bearer token-b'})
+
+
+class UnparsedResumesTests(TestCase):
+    def setUp(self):
+        _candidate('full', name='Full', parsed_data={'name': 'Full'})
+        _candidate('cheap', name='Cheap', parsed_data={'name': 'Cheap', 'parse_mode': 'cheap'})
+
+    def test_cheap_candidates_are_not_parsed(self):
+        self.assertEqual(parsed_file_ids(['full', 'cheap', 'new']), {'full'})
+
+    @mock.patch('core.ingestion.list_site_resume_folder')
+    def test_cheap_candidates_are_listed_for_a_full_parse(self, list_folder):
+        list_folder.return_value = [{'id': 'full'}, {'id': 'cheap'}, {'id': 'new'}]
+        site = SharePointSite.objects.create(site_url='https://contoso.sharepoint.com/sites/HR',
+                                             site_id='site', drive_id='drive')
+        self.assertEqual([f['id'] for f in list_unparsed_resumes('token', site)], ['cheap', 'new'])
+
+
+RESUME_TEXT = "Alice Example, data engineer. " + " ".join(f"Built pipeline {i} in Python and SQL." for i in range(10))
+
+
+@mock.patch('core.resume_parser.pipeline.query_resume_llm', return_value=({'name': 'From the LLM'}, ['email']))
+class FingerprintTests(TestCase):
+    def test_too_little_text_has_no_fingerprint(self, llm):
+        self.assertIsNone(fingerprint(''))
+        self.assertIsNone(fingerprint('Scanned page 1 of 2'))
+        self.assertIsNotNone(fingerprint(RESUME_TEXT))
+
+    def test_near_identical_resume_reuses_the_earlier_parse(self, llm):
+        save_candidate('file-a', '', {'name': 'Alice Example'}, fp=fingerprint(RESUME_TEXT))
+        parsed = parse_resume_text(RESUME_TEXT + " Hobbies: chess.", fingerprint(RESUME_TEXT), 'file-b')
+        self.assertEqual(parsed['name'], 'Alice Example')
+        llm.assert_not_called()
+
+    def test_empty_resumes_are_neither_linked_nor_reused(self, llm):
+        first = save_candidate('file-a', '', {'name': 'Alice Example'}, fp=fingerprint(''))
+        second = save_candidate('file-b', '', {'name': 'Bob Example'}, fp=fingerprint(''))
+        self.assertEqual((first.canonical_id, second.canonical_id), (None, None))
+
+        self.assertEqual(parse_resume_text('', fingerprint(''), 'file-c'), {'name': 'From the LLM'})
+        llm.assert_called_once()
+
+
+class _Clock:
+    """Stands in for the time module: sleeping moves the clock instead of waiting."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    monotonic = time
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    async def asleep(self, seconds):
+        self.sleep(seconds)
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        patcher = mock.patch('core.ratelimit.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_requests_block_until_the_bucket_refills(self):
+        limiter = ratelimit.TokenBucket('graph', requests_per_minute=60, burst_seconds=2)  # 1/s, holds 2
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(limiter.acquire(), 1.0)
+        self.assertEqual(self.clock.sleeps, [1.0])
+
+        self.clock.now += 60  # refills up to the capacity, not beyond
+        self.assertEqual(limiter.snapshot()['levels'], {'requests': 2.0})
+
+    def test_request_larger_than_the_token_bucket_waits_for_a_full_bucket(self):
+        limiter = ratelimit.TokenBucket('gemini', tokens_per_minute=600, burst_seconds=2)  # 10/s, holds 20
+        limiter.acquire(tokens=15)
+        limiter.acquire(tokens=50)
+        self.assertAlmostEqual(sum(self.clock.sleeps), 1.5)
+        self.assertAlmostEqual(limiter.snapshot()['levels']['tokens'], -30)
+
+        limiter.settle(estimated=50, actual=20)
+        self.assertAlmostEqual(limiter.snapshot()['levels']['tokens'], 0)
+
+    def test_gives_up_past_max_wait(self):
+        limiter = ratelimit.TokenBucket('graph', requests_per_minute=60, burst_seconds=1)
+        limiter.acquire()
+        limiter.pause(30)
+        with self.assertRaises(ratelimit.RateLimitTimeout):
+            limiter.acquire(max_wait=5)
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(limiter.acquire(max_wait=60), 30)
+
+    def test_aacquire_waits_on_the_event_loop(self):
+        limiter = ratelimit.TokenBucket('gemini', requests_per_minute=60, burst_seconds=1)
+        with mock.patch('core.ratelimit.asyncio.sleep', self.clock.asleep):
+            self.assertEqual(asyncio.run(limiter.aacquire()), 0)
+            self.assertEqual(asyncio.run(limiter.aacquire()), 1.0)
+            with self.assertRaises(ratelimit.RateLimitTimeout):
+                limiter.pause(10)
+                asyncio.run(limiter.aacquire(max_wait=1))
+
+    @mock.patch.object(ratelimit, '_buckets', {})
+    def test_unlimited_upstream_is_not_throttled(self):
+        with override_settings(RATE_LIMITS={}):
+            self.assertIsNone(ratelimit.bucket('graph.get_drive_item'))
+            self.assertEqual(ratelimit.acquire('graph.get_drive_item'), 0.0)
+
+
+@skipIf(ratelimit.fcntl is None, "shared bucket files need fcntl")
+class SharedRateLimitStateTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'graph.json')
+
+    def _limiter(self):
+        return ratelimit.TokenBucket('graph', requests_per_minute=60, burst_seconds=2,
+                                     store=ratelimit._SharedState(self.path))
+
+    def test_missing_state_file_starts_full_and_is_shared(self):
+        first, second = self._limiter(), self._limiter()
+        first.acquire()
+        self.assertTrue(os.path.exists(self.path))
+        self.assertLess(second.snapshot()['levels']['requests'], 1.1)
+
+    def test_corrupt_state_file_is_replaced(self):
+        with open(self.path, 'w') as f:
+            f.write('{"levels": ')
+        self._limiter().acquire(max_wait=0)  # a full bucket again: no wait
+        with open(self.path) as f:
+            self.assertLess(json.load(f)['levels']['requests'], 1.1)
+
+    def test_state_directory_is_created(self):
+        directory = os.path.join(os.path.dirname(self.path), 'nested', 'limits')
+        with override_settings(RATE_LIMIT_DIR=directory):
+            store = ratelimit._store('gemini')
+        self.assertEqual(store.path, os.path.join(directory, 'gemini.json'))
+        self.assertTrue(os.path.isdir(directory))
+
+
+COMPLETE = {
+    'name': 'Alice', 'email': 'alice@example.com', 'phone': None, 'skills': ['Python'], 'projects': [],
+    'education': [], 'experience': [], 'profile_summary': 'Engineer', 'domain_classification': ['Backend Developer'],
+    'total_years_of_experience': 4,
+}
+
+
+@mock.patch('core.resume_parser.structured.query_gemini')
+class StructuredFallbackTests(TestCase):
+    def _without(self, *fields):
+        return json.dumps({k: v for k, v in COMPLETE.items() if k not in fields})
+
+    def test_missing_fields_are_requested_once(self, query_gemini):
+        query_gemini.side_effect = [
+            self._without('skills', 'total_years_of_experience'),
+            json.dumps({'skills': ['Python'], 'total_years_of_experience': 4}),
+        ]
+        parsed = structured.parse("resume text", fallback=True)
+
+        self.assertEqual(parsed, COMPLETE)
+        self.assertEqual(query_gemini.call_count, 2)
+        follow_up_schema = query_gemini.call_args.args[1]
+        self.assertEqual(sorted(follow_up_schema['properties']), ['skills', 'total_years_of_experience'])
+
+    def test_invalid_fields_count_as_missing(self, query_gemini):
+        query_gemini.side_effect = [
+            json.dumps({**COMPLETE, 'total_years_of_experience': 'four'}),
+            json.dumps({'total_years_of_experience': 4}),
+        ]
+        self.assertEqual(structured.parse("resume text", fallback=True), COMPLETE)
+
+    @override_settings(PARSE_CACHE_ENABLED=True)
+    def test_partial_parse_is_not_cached(self, query_gemini):
+        # The cross-check fills name, email and phone back in from the text, so only the raw parse shows the gap.
+        text = "Alice\nalice@example.com\n+44 20 7946 0958\nPython engineer"
+        query_gemini.side_effect = [self._without('name', 'email', 'phone'), json.dumps({})] * 2
+        parsed = pipeline.parse_resume_text(text)
+
+        self.assertTrue(structured.is_complete(parsed))
+        self.assertIsNone(parse_cache.lookup(text, pipeline.PROMPT_VERSION))
+        pipeline.parse_resume_text(text)
+        self.assertEqual(query_gemini.call_count, 4)
+
+    @override_settings(PARSE_CACHE_ENABLED=True)
+    def test_complete_parse_is_cached(self, query_gemini):
+        query_gemini.return_value = json.dumps(COMPLETE)
+        parsed = pipeline.parse_resume_text("resume text")
+
+        self.assertEqual(parse_cache.lookup("resume text", pipeline.PROMPT_VERSION), parsed)
+        self.assertEqual(pipeline.parse_resume_text("resume text"), parsed)
+        self.assertEqual(query_gemini.call_count, 1)
+
+    def test_no_follow_up_without_fallback(self, query_gemini):
+        query_gemini.return_value = self._without('skills')
+        self.assertNotIn('skills', structured.parse("resume text", fallback=False))
+        self.assertEqual(query_gemini.call_count, 1)
+
+
+class JsonRepairTests(TestCase):
+    def test_clean_json(self):
+        self.assertEqual(jsonrepair.decode('{"a": 1}'), jsonrepair.Decoded({'a': 1}, repaired=False, truncated=False))
+
+    def test_fenced_json_with_prose(self):
+        decoded = jsonrepair.decode('Here is the resume:\n```json\n{"name": "Alice", "skills": ["Go"]}\n```\nDone.')
+        self.assertEqual(decoded, jsonrepair.Decoded({'name': 'Alice', 'skills': ['Go']}, repaired=True, truncated=False))
+
+    def test_trailing_commas(self):
+        decoded = jsonrepair.decode('{"skills": ["Go", "SQL",], "name": "Alice",}')
+        self.assertEqual(decoded.value, {'skills': ['Go', 'SQL'], 'name': 'Alice'})
+        self.assertFalse(decoded.truncated)
+
+    def test_truncated_output_keeps_complete_members(self):
+        decoded = jsonrepair.decode('{"name": "Alice", "skills": ["Go", "SQL"], "profile_summary": "Builds data pip')
+        self.assertEqual(decoded, jsonrepair.Decoded({'name': 'Alice', 'skills': ['Go', 'SQL']}, repaired=True, truncated=True))
+
+    def test_truncated_inside_a_nested_value_drops_the_whole_member(self):
+        decoded = jsonrepair.decode('{"name": "Alice", "experience": [{"company": "Acme", "role": "Eng')
+        self.assertEqual(decoded.value, {'name': 'Alice'})
+        self.assertTrue(decoded.truncated)
+
+    def test_braces_inside_strings_are_not_structure(self):
+        decoded = jsonrepair.decode('{"summary": "uses {curly} and [square], brackets", "name": "Al')
+        self.assertEqual(decoded.value, {'summary': 'uses {curly} and [square], brackets'})
+
+    def test_truncated_list(self):
+        decoded = jsonrepair.decode('[{"id": 1}, {"id": 2}, {"id"', expected=list)
+        self.assertEqual(decoded.value, [{'id': 1}, {'id': 2}])
+
+    def test_nothing_recoverable(self):
+        with self.assertRaises(ValueError):
+            jsonrepair.decode('Sorry, I cannot help with that.')
+        self.assertEqual(jsonrepair.decode('{"name": "Al').value, {})
+
+
+def _resume_file(file_id):
+    return {'id': file_id, 'name': f'{file_id}.pdf', 'webUrl': f'https://contoso.sharepoint.com/{file_id}.pdf',
+            'eTag': 'v1'}
+
+
+def _llm_parse(name):
+    return {**COMPLETE, 'name': name, 'email': f'{name.lower()}@example.com'}
+
+
+@override_settings(INGEST_EXTRACT_PROCESSES=False, PARSE_CACHE_ENABLED=True)
+class IngestionPipelineTests(TestCase):
+    def setUp(self):
+        self.texts = {f'file-{n}': f"{name}\n{RESUME_TEXT.replace('Alice Example', name)}"
+                      for n, name in enumerate(['Alice', 'Bob', 'Carol'])}
+        patcher = mock.patch('core.ingestion.stream_drive_item', side_effect=self._download)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _download(self, token, site_id, drive_id, file_id):
+        if file_id == 'file-broken':
+            raise RuntimeError('boom')
+        return io.BytesIO(_pdf_bytes(self.texts[file_id]))
+
+    def _llm(self, text):
+        return _llm_parse(text.split()[0]), []
+
+    def _run(self, files, **limits):
+        limits = {'download_workers': 2, 'extract_workers': 1, 'llm_workers': 2, 'llm_batch_size': 1, **limits}
+        pipeline = IngestionPipeline('token', 'site', 'drive', **limits)
+        return {r.file_id: r for r in pipeline.run([_resume_file(f) for f in files])}
+
+    @mock.patch('core.ingestion.query_resume_llm')
+    def test_parses_every_file_and_reports_failures(self, llm):
+        llm.side_effect = self._llm
+        with self.assertLogs('core.ingestion', 'WARNING'):
+            results = self._run(['file-0', 'file-1', 'file-broken'])
+
+        self.assertEqual({f: r.status for f, r in results.items()},
+                         {'file-0': 'parsed', 'file-1': 'parsed', 'file-broken': 'failed'})
+        self.assertEqual(results['file-broken'].error, 'download: RuntimeError: boom')
+        self.assertEqual(Candidate.objects.get(pk=results['file-1'].candidate_id).name, 'Bob')
+        self.assertEqual(llm.call_count, 2)
+
+    @mock.patch('core.ingestion.query_resume_llm')
+    def test_second_run_is_served_from_the_parse_cache(self, llm):
+        llm.side_effect = self._llm
+        self._run(['file-0', 'file-1'])
+        results = self._run(['file-0', 'file-1'])
+
+        self.assertTrue(all(r.cached and r.status == 'parsed' for r in results.values()))
+        self.assertEqual(llm.call_count, 2)
+
+    @mock.patch('core.ingestion.query_resume_llm')
+    @mock.patch('core.ingestion.query_resume_llm_batch')
+    def test_short_resumes_share_an_llm_request(self, batch, llm):
+        batch.side_effect = lambda texts: ({key: self._llm(text) for key, text in texts.items()}, [])
+        results = self._run(['file-0', 'file-1', 'file-2'], llm_batch_size=3)
+
+        self.assertTrue(all(r.status == 'parsed' for r in results.values()))
+        batch.assert_called_once()
+        self.assertEqual(sorted(batch.call_args.args[0]), ['file-0', 'file-1', 'file-2'])
+        llm.assert_not_called()
+
+    @mock.patch('core.ingestion.query_resume_llm')
+    def test_cheap_mode_skips_the_llm_and_leaves_files_pending(self, llm):
+        SharePointFile.objects.create(site=_site(), file_id='file-0', name='file-0.pdf', etag='v1')
+        results = self._run(['file-0'], cheap=True)
+
+        self.assertEqual(results['file-0'].status, 'parsed')
+        self.assertEqual(Candidate.objects.get(file_id='file-0').parsed_data['parse_mode'], 'cheap')
+        self.assertTrue(SharePointFile.objects.get(file_id='file-0').needs_parse)
+        llm.assert_not_called()
+
+
+@override_settings(**APP_CREDENTIALS)
+class IngestSiteViewTests(TestCase):
+    def setUp(self):
+        self.site = _site()
+
+    def _post(self, **body):
+        return self.client.post(f'/api/sites/{self.site.pk}/ingest/', body, content_type='application/json',
+                                HTTP_AUTHORIZATION='Bearer user-token')
+
+    @mock.patch('core.views.list_unparsed_resumes', return_value=[_resume_file('file-0'), _resume_file('file-1')])
+    def test_queues_jobs_by_default(self, unparsed):
+        response = self._post(cheap=True)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['queued'], 2)
+        self.assertEqual(set(ParseJob.objects.values_list('file_id', 'cheap')), {('file-0', True), ('file-1', True)})
+
+    @mock.patch('core.views.ingest_site', return_value={'site': 1, 'total': 0})
+    def test_sync_runs_the_pipeline_in_the_request(self, ingest_site):
+        response = self._post(sync=True, llm_workers=2)
+
+        self.assertEqual(response.status_code, 200)
+        ingest_site.assert_called_once_with('user-token', self.site, delta=False, llm_workers=2)
+        self.assertFalse(ParseJob.objects.exists())
+
+    @override_settings(CLIENT_SECRET=None)
+    @mock.patch('core.views.ingest_site', return_value={'site': 1, 'total': 0})
+    def test_runs_in_the_request_without_app_credentials(self, ingest_site):
+        self.assertEqual(self._post().status_code, 200)
+        ingest_site.assert_called_once()
+
+
+class CandidateWriterTests(TestCase):
+    def _writer(self, batch_size=10):
+        return CandidateWriter(batch_size, max_delay=60)
+
+    def test_rows_are_upserted_a_batch_at_a_time(self):
+        done = []
+        writer = self._writer(batch_size=2)
+        writer.add('file-0', 'https://x/0', {'name': 'Alice'}, on_done=lambda c, e: done.append((c.name, e)))
+        self.assertFalse(Candidate.objects.exists())
+        writer.add('file-1', 'https://x/1', {'name': 'Bob'}, on_done=lambda c, e: done.append((c.name, e)))
+
+        self.assertEqual(done, [('Alice', None), ('Bob', None)])
+        self.assertEqual(len(writer), 0)
+        self.assertEqual(writer.stats['created'], 2)
+
+    def test_only_changed_fields_are_written(self):
+        writer = self._writer()
+        writer.add('file-0', 'https://x/0', {'name': 'Alice', 'total_years_of_experience': 4})
+        writer.add('file-1', 'https://x/1', {'name': 'Bob'})
+        writer.flush()
+        resume_id = Candidate.objects.get(file_id='file-1').resume_id
+
+        writer.add('file-0', 'https://x/0', {'name': 'Alice', 'total_years_of_experience': 4.0})
+        writer.add('file-1', 'https://x/1', {'name': 'Robert'})
+        with mock.patch.object(Candidate.objects, 'bulk_create', wraps=Candidate.objects.bulk_create) as bulk_create:
+            writer.flush()
+
+        bulk_create.assert_called_once()
+        self.assertTrue(bulk_create.call_args.kwargs['update_conflicts'])
+        self.assertEqual(bulk_create.call_args.kwargs['update_fields'], ['name', 'parsed_data'])
+        self.assertEqual((writer.stats['updated'], writer.stats['unchanged']), (1, 1))
+        robert = Candidate.objects.get(file_id='file-1')
+        self.assertEqual((robert.name, robert.resume_id), ('Robert', resume_id))
+
+    def test_failed_batch_is_saved_row_by_row(self):
+        done = {}
+        writer = self._writer()
+        writer.add('file-0', 'https://x/0', {'name': 'Alice'}, on_done=lambda c, e: done.update(good=(c, e)))
+        writer.add('file-1', 'https://x/1', {'name': 'Bob', 'total_years_of_experience': 'many'},
+                   on_done=lambda c, e: done.update(bad=(c, e)))
+        with self.assertLogs('core.persistence', 'WARNING'):
+            writer.flush()
+
+        self.assertEqual(done['good'][0].name, 'Alice')
+        self.assertIsNone(done['good'][1])
+        self.assertIsNone(done['bad'][0])
+        self.assertIsNotNone(done['bad'][1])
+        self.assertEqual(writer.stats['failed'], 1)
+        self.assertEqual(list(Candidate.objects.values_list('file_id', flat=True)), ['file-0'])
+
+    def test_unmarked_rows_stay_pending(self):
+        site = _site()
+        for file_id in ('file-0', 'file-1'):
+            SharePointFile.objects.create(site=site, file_id=file_id, name=f'{file_id}.pdf', etag='v2')
+        writer = self._writer()
+        writer.add('file-0', 'https://x/0', {'name': 'Alice'}, etag='v2')
+        writer.add('file-1', 'https://x/1', {'name': 'Bob', 'parse_mode': 'cheap'}, mark=False)
+        writer.flush()
+
+        self.assertEqual(dict(SharePointFile.objects.values_list('file_id', 'needs_parse')),
+                         {'file-0': False, 'file-1': True})
@@ -1,14 +1,34 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('api/get-site-id/', views.get_site_id, name='get_site_id'),
     path('api/get-drives/', views.get_drives, name='get_drives'),
     path('api/fetch-resumes/', views.fetch_resumes, name='fetch_resumes'),
     path('api/parse-resume/', views.parse_resume, name='parse_resume'),
+    path('api/parse-jobs/', views.parse_jobs, name='parse_jobs'),
+    path('api/parse-jobs/<int:pk>/', views.parse_job_status, name='parse_job_status'),
+    path('api/parse-jobs/<int:pk>/retry/', views.retry_parse_job, name='retry_parse_job'),
+    path('api/parse-cache/', views.parse_cache_stats, name='parse_cache_stats'),
+    path('api/http-metrics/', views.http_metrics, name='http_metrics'),
+    path('metrics', views.prometheus_metrics, name='prometheus_metrics'),
     path('api/search-candidates/', views.search_candidates, name='search_candidates'),
+    path('api/search/', views.full_text_search, name='full_text_search'),
+    path('api/match/', views.match_candidates, name='match_candidates'),
+    path('api/jobs/', views.job_openings, name='job_openings'),
+    path('api/jobs/<int:pk>/', views.job_opening, name='job_opening'),
+    path('api/jobs/<int:pk>/rescore/', views.rescore_job_opening, name='rescore_job_opening'),
+    path('api/jobs/<int:pk>/shortlist/', views.job_shortlist, name='job_shortlist'),
     path('api/candidates/', views.list_candidates, name='list_candidates'),
+    path('api/candidates/export/', views.export_candidates, name='export_candidates'),
+    path('api/candidates/duplicates/', views.duplicate_clusters, name='duplicate_clusters'),
     path('api/sites/', views.sites, name='sites'),
     path('api/sites/<int:pk>/resumes/', views.fetch_site_resumes, name='site_resumes'),
+    path('api/sites/<int:pk>/sync/', views.sync_site_resumes, name='site_sync'),
+    path('api/sites/<int:pk>/ingest/', views.ingest_site_resumes, name='site_ingest'),
+    path('api/async/get-site-id/', async_views.get_site_id, name='async_get_site_id'),
+    path('api/async/get-drives/', async_views.get_drives, name='async_get_drives'),
+    path('api/async/fetch-resumes/', async_views.fetch_resumes, name='async_fetch_resumes'),
+    path('api/async/sites/<int:pk>/resumes/', async_views.fetch_site_resumes, name='async_site_resumes'),
 ]
 
@@ -1,8 +1,6 @@
-import PyPDF2
+from core.resume_parser.extraction import extract_pdf
+
 
 def extract_text_from_pdf(file):
-    pdf = PyPDF2.PdfReader(file)
-    text = ""
-    for page in pdf.pages:
-        text += page.extract_text()
-    return text
+    """Text of a PDF given as a path, bytes or a binary file, as PyPDF2.PdfReader accepted."""
+    return extract_pdf(file)
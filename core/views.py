@@ -1,18 +1,23 @@
+import csv
+import itertools
+import json
 import logging
-import requests
-import fitz  # PyMuPDF
-from io import BytesIO
+import time
+from decimal import Decimal, InvalidOperation
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from django.conf import settings
-from .graph_utils import download_file
-import re
-from .models import SharePointSite, Candidate
-from django.db.models import Q
-import json
-from .models import Candidate
-from django.utils.crypto import get_random_string
-from docx import Document  # python-docx for .docx
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from . import dedupe, embeddings, http_client, metrics, pagination, scoring, search_index
+from .graph_utils import list_drives, list_resume_folder, resolve_site_id, select_drive
+from .ingestion import ingest_site, list_unparsed_resumes
+from .jobs import enqueue_parse, job_payload, queue_available, requeue
+from .models import SharePointSite, Candidate, JobOpening, ParseJob
+from .resume_parser import cache as parse_cache
+from .sync import pending_files, sync_site
+from .taxonomy import filter_candidates
+from .resume_parser.pipeline import UnsupportedFileType, candidate_payload, process_file
 
 logger = logging.getLogger(__name__)
 
@@ -28,23 +33,10 @@ def get_site_id(request):
         if not site_url:
             return Response({"error": "No site URL provided"}, status=400)
 
-        # Extract hostname and path
-        if '://' in site_url:
-            site_url = site_url.split('://')[1]
-        parts = site_url.split('/')
-        hostname = parts[0]
-        path = '/' + '/'.join(parts[1:])
-
-        url = f'https://graph.microsoft.com/v1.0/sites/{hostname}:{path}'
-        headers = {'Authorization': f'Bearer {access_token}'}
-
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        site_data = response.json()
-        return Response({"site_id": site_data.get('id')})
-    except Exception as e:
+        return Response({"site_id": resolve_site_id(access_token, site_url)})
+    except Exception:
         logger.exception("Error fetching site ID")
-        return Response({"error": str(e)}, status=500)
+        return Response({"error": "Could not fetch the site ID; see the server log"}, status=500)
 
 @api_view(['POST'])
 def get_drives(request):
@@ -58,16 +50,10 @@ def get_drives(request):
         if not site_id:
             return Response({"error": "No site ID provided"}, status=400)
 
-        url = f'https://graph.microsoft.com/v1.0/sites/{site_id}/drives'
-        headers = {'Authorization': f'Bearer {access_token}'}
-
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        drives = response.json().get('value', [])
-        return Response({"drives": drives})
-    except Exception as e:
+        return Response({"drives": list_drives(access_token, site_id)})
+    except Exception:
         logger.exception("Error fetching drives")
-        return Response({"error": str(e)}, status=500)
+        return Response({"error": "Could not fetch the drives; see the server log"}, status=500)
 
 @api_view(['POST'])
 def fetch_resumes(request):
@@ -76,38 +62,13 @@ def fetch_resumes(request):
         site_id = request.data.get('site_id')
         drive_id = request.data.get('drive_id')
 
-        # Step 1: Get the "Resume" folder metadata
-        resume_folder_url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives/{drive_id}/root:/Resume"
-        folder_response = requests.get(resume_folder_url, headers={
-            'Authorization': f'Bearer {access_token}'
-        })
-        folder_response.raise_for_status()
-        folder_data = folder_response.json()
-        folder_id = folder_data['id']
-
-        # Step 2: List children (resumes) inside the "Resume" folder
-        files_url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives/{drive_id}/items/{folder_id}/children"
-        files_response = requests.get(files_url, headers={
-            'Authorization': f'Bearer {access_token}'
-        })
-        files_response.raise_for_status()
-        files = files_response.json().get('value', [])
+        files = list_resume_folder(access_token, site_id, drive_id)
         return Response(files)
 
-    except Exception as e:
-        return Response({"error": str(e)}, status=500)
-
+    except Exception:
+        logger.exception("Error fetching resumes")
+        return Response({"error": "Could not fetch the resumes; see the server log"}, status=500)
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> str:
-    text = ""
-    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-        for page in doc:
-            text += page.get_text()
-    return text
-
-def extract_text_from_docx(docx_bytes: bytes) -> str:
-    doc = Document(BytesIO(docx_bytes))
-    return "\n".join(p.text for p in doc.paragraphs)
 
 @api_view(['POST'])
 def parse_resume(request):
@@ -122,178 +83,446 @@ def parse_resume(request):
         return Response({"error": "No authorization header"}, status=400)
     token = auth.split(' ')[1]
 
-    try:
-        # 1) Fetch metadata
-        meta_url = (
-            f"https://graph.microsoft.com/v1.0/sites/{site_id}"
-            f"/drives/{drive_id}/items/{file_id}"
-            "?$select=name,webUrl"
-        )
-        headers = {'Authorization': f'Bearer {token}'}
-        meta_resp = requests.get(meta_url, headers=headers)
-        meta_resp.raise_for_status()
-        meta = meta_resp.json()
-        filename = meta.get('name', '')
-        resume_url = meta.get('webUrl', '')
-        ext = filename.rsplit('.', 1)[-1].lower()
-
-        # 2) Download content
-        dl_url = (
-            f"https://graph.microsoft.com/v1.0/sites/{site_id}"
-            f"/drives/{drive_id}/items/{file_id}/content"
-        )
-        dl_resp = requests.get(dl_url, headers=headers)
-        dl_resp.raise_for_status()
-        content = dl_resp.content
-
-        # 3) Extract text from resume
-        if ext == 'pdf':
-            resume_text = extract_text_from_pdf(content)
-        elif ext in ('docx', 'doc'):
-            resume_text = extract_text_from_docx(content)
-        else:
-            return Response({"error": f"Unsupported file type: .{ext}"}, status=400)
-
-        # 4) Enhanced LLM Prompt for Parsing Resume
-        prompt = f"""
-You are a highly advanced resume parsing assistant. 
-Parse the following resume text and generate a structured JSON object with the following fields:
-
-1. "name": The full name of the candidate
-2. "email": The email address of the candidate
-3. "phone": The contact number of the candidate
-4. "skills": A flat list of all technical and professional skills (e.g., ["Python", "AWS", "React"])
-5. "projects": A list of projects with:
-   - "name": The project name
-   - "description": A brief description of the project
-6. "education": A list of education details with:
-   - "degree": Name of the degree
-   - "institution": Educational institution
-   - "duration": Duration of the course
-7. "experience": A list of work experiences with:
-   - "company": Company name
-   - "role": Job role
-   - "start_date": Start date
-   - "end_date": End date
-   - "description": Role description
-8. "profile_summary": A brief professional summary if available
-9. "domain_classification": A list of one or more roles such as:
-   - "Frontend Developer", "Backend Developer", "Data Engineer", "Full Stack Developer", "DevOps Engineer", "ML Engineer", "Database Administrator"
-10. "total_years_of_experience": A numeric value representing the total years of professional experience
-
-Respond ONLY with a well-formatted JSON object.
-
-Resume text:
-\"\"\"
-{resume_text}
-\"\"\"
-"""
-
-        # 5) Send to LLM API
-        llm_resp = requests.post(
-            f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={settings.GEMINI_API_KEY}",
-            json={"contents": [{"parts": [{"text": prompt}]}]},
-            headers={'Content-Type': 'application/json'}
-        )
-        llm_json = llm_resp.json()
-        raw_text = llm_json['candidates'][0]['content']['parts'][0]['text'].strip()
-        json_str = re.sub(r'^```json|```$', '', raw_text, flags=re.MULTILINE).strip()
-        parsed = json.loads(json_str)
-
-        # 6) Normalize skills and calculate experience
-        parsed['skills'] = list(set(parsed.get('skills', [])))  # Remove duplicates
-
-        # if 'total_years_of_experience' not in parsed or not parsed['total_years_of_experience']:
-        #     parsed['total_years_of_experience'] = calculate_experience(parsed.get('experience', []))
-
-        # 7) Prepare candidate data for database
-        defaults = {
-            'name': parsed.get('name', ''),
-            'email': parsed.get('email', ''),
-            'phone': parsed.get('phone', ''),
-            'profile_summary': parsed.get('profile_summary', ''),
-            'parsed_data': parsed,
-            'resume_url': resume_url,
-            'skills': parsed.get('skills', []),
-            'domain_classification': parsed.get('domain_classification', []),
-            'total_years_of_experience': parsed.get('total_years_of_experience', 0)
-        }
-
-        # 8) Get or create candidate record
-        candidate, created = Candidate.objects.get_or_create(
-            file_id=file_id,
-            defaults={'resume_id': get_random_string(12), **defaults}
-        )
-        if not created:
-            for field, val in defaults.items():
-                setattr(candidate, field, val)
-            candidate.save()
-
-        # 9) Return complete response with additional fields
-        return Response({
-            "candidate": {
-                "id": candidate.id,
-                "resume_id": candidate.resume_id,
-                "file_id": candidate.file_id,
-                "name": candidate.name,
-                "email": candidate.email,
-                "phone": candidate.phone,
-                "profile_summary": candidate.profile_summary,
-                "skills": candidate.skills,
-                "domain_classification": candidate.domain_classification,
-                "total_years_of_experience": candidate.total_years_of_experience,
-                "parsed_data": candidate.parsed_data,
-                "resume_url": candidate.resume_url,
-            }
-        })
+    cheap = bool(request.data.get('cheap'))
+    # Without app credentials no worker can run the job, so parse inline with the caller's token.
+    if not request.data.get('sync') and queue_available():
+        with metrics.span('enqueue'):
+            job = enqueue_parse(file_id, site_id, drive_id, cheap=cheap)
+        return Response({"job_id": job.id, "status": job.status}, status=202)
 
-    except Exception as e:
+    try:
+        candidate = process_file(token, site_id, drive_id, file_id, cheap=cheap)
+        return Response({"candidate": candidate_payload(candidate)})
+    except UnsupportedFileType as e:
+        return Response({"error": str(e)}, status=400)
+    except Exception:
         logger.exception("Unexpected error in parse_resume")
-        return Response({"error": str(e)}, status=500)
+        return Response({"error": "Could not parse the resume; see the server log"}, status=500)
+
+
+@api_view(['GET'])
+def parse_jobs(request):
+    """List parse jobs, newest first; ?status=dead lists the dead-letter queue."""
+    qs = ParseJob.objects.select_related('candidate').order_by('-id')
+    status = request.GET.get('status')
+    if status:
+        qs = qs.filter(status=status)
+    try:
+        limit = min(int(request.GET.get('limit', 100)), 1000)
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=400)
+    return Response({"results": [job_payload(j) for j in qs[:limit]]})
+
+
+@api_view(['GET'])
+def parse_job_status(request, pk):
+    try:
+        job = ParseJob.objects.select_related('candidate').get(pk=pk)
+    except ParseJob.DoesNotExist:
+        return Response({"error": "Job not found"}, status=404)
+    return Response(job_payload(job))
+
+
+@api_view(['POST'])
+def retry_parse_job(request, pk):
+    """Send a dead-lettered job back to the queue."""
+    try:
+        job = ParseJob.objects.get(pk=pk)
+    except ParseJob.DoesNotExist:
+        return Response({"error": "Job not found"}, status=404)
+    if job.status != ParseJob.DEAD:
+        return Response({"error": f"Only dead jobs can be retried (status is {job.status})"}, status=400)
+    return Response(job_payload(requeue(job)))
+
+
+@api_view(['GET'])
+def parse_cache_stats(request):
+    """Hit/miss counters and size of the LLM parse cache."""
+    return Response(parse_cache.stats())
+
+
+@api_view(['GET'])
+def http_metrics(request):
+    """Per-endpoint latency and retry counters of the shared HTTP client."""
+    return Response(http_client.metrics())
+
+
+def prometheus_metrics(request):
+    """Counters and histograms of this process in the Prometheus text format (see core.metrics)."""
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 @api_view(['GET'])
 def search_candidates(request):
-    keyword = request.GET.get("keyword", "").lower()
-    if not keyword:
-        return Response({"error": "Keyword is required"}, status=400)
+    """
+    Search by skills, domain and experience using the indexed Skill/Domain tables.
 
-    qs = Candidate.objects.filter(Q(parsed_data__icontains=keyword))
+    Query params: keyword (substring of a skill), skills (comma-separated),
+    match (all|any, default all), domain (comma-separated), min_experience, limit.
+    """
+    keyword = request.GET.get("keyword", "").strip()
+    skills = [s for s in request.GET.get("skills", "").split(",") if s.strip()]
+    domains = [d for d in request.GET.get("domain", "").split(",") if d.strip()]
+    match = request.GET.get("match", "all")
+    if not (keyword or skills or domains or request.GET.get("min_experience")):
+        return Response({"error": "Keyword is required"}, status=400)
+    if match not in ("all", "any"):
+        return Response({"error": "match must be 'all' or 'any'"}, status=400)
+    try:
+        min_experience = request.GET.get("min_experience")
+        min_experience = Decimal(min_experience) if min_experience else None
+        limit = min(int(request.GET.get("limit", 100)), 1000)
+    except (InvalidOperation, ValueError):
+        return Response({"error": "min_experience and limit must be numeric"}, status=400)
+
+    qs = filter_candidates(
+        Candidate.objects.all(), skills=skills, match=match, keyword=keyword,
+        domains=domains, min_experience=min_experience,
+    ).defer('parsed_data').order_by('-total_years_of_experience', 'id')
+
+    with metrics.span('db.search'):
+        rows = list(qs[:limit])
     results = []
-    for c in qs:
-        pd = c.parsed_data or {}
+    for c in rows:
         results.append({
             "id":               c.id,
             "name":             c.name,
             "email":            c.email,
             "phone":            c.phone,
             "resume_url":       c.resume_url,
-            "skills":           pd.get("skills", {}),
-            "profile_summary":  pd.get("profile_summary", "") or c.profile_summary,
+            "skills":           c.skills,
+            "profile_summary":  c.profile_summary,
+            "domain_classification": c.domain_classification,
+            "total_years_of_experience": c.total_years_of_experience,
         })
     return Response({"results": results})
 
 @api_view(['GET'])
-def list_candidates(request):
+def full_text_search(request):
     """
-    Return all persisted candidates with basic info.
+    Ranked full-text search over summaries, skills, experience and projects.
+
+    Query params: q, match (any|all, default any), page, page_size.
     """
-    candidates = Candidate.objects.all()
-    data = []
-    for c in candidates:
-        data.append({
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return Response({"error": "q is required"}, status=400)
+    match = request.GET.get("match", "any")
+    if match not in ("all", "any"):
+        return Response({"error": "match must be 'all' or 'any'"}, status=400)
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+        page_size = min(max(int(request.GET.get("page_size", 20)), 1), 100)
+    except ValueError:
+        return Response({"error": "page and page_size must be integers"}, status=400)
+
+    try:
+        with metrics.span('search.fulltext'):
+            total, hits = search_index.search(query, page=page, page_size=page_size, match=match)
+    except search_index.SearchNotSupported as e:
+        return Response({"error": str(e)}, status=501)
+
+    with metrics.span('db.load'):
+        candidates = Candidate.objects.defer('parsed_data').in_bulk([cid for cid, _, _ in hits])
+    results = []
+    for cid, score, snippet in hits:
+        c = candidates.get(cid)
+        if c is None:
+            continue
+        results.append({
+            "id":               c.id,
+            "name":             c.name,
+            "email":            c.email,
+            "resume_url":       c.resume_url,
+            "skills":           c.skills,
+            "domain_classification": c.domain_classification,
+            "total_years_of_experience": c.total_years_of_experience,
+            "score":            round(score, 4),
+            "snippet":          snippet,
+        })
+    return Response({"query": query, "page": page, "page_size": page_size, "total": total, "results": results})
+
+
+@api_view(['POST'])
+def match_candidates(request):
+    """
+    Rank candidates against a job description by embedding similarity.
+
+    Body: {"job_description": "...", "k": 10}. Scores are cosine similarities.
+    """
+    text = (request.data.get("job_description") or "").strip()
+    if not text:
+        return Response({"error": "job_description is required"}, status=400)
+    try:
+        k = min(max(int(request.data.get("k", 10)), 1), 100)
+    except (TypeError, ValueError):
+        return Response({"error": "k must be an integer"}, status=400)
+
+    started = time.perf_counter()
+    with metrics.span('embeddings.match'):
+        hits = embeddings.match(text, k)
+    with metrics.span('db.load'):
+        candidates = Candidate.objects.defer('parsed_data').in_bulk([cid for cid, _ in hits])
+    embeddings.forget([cid for cid, _ in hits if cid not in candidates])
+    results = []
+    for cid, score in hits:
+        c = candidates.get(cid)
+        if c is None:
+            continue
+        results.append({
+            "id":               c.id,
+            "name":             c.name,
+            "email":            c.email,
+            "resume_url":       c.resume_url,
+            "skills":           c.skills,
+            "domain_classification": c.domain_classification,
+            "total_years_of_experience": c.total_years_of_experience,
+            "score":            round(score, 4),
+        })
+    return Response({
+        "encoder": embeddings.get_encoder().name,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        "results": results,
+    })
+
+
+@api_view(['GET', 'POST'])
+def job_openings(request):
+    """List job openings or create one (its candidates are scored straight away)."""
+    if request.method == 'GET':
+        qs = JobOpening.objects.order_by('-id')
+        if request.GET.get('active') is not None:
+            qs = qs.filter(is_active=request.GET['active'].lower() in ('1', 'true', 'yes'))
+        return Response({"results": [scoring.opening_payload(j) for j in qs]})
+
+    try:
+        fields = scoring.clean_job_data(request.data)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    job = JobOpening.objects.create(**fields)
+    scored = scoring.score_job(job)
+    return Response({**scoring.opening_payload(job), "scored": scored}, status=201)
+
+
+@api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
+def job_opening(request, pk):
+    try:
+        job = JobOpening.objects.get(pk=pk)
+    except JobOpening.DoesNotExist:
+        return Response({"error": "Job opening not found"}, status=404)
+
+    if request.method == 'GET':
+        return Response(scoring.opening_payload(job))
+    if request.method == 'DELETE':
+        job.delete()
+        return Response(status=204)
+
+    try:
+        fields = scoring.clean_job_data(request.data, partial=request.method == 'PATCH', instance=job)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    # Inactive openings are skipped when new candidates are scored, so reactivating one rescores it too.
+    rescore = (any(getattr(job, k) != v for k, v in fields.items() if k in scoring.SCORED_FIELDS)
+               or (fields.get('is_active') and not job.is_active))
+    for key, value in fields.items():
+        setattr(job, key, value)
+    # Only the edited fields: a full save would write back a stale shortlist_version.
+    job.save(update_fields=[*fields, 'updated_at'])
+    payload = scoring.opening_payload(job)
+    if rescore:
+        payload["scored"] = scoring.score_job(job)
+    return Response(payload)
+
+
+@api_view(['POST'])
+def rescore_job_opening(request, pk):
+    try:
+        job = JobOpening.objects.get(pk=pk)
+    except JobOpening.DoesNotExist:
+        return Response({"error": "Job opening not found"}, status=404)
+    return Response({"id": job.id, "scored": scoring.score_job(job)})
+
+
+@api_view(['GET'])
+def job_shortlist(request, pk):
+    """
+    Best-scoring candidates for a job opening, read from the precomputed scores.
+
+    Query params: limit (default 20, max 200), min_score (0..1).
+    """
+    try:
+        job = JobOpening.objects.get(pk=pk)
+    except JobOpening.DoesNotExist:
+        return Response({"error": "Job opening not found"}, status=404)
+    try:
+        limit = min(max(int(request.GET.get("limit", 20)), 1), 200)
+        min_score = float(request.GET.get("min_score", 0))
+    except ValueError:
+        return Response({"error": "limit and min_score must be numbers"}, status=400)
+
+    with metrics.span('shortlist'):
+        rows = scoring.shortlist(job, limit=limit, min_score=min_score)
+    with metrics.span('db.load'):
+        candidates = Candidate.objects.defer('parsed_data').in_bulk([r['candidate_id'] for r in rows])
+    results = []
+    for row in rows:
+        c = candidates.get(row['candidate_id'])
+        if c is None:
+            continue
+        results.append({
             "id":               c.id,
             "name":             c.name,
             "email":            c.email,
-            "phone":            c.phone,
             "resume_url":       c.resume_url,
-            "skills":           c.skills,   # Directly from the model
-            "profile_summary":  c.profile_summary,  # Directly from the model
-            "domain_classification": c.domain_classification,  # Directly from the model
-            "total_years_of_experience": c.total_years_of_experience,  # Directly from the model
-            "parsed_data":      c.parsed_data
+            "skills":           c.skills,
+            "domain_classification": c.domain_classification,
+            "total_years_of_experience": c.total_years_of_experience,
+            "score":            round(row['score'], 4),
+            "required_matched": row['required_matched'],
+            "preferred_matched": row['preferred_matched'],
+            "domain_match":     row['domain_match'],
+            "experience_fit":   row['experience_fit'],
         })
-    return Response(data)
+    return Response({"job": scoring.opening_payload(job), "results": results})
+
+
+CANDIDATE_FIELDS = (
+    "id", "resume_id", "file_id", "name", "email", "phone", "resume_url", "skills",
+    "profile_summary", "domain_classification", "total_years_of_experience", "parsed_data", "canonical_id",
+)
+DEFAULT_LIST_FIELDS = (
+    "id", "name", "email", "phone", "resume_url", "skills", "profile_summary",
+    "domain_classification", "total_years_of_experience",
+)
+# What list_candidates returned, as a bare list, before it was paginated.
+LEGACY_LIST_FIELDS = (*DEFAULT_LIST_FIELDS, "parsed_data")
+SORT_FIELDS = ("id", "name", "total_years_of_experience")
+
+
+def _requested_fields(request, default=DEFAULT_LIST_FIELDS):
+    raw = request.GET.get("fields")
+    if not raw:
+        return list(default)
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in CANDIDATE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+@api_view(['GET'])
+def list_candidates(request):
+    """
+    Return one page of persisted candidates.
+
+    Query params: fields (comma-separated projection; parsed_data is only
+    loaded when listed), sort (id, name or total_years_of_experience, prefix
+    with "-" for descending), page_size (max 500) and cursor (next_cursor
+    of the previous page).
+
+    Pages ({"results", "next_cursor"}) are only returned when page_size or
+    cursor is given; without either, every candidate comes back as a bare
+    list, as before pagination, so existing clients keep working.
+    """
+    paginated = "page_size" in request.GET or "cursor" in request.GET
+    try:
+        fields = _requested_fields(request, DEFAULT_LIST_FIELDS if paginated else LEGACY_LIST_FIELDS)
+        page_size = min(max(int(request.GET.get("page_size", 50)), 1), 500)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    sort = request.GET.get("sort", "id")
+    descending = sort.startswith("-")
+    sort_field = sort.lstrip("-")
+    if sort_field not in SORT_FIELDS:
+        return Response({"error": f"sort must be one of {', '.join(SORT_FIELDS)}"}, status=400)
+
+    qs = pagination.order_queryset(Candidate.objects.all(), sort_field, descending)
+    if not paginated:
+        with metrics.span('db.page'):
+            return Response(list(qs.values(*fields)))
+    cursor = request.GET.get("cursor")
+    if cursor:
+        try:
+            value, pk = pagination.decode_cursor(cursor)
+        except pagination.InvalidCursor as e:
+            return Response({"error": str(e)}, status=400)
+        qs = pagination.after_cursor(qs, sort_field, descending, value, pk)
+
+    with metrics.span('db.page'):
+        rows = list(qs.values(*dict.fromkeys([*fields, "id", sort_field]))[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = pagination.encode_cursor(rows[-1][sort_field], rows[-1]["id"])
+
+    data = [{f: row[f] for f in fields} for row in rows]
+    return Response({"results": data, "next_cursor": next_cursor})
+
+
+@api_view(['GET'])
+def duplicate_clusters(request):
+    """
+    Candidates linked as duplicates of one another (see core.dedupe), one
+    cluster per canonical candidate, oldest first.
+
+    Query params: page_size (max 200) and cursor (next_cursor of the previous page).
+    """
+    try:
+        page_size = min(max(int(request.GET.get("page_size", 50)), 1), 200)
+        after = int(request.GET.get("cursor", 0))
+    except ValueError:
+        return Response({"error": "page_size and cursor must be integers"}, status=400)
+    clusters, next_cursor = dedupe.clusters(limit=page_size, after=after)
+    return Response({"results": clusters, "next_cursor": next_cursor})
+
+
+class _Echo:
+    """File-like object whose write() just hands the value back, for csv.writer."""
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, list) and all(isinstance(v, str) for v in value):
+        return "; ".join(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+    return "" if value is None else value
+
+
+def export_candidates(request):
+    """
+    Stream every candidate as NDJSON (default) or CSV with constant memory.
+
+    Query params: format (ndjson|csv), fields (same projection as list_candidates).
+    """
+    if request.method != 'GET':
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+    export_format = request.GET.get("format", "ndjson")
+    if export_format not in ("ndjson", "csv"):
+        return JsonResponse({"error": "format must be 'ndjson' or 'csv'"}, status=400)
+    try:
+        fields = _requested_fields(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    rows = Candidate.objects.order_by("id").values_list(*fields).iterator(chunk_size=2000)
+
+    if export_format == "csv":
+        writer = csv.writer(_Echo())
+        stream = itertools.chain(
+            [writer.writerow(fields)],
+            (writer.writerow([_csv_value(v) for v in row]) for row in rows),
+        )
+        response = StreamingHttpResponse(stream, content_type="text/csv")
+        response["Content-Disposition"] = 'attachment; filename="candidates.csv"'
+        return response
+
+    stream = (json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + "\n" for row in rows)
+    response = StreamingHttpResponse(stream, content_type="application/x-ndjson")
+    response["Content-Disposition"] = 'attachment; filename="candidates.ndjson"'
+    return response
 
 
 @api_view(['GET', 'POST'])
@@ -305,57 +534,45 @@ def sites(request):
     token = auth_header.split(' ')[1]
 
     if request.method == 'GET':
-        qs = SharePointSite.objects.all()
-        data = [
-            {
-                "id": s.id,
-                "site_url": s.site_url,
-                "site_id": s.site_id,
-                "drive_id": s.drive_id
-            }
-            for s in qs
-        ]
-        return Response(data)
+        return Response([_site_payload(s) for s in SharePointSite.objects.all()])
 
     # POST: add new site
-    site_url = request.data.get('site_url')
+    site_url = (request.data.get('site_url') or '').strip().rstrip('/')
     if not site_url:
         return Response({"error": "site_url required"}, status=400)
+    drive_name = request.data.get('drive_name') or ''
+
+    # Site ids and drive lists come from the Graph metadata cache.
+    try:
+        site_id = resolve_site_id(token, site_url)
+        drive = select_drive(list_drives(token, site_id), drive_name)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
 
-    # 1) Fetch site_id
-    # reuse your logic from get_site_id
-    if '://' in site_url:
-        host_and_path = site_url.split('://')[1]
-    else:
-        host_and_path = site_url
-    parts = host_and_path.split('/')
-    hostname = parts[0]
-    path = '/' + '/'.join(parts[1:])
-    url = f'https://graph.microsoft.com/v1.0/sites/{hostname}:{path}'
-    headers = {'Authorization': f'Bearer {token}'}
-    resp = requests.get(url, headers=headers); resp.raise_for_status()
-    site_data = resp.json()
-    site_id = site_data['id']
-
-    # 2) Fetch drives and pick the first one
-    drives_url = f'https://graph.microsoft.com/v1.0/sites/{site_id}/drives'
-    drives = requests.get(drives_url, headers=headers).json().get('value', [])
-    if not drives:
-        return Response({"error": "No drives found"}, status=400)
-    drive_id = drives[0]['id']
-
-    # 3) Save
     site_obj, created = SharePointSite.objects.get_or_create(
         site_url=site_url,
-        defaults={"site_id": site_id, "drive_id": drive_id}
+        defaults={"site_id": site_id, "drive_id": drive['id'], "drive_name": drive.get('name') or ''}
     )
+    if not created and drive_name and site_obj.drive_id != drive['id']:
+        # Switching libraries invalidates everything derived from the old drive.
+        site_obj.site_id = site_id
+        site_obj.drive_id = drive['id']
+        site_obj.drive_name = drive.get('name') or ''
+        site_obj.resume_folder_id = ''
+        site_obj.delta_link = ''
+        site_obj.save(update_fields=['site_id', 'drive_id', 'drive_name', 'resume_folder_id', 'delta_link'])
 
-    return Response({
-        "id": site_obj.id,
-        "site_url": site_obj.site_url,
-        "site_id": site_obj.site_id,
-        "drive_id": site_obj.drive_id
-    })
+    return Response(_site_payload(site_obj))
+
+
+def _site_payload(site):
+    return {
+        "id": site.id,
+        "site_url": site.site_url,
+        "site_id": site.site_id,
+        "drive_id": site.drive_id,
+        "drive_name": site.drive_name,
+    }
 
 
 @api_view(['GET'])
@@ -371,25 +588,78 @@ def fetch_site_resumes(request, pk):
     except SharePointSite.DoesNotExist:
         return Response({"error": "Site not found"}, status=404)
 
-    # 1) Locate the 'Resume' folder
-    resume_folder_url = (
-        f"https://graph.microsoft.com/v1.0/sites/{site.site_id}"
-        f"/drives/{site.drive_id}/root:/Resume"
-    )
-    headers = {'Authorization': f'Bearer {token}'}
-    folder = requests.get(resume_folder_url, headers=headers)
-    folder.raise_for_status()
-    folder_id = folder.json()['id']
-
-    # 2) List children
-    children_url = (
-        f"https://graph.microsoft.com/v1.0/sites/{site.site_id}"
-        f"/drives/{site.drive_id}/items/{folder_id}/children"
-    )
-    files = requests.get(children_url, headers=headers).json().get('value', [])
+    try:
+        if request.GET.get('sync') == 'delta':
+            sync_site(token, site)
+            return Response(pending_files(site))
+        return Response(list_unparsed_resumes(token, site))
+    except Exception:
+        logger.exception("Error listing resumes for site %s", pk)
+        return Response({"error": "Could not list the site's resumes; see the server log"}, status=500)
+
+
+@api_view(['POST'])
+def sync_site_resumes(request, pk):
+    """Incrementally sync the site's Resume folder via Graph delta queries."""
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return Response({"error": "No authorization header"}, status=400)
+    token = auth_header.split(' ')[1]
+
+    try:
+        site = SharePointSite.objects.get(pk=pk)
+    except SharePointSite.DoesNotExist:
+        return Response({"error": "Site not found"}, status=404)
+
+    if request.data.get('reset'):
+        site.delta_link = ''
+
+    try:
+        return Response(sync_site(token, site))
+    except Exception:
+        logger.exception("Error syncing site %s", pk)
+        return Response({"error": "Could not sync the site; see the server log"}, status=500)
 
-    # 3) Filter out already parsed
-    parsed_ids = Candidate.objects.values_list('file_id', flat=True)
-    unparsed = [f for f in files if f['id'] not in parsed_ids]
 
-    return Response(unparsed)
+@api_view(['POST'])
+def ingest_site_resumes(request, pk):
+    """
+    Queue a parse job for every unparsed resume of a saved site, or with
+    ``sync`` (or without app credentials for the workers) parse them here
+    through the concurrent pipeline.
+    """
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return Response({"error": "No authorization header"}, status=400)
+    token = auth_header.split(' ')[1]
+
+    try:
+        site = SharePointSite.objects.get(pk=pk)
+    except SharePointSite.DoesNotExist:
+        return Response({"error": "Site not found"}, status=404)
+
+    limits = {}
+    for key in ('download_workers', 'extract_workers', 'llm_workers', 'save_batch_size', 'llm_batch_size'):
+        if request.data.get(key) is not None:
+            try:
+                limits[key] = max(1, int(request.data[key]))
+            except (TypeError, ValueError):
+                return Response({"error": f"{key} must be an integer"}, status=400)
+
+    if request.data.get('cheap') is not None:
+        limits['cheap'] = bool(request.data['cheap'])
+
+    try:
+        if not request.data.get('sync') and queue_available():
+            if request.data.get('delta'):
+                sync_site(token, site)
+                files = pending_files(site)
+            else:
+                files = list_unparsed_resumes(token, site)
+            cheap = limits.get('cheap', settings.INGEST_CHEAP_MODE)
+            jobs = [enqueue_parse(f['id'], site.site_id, site.drive_id, cheap=cheap) for f in files]
+            return Response({"site": site.id, "queued": len(jobs), "job_ids": [j.id for j in jobs]}, status=202)
+        return Response(ingest_site(token, site, delta=bool(request.data.get('delta')), **limits))
+    except Exception:
+        logger.exception("Error ingesting site %s", pk)
+        return Response({"error": "Could not ingest the site; see the server log"}, status=500)